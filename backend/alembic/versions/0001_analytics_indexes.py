@@ -0,0 +1,43 @@
+"""analytics indexes
+
+Composite indexes backing the half-open timestamp range predicates used by
+the analytics endpoints, plus the per-user lookups they join against.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_habit_logs_user_id_completed_at", "habit_logs", ["user_id", "completed_at"]),
+    ("ix_habit_logs_habit_id_completed_at", "habit_logs", ["habit_id", "completed_at"]),
+    ("ix_mood_entries_user_id_recorded_at", "mood_entries", ["user_id", "recorded_at"]),
+    ("ix_habits_user_id", "habits", ["user_id"]),
+    ("ix_streaks_user_id", "streaks", ["user_id"]),
+]
+
+
+def upgrade() -> None:
+    # Fresh databases get these from metadata.create_all on startup, so only
+    # existing tables are touched and indexes that already exist are skipped
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if inspector.has_table(table):
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,48 @@
+"""habit daily stats rollup
+
+Adds habit_daily_stats, the per-day rollup of habit_logs read by the
+analytics endpoints. Populate it afterwards with
+``python manage.py rebuild-rollups``.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("habit_daily_stats"):
+        return
+
+    op.create_table(
+        "habit_daily_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("habit_id", sa.Integer(), sa.ForeignKey("habits.id"), primary_key=True),
+        sa.Column("local_date", sa.Date(), primary_key=True),
+        sa.Column("completion_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("quality_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("quality_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("mood_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("mood_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_habit_daily_stats_user_id_local_date", "habit_daily_stats", ["user_id", "local_date"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_habit_daily_stats_user_id_local_date", table_name="habit_daily_stats", if_exists=True)
+    op.drop_table("habit_daily_stats")
@@ -0,0 +1,37 @@
+"""one streak row per habit
+
+The streak engine keeps a single Streak row per habit and upserts it on
+habit_id. Duplicate rows left by older versions are removed first; run
+``python manage.py recompute-streaks`` afterwards to refresh the values.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("streaks"):
+        return
+
+    op.execute(
+        "DELETE FROM streaks WHERE id NOT IN "
+        "(SELECT MAX(id) FROM streaks GROUP BY habit_id)"
+    )
+    op.create_index("uq_streaks_habit_id", "streaks", ["habit_id"], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_streaks_habit_id", table_name="streaks", if_exists=True)
@@ -0,0 +1,39 @@
+"""habit log client keys
+
+Adds habit_logs.client_key, the idempotency key of logs uploaded through
+the batch endpoint, unique per user.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("habit_logs"):
+        return
+
+    if "client_key" not in {column["name"] for column in inspector.get_columns("habit_logs")}:
+        op.add_column("habit_logs", sa.Column("client_key", sa.String(64), nullable=True))
+    op.create_index(
+        "uq_habit_logs_user_id_client_key", "habit_logs", ["user_id", "client_key"],
+        unique=True, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_habit_logs_user_id_client_key", table_name="habit_logs", if_exists=True)
+    op.drop_column("habit_logs", "client_key")
@@ -0,0 +1,74 @@
+"""sync change tracking
+
+Gives every synced table a server-stamped updated_at with a
+(user_id, updated_at) index, backfilling missing values from created_at,
+and adds the tombstones table recording deletes.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Synced tables and the column existing rows take updated_at from
+SYNCED_TABLES = {
+    "habits": "created_at",
+    "categories": "created_at",
+    "goals": "created_at",
+    "habit_logs": "completed_at",
+    "mood_entries": "recorded_at",
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table, created_column in SYNCED_TABLES.items():
+        if not inspector.has_table(table):
+            continue
+
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        with op.batch_alter_table(table) as batch:
+            if "updated_at" in columns:
+                batch.alter_column("updated_at", server_default=sa.func.now(), existing_type=sa.DateTime(timezone=True))
+            else:
+                batch.add_column(sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {created_column} WHERE updated_at IS NULL")
+        if "updated_at" not in columns:
+            with op.batch_alter_table(table) as batch:
+                batch.alter_column("updated_at", server_default=sa.func.now(), existing_type=sa.DateTime(timezone=True))
+        op.create_index(f"ix_{table}_user_id_updated_at", table, ["user_id", "updated_at"], if_not_exists=True)
+
+    if inspector.has_table("users") and not inspector.has_table("tombstones"):
+        op.create_table(
+            "tombstones",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("entity", sa.String(32), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_tombstones_id", "tombstones", ["id"])
+        op.create_index("ix_tombstones_user_id_deleted_at", "tombstones", ["user_id", "deleted_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tombstones_user_id_deleted_at", table_name="tombstones", if_exists=True)
+    op.drop_index("ix_tombstones_id", table_name="tombstones", if_exists=True)
+    op.drop_table("tombstones")
+
+    for table in SYNCED_TABLES:
+        op.drop_index(f"ix_{table}_user_id_updated_at", table_name=table, if_exists=True)
+    for table in ("habit_logs", "mood_entries"):
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,43 @@
+"""habit log post-write processing
+
+Adds habit_logs.processed_at, set once the background tasks have run for
+a log, and a partial index over the logs still waiting. Existing logs are
+marked processed.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("habit_logs"):
+        return
+
+    if "processed_at" not in {column["name"] for column in inspector.get_columns("habit_logs")}:
+        op.add_column("habit_logs", sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True))
+        op.execute("UPDATE habit_logs SET processed_at = completed_at WHERE processed_at IS NULL")
+    op.create_index(
+        "ix_habit_logs_unprocessed", "habit_logs", ["user_id", "id"],
+        postgresql_where=sa.text("processed_at IS NULL"),
+        sqlite_where=sa.text("processed_at IS NULL"),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_habit_logs_unprocessed", table_name="habit_logs", if_exists=True)
+    op.drop_column("habit_logs", "processed_at")
@@ -0,0 +1,49 @@
+"""achievement rules and user counters
+
+Adds achievements.code, naming the rule that unlocked an achievement, with
+one row per user and code, and the user_counters table the rules are
+checked against. Run `python manage.py evaluate-achievements` afterwards
+to fill the counters and award what existing users have already earned.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if inspector.has_table("achievements"):
+        if "code" not in {column["name"] for column in inspector.get_columns("achievements")}:
+            op.add_column("achievements", sa.Column("code", sa.String(50), nullable=True))
+        op.create_index(
+            "uq_achievements_user_id_code", "achievements", ["user_id", "code"], unique=True, if_not_exists=True
+        )
+
+    if inspector.has_table("users") and not inspector.has_table("user_counters"):
+        op.create_table(
+            "user_counters",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("name", sa.String(64), primary_key=True),
+            sa.Column("value", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("user_counters")
+    op.drop_index("uq_achievements_user_id_code", table_name="achievements", if_exists=True)
+    op.drop_column("achievements", "code")
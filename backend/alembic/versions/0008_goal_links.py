@@ -0,0 +1,54 @@
+"""goal links to habits and categories
+
+Adds goals.habit_id and goals.category_id, whose completions count
+towards the goal, and goals.start_date, the first local day counted.
+Existing goals start on the day they were created.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("goals"):
+        return
+
+    columns = {column["name"] for column in inspector.get_columns("goals")}
+    with op.batch_alter_table("goals") as batch:
+        if "habit_id" not in columns:
+            batch.add_column(sa.Column("habit_id", sa.Integer(), nullable=True))
+            batch.create_foreign_key("fk_goals_habit_id", "habits", ["habit_id"], ["id"], ondelete="SET NULL")
+        if "category_id" not in columns:
+            batch.add_column(sa.Column("category_id", sa.Integer(), nullable=True))
+            batch.create_foreign_key("fk_goals_category_id", "categories", ["category_id"], ["id"], ondelete="SET NULL")
+        if "start_date" not in columns:
+            batch.add_column(sa.Column("start_date", sa.Date(), nullable=True))
+    op.execute("UPDATE goals SET start_date = DATE(created_at) WHERE start_date IS NULL")
+
+    op.create_index("ix_goals_habit_id", "goals", ["habit_id"], if_not_exists=True)
+    op.create_index("ix_goals_category_id", "goals", ["category_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_goals_category_id", table_name="goals", if_exists=True)
+    op.drop_index("ix_goals_habit_id", table_name="goals", if_exists=True)
+    with op.batch_alter_table("goals") as batch:
+        batch.drop_constraint("fk_goals_category_id", type_="foreignkey")
+        batch.drop_constraint("fk_goals_habit_id", type_="foreignkey")
+        batch.drop_column("start_date")
+        batch.drop_column("category_id")
+        batch.drop_column("habit_id")
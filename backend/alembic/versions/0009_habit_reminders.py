@@ -0,0 +1,43 @@
+"""habit reminder schedule
+
+Adds habits.next_reminder_at, the UTC time a habit's reminder next fires,
+and a partial index over the habits that have one, which the reminder
+scheduler pops due reminders from. Run `python manage.py
+reschedule-reminders` afterwards to schedule existing reminders.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("habits"):
+        return
+
+    if "next_reminder_at" not in {column["name"] for column in inspector.get_columns("habits")}:
+        op.add_column("habits", sa.Column("next_reminder_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_habits_next_reminder_at", "habits", ["next_reminder_at"],
+        postgresql_where=sa.text("next_reminder_at IS NOT NULL"),
+        sqlite_where=sa.text("next_reminder_at IS NOT NULL"),
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_habits_next_reminder_at", table_name="habits", if_exists=True)
+    op.drop_column("habits", "next_reminder_at")
@@ -0,0 +1,56 @@
+"""notification inbox indexes and unread counters
+
+Adds indexes for inbox pages, unread notifications and pruning read ones,
+and fills the unread_notifications user counter from existing rows.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("notifications"):
+        return
+
+    op.create_index("ix_notifications_user_id_id", "notifications", ["user_id", "id"], if_not_exists=True)
+    op.create_index(
+        "ix_notifications_unread", "notifications", ["user_id", "id"],
+        postgresql_where=sa.text("NOT is_read"),
+        sqlite_where=sa.text("is_read = 0"),
+        if_not_exists=True
+    )
+    op.create_index(
+        "ix_notifications_read_at", "notifications", ["read_at"],
+        postgresql_where=sa.text("read_at IS NOT NULL"),
+        sqlite_where=sa.text("read_at IS NOT NULL"),
+        if_not_exists=True
+    )
+
+    if inspector.has_table("user_counters"):
+        op.execute(
+            "INSERT INTO user_counters (user_id, name, value, updated_at) "
+            "SELECT user_id, 'unread_notifications', COUNT(*), CURRENT_TIMESTAMP "
+            "FROM notifications WHERE NOT is_read GROUP BY user_id "
+            "ON CONFLICT (user_id, name) DO UPDATE SET value = excluded.value"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM user_counters WHERE name = 'unread_notifications'")
+    op.drop_index("ix_notifications_read_at", table_name="notifications", if_exists=True)
+    op.drop_index("ix_notifications_unread", table_name="notifications", if_exists=True)
+    op.drop_index("ix_notifications_user_id_id", table_name="notifications", if_exists=True)
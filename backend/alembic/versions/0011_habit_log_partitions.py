@@ -0,0 +1,131 @@
+"""monthly habit_logs partitions and compaction horizon
+
+On Postgres, rebuilds habit_logs as a table range partitioned by month on
+completed_at: one partition per month from the oldest log up to
+HABIT_LOG_PARTITION_MONTHS_AHEAD months out, and a default partition for
+anything else. Logs are copied over in one transaction, so plan downtime
+for large tables. The primary key becomes (id, completed_at) and the
+client_key idempotency index gains completed_at, as unique indexes of a
+partitioned table must hold the partition key; the index changes the same
+way on other databases, where the table stays as it is.
+
+Adds habit_log_compactions, which records the compaction horizon.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(client_key_columns) -> None:
+    op.create_index("ix_habit_logs_id", "habit_logs", ["id"])
+    op.create_index("ix_habit_logs_user_id_completed_at", "habit_logs", ["user_id", "completed_at"])
+    op.create_index("ix_habit_logs_habit_id_completed_at", "habit_logs", ["habit_id", "completed_at"])
+    op.create_index("ix_habit_logs_user_id_updated_at", "habit_logs", ["user_id", "updated_at"])
+    op.create_index("uq_habit_logs_user_id_client_key", "habit_logs", client_key_columns, unique=True)
+    op.create_index(
+        "ix_habit_logs_unprocessed", "habit_logs", ["user_id", "id"],
+        postgresql_where=sa.text("processed_at IS NULL")
+    )
+    op.create_foreign_key("habit_logs_user_id_fkey", "habit_logs", "users", ["user_id"], ["id"])
+    op.create_foreign_key("habit_logs_habit_id_fkey", "habit_logs", "habits", ["habit_id"], ["id"])
+
+
+def _swap_table(partitioned: bool) -> None:
+    """Copy habit_logs into a new table of the same columns, partitioned
+    or not, and drop the old one"""
+    bind = op.get_bind()
+    op.execute("ALTER TABLE habit_logs RENAME TO habit_logs_old")
+    op.execute(
+        "CREATE TABLE habit_logs (LIKE habit_logs_old INCLUDING DEFAULTS)"
+        + (" PARTITION BY RANGE (completed_at)" if partitioned else "")
+    )
+
+    if partitioned:
+        oldest = bind.scalar(sa.text("SELECT min(completed_at) FROM habit_logs_old"))
+        this_month = _add_months(datetime.now(timezone.utc).date(), 0)
+        month = _add_months(oldest.astimezone(timezone.utc).date(), 0) if oldest else this_month
+        last = _add_months(this_month, settings.HABIT_LOG_PARTITION_MONTHS_AHEAD)
+        while month <= last:
+            following = _add_months(month, 1)
+            op.execute(
+                f"CREATE TABLE habit_logs_y{month.year:04d}m{month.month:02d} PARTITION OF habit_logs "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+            )
+            month = following
+        op.execute("CREATE TABLE habit_logs_default PARTITION OF habit_logs DEFAULT")
+
+    op.execute("INSERT INTO habit_logs SELECT * FROM habit_logs_old")
+    # The id sequence belongs to the old table's column and would go with it
+    sequence = bind.scalar(sa.text("SELECT pg_get_serial_sequence('habit_logs_old', 'id')"))
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY habit_logs.id")
+    op.execute("DROP TABLE habit_logs_old")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("habit_log_compactions"):
+        op.create_table(
+            "habit_log_compactions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("compacted_before", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_habit_log_compactions_id", "habit_log_compactions", ["id"])
+
+    if not inspector.has_table("habit_logs"):
+        return
+
+    op.execute("UPDATE habit_logs SET completed_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE completed_at IS NULL")
+    if bind.dialect.name != "postgresql":
+        op.drop_index("uq_habit_logs_user_id_client_key", table_name="habit_logs", if_exists=True)
+        op.create_index(
+            "uq_habit_logs_user_id_client_key", "habit_logs", ["user_id", "client_key", "completed_at"], unique=True
+        )
+        return
+
+    if bind.scalar(sa.text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'habit_logs'::regclass)")):
+        return
+
+    op.execute("ALTER TABLE habit_logs ALTER COLUMN completed_at SET NOT NULL")
+    _swap_table(partitioned=True)
+    op.create_primary_key("habit_logs_pkey", "habit_logs", ["id", "completed_at"])
+    _create_indexes(["user_id", "client_key", "completed_at"])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and bind.scalar(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'habit_logs'::regclass)")
+    ):
+        _swap_table(partitioned=False)
+        op.create_primary_key("habit_logs_pkey", "habit_logs", ["id"])
+        _create_indexes(["user_id", "client_key"])
+    else:
+        op.drop_index("uq_habit_logs_user_id_client_key", table_name="habit_logs", if_exists=True)
+        op.create_index("uq_habit_logs_user_id_client_key", "habit_logs", ["user_id", "client_key"], unique=True)
+
+    op.drop_index("ix_habit_log_compactions_id", table_name="habit_log_compactions", if_exists=True)
+    op.drop_table("habit_log_compactions")
@@ -0,0 +1,32 @@
+"""index habits by category
+
+Category goals are recounted by joining habits on category_id, and
+deleting a category looks up its habits the same way.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("habits"):
+        return
+
+    op.create_index("ix_habits_category_id", "habits", ["category_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_habits_category_id", table_name="habits", if_exists=True)
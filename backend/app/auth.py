@@ -1,16 +1,29 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models.user import User, UserRole
+from app.cache import LRUCache
 from app.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password hashing; hashes with a different cost are flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 # JWT token handling
 security = HTTPBearer()
@@ -23,6 +36,50 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Run bcrypt on a bounded thread pool so handlers never hash on the event loop"""
+    
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._max_pending = max_pending
+        self._pending = 0
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    async def _run(self, func, *args):
+        # Only touched from the event loop thread, so a plain counter is safe
+        if self._pending >= self._max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        """Hash a password off the event loop"""
+        return await self._run(get_password_hash, password)
+    
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password and return a replacement hash if its cost is outdated"""
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -46,10 +103,110 @@ def verify_token(token: str) -> Optional[str]:
     except JWTError:
         return None
 
+@dataclass(frozen=True)
+class Principal:
+    """The columns of an authenticated user that route handlers read"""
+    id: int
+    email: str
+    username: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    bio: Optional[str]
+    timezone: Optional[str]
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    profile_picture: Optional[str]
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(**{field.name: getattr(user, field.name) for field in fields(cls)})
+    
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["role"] = self.role.value if self.role else None
+        for key in ("created_at", "updated_at"):
+            data[key] = data[key].isoformat() if data[key] else None
+        return json.dumps(data)
+    
+    @classmethod
+    def from_json(cls, raw) -> "Principal":
+        data = json.loads(raw)
+        data["role"] = UserRole(data["role"]) if data["role"] else None
+        for key in ("created_at", "updated_at"):
+            data[key] = datetime.fromisoformat(data[key]) if data[key] else None
+        return cls(**data)
+
+class PrincipalCache:
+    """Principals keyed by token subject, in process and optionally in Redis
+    
+    Invalidation clears this worker and Redis; other workers drop their
+    in-process copy when its TTL expires, so keep the TTL short.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self._local = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(redis_url)
+    
+    @staticmethod
+    def _redis_key(subject: str) -> str:
+        return f"principal:{subject}"
+    
+    async def get(self, subject: str) -> Optional[Principal]:
+        principal = self._local.get(subject)
+        if principal is not None or self._redis is None:
+            return principal
+        
+        try:
+            raw = await self._redis.get(self._redis_key(subject))
+        except Exception:
+            logger.warning("Principal cache read from Redis failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        
+        principal = Principal.from_json(raw)
+        self._local.set(subject, principal)
+        return principal
+    
+    async def set(self, subject: str, principal: Principal):
+        self._local.set(subject, principal)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._redis_key(subject), principal.to_json(), ex=self.ttl_seconds)
+            except Exception:
+                logger.warning("Principal cache write to Redis failed", exc_info=True)
+    
+    async def invalidate(self, subject: str):
+        self._local.delete(subject)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._redis_key(subject))
+            except Exception:
+                logger.warning("Principal cache invalidation in Redis failed", exc_info=True)
+    
+    def clear(self):
+        self._local.clear()
+    
+    def stats(self) -> dict:
+        return self._local.stats()
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL if settings.PRINCIPAL_CACHE_USE_REDIS else None
+)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     """Get the current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,9 +222,15 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await principal_cache.get(email)
     if user is None:
-        raise credentials_exception
+        result = await db.execute(select(User).where(User.email == email))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise credentials_exception
+        
+        user = Principal.from_user(db_user)
+        await principal_cache.set(email, user)
     
     if not user.is_active:
         raise HTTPException(
@@ -77,7 +240,7 @@ async def get_current_user(
     
     return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get the current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -0,0 +1,226 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """In-process cache with per-entry TTL and least-recently-used eviction"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class MemoryCacheBackend:
+    """Cache backend in this process, for tests and single-process deployments"""
+
+    def __init__(self, max_entries: int):
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=0)
+        self._counters: Dict[str, int] = {}
+        self._lock = Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int):
+        self._entries.set(key, value, ttl_seconds=ttl_seconds)
+
+    async def get_counters(self, keys: List[str]) -> List[Optional[int]]:
+        return [self._counters.get(key) for key in keys]
+
+    async def incr_counters(self, keys: List[str], initial: int):
+        self.incr_counters_blocking(keys, initial)
+
+    def incr_counters_blocking(self, keys: List[str], initial: int):
+        with self._lock:
+            for key in keys:
+                self._counters[key] = self._counters.get(key, initial) + 1
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
+
+class RedisCacheBackend:
+    """Cache backend shared by every worker through Redis"""
+
+    def __init__(self, redis_url: str):
+        import redis.asyncio as redis
+        self.redis_url = redis_url
+        self._redis = redis.from_url(redis_url)
+        self._blocking_redis = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int):
+        await self._redis.set(key, value, ex=ttl_seconds)
+
+    async def get_counters(self, keys: List[str]) -> List[Optional[int]]:
+        return [None if value is None else int(value) for value in await self._redis.mget(keys)]
+
+    async def incr_counters(self, keys: List[str], initial: int):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, initial, nx=True)
+                pipe.incr(key)
+            await pipe.execute()
+
+    def incr_counters_blocking(self, keys: List[str], initial: int):
+        if self._blocking_redis is None:
+            import redis
+            self._blocking_redis = redis.Redis.from_url(self.redis_url)
+        with self._blocking_redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, initial, nx=True)
+                pipe.incr(key)
+            pipe.execute()
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+class VersionedCache:
+    """Per-user results that stay valid until the user's data changes
+
+    Keys embed the user's data version and a global epoch. Writers bump the
+    user's version after committing; bulk maintenance bumps the epoch. A
+    missing counter (never set, or evicted) starts from the clock, so it
+    cannot come back at a value old entries were stored under. Backend
+    failures degrade to recomputing.
+    """
+
+    EPOCH_KEY = "cache:epoch"
+
+    def __init__(self, backend, ttl_seconds: int, namespace: str):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"cache:version:{user_id}"
+
+    async def version(self, user_id: int) -> str:
+        """Opaque token that changes whenever the user's cached data is stale"""
+        keys = [self.EPOCH_KEY, self._version_key(user_id)]
+        counters = await self.backend.get_counters(keys)
+        if None in counters:
+            await self.backend.incr_counters([key for key, value in zip(keys, counters) if value is None], time.time_ns())
+            counters = await self.backend.get_counters(keys)
+        return ".".join(str(counter) for counter in counters)
+
+    async def get_or_compute(self, user_id: int, name: str, params: Iterable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached JSON-compatible result of compute for this user and params"""
+        try:
+            key = f"{self.namespace}:{user_id}:{await self.version(user_id)}:{name}:{':'.join(map(str, params))}"
+            cached = await self.backend.get(key)
+        except Exception:
+            logger.warning("Cache read failed", exc_info=True)
+            return await compute()
+        if cached is not None:
+            return json.loads(cached)
+
+        value = await compute()
+        try:
+            await self.backend.set(key, json.dumps(value).encode(), self.ttl_seconds)
+        except Exception:
+            logger.warning("Cache write failed", exc_info=True)
+        return value
+
+    async def bump(self, *user_ids: int):
+        """Invalidate these users' entries; call after the write commits"""
+        await self._incr([self._version_key(user_id) for user_id in user_ids])
+
+    async def bump_all(self):
+        """Invalidate every user's entries, e.g. after a bulk recompute"""
+        await self._incr([self.EPOCH_KEY])
+
+    def bump_blocking(self, *user_ids: int):
+        """Like bump, for code outside the event loop: workers and commands"""
+        self._incr_blocking([self._version_key(user_id) for user_id in user_ids])
+
+    def bump_all_blocking(self):
+        self._incr_blocking([self.EPOCH_KEY])
+
+    async def _incr(self, keys: List[str]):
+        try:
+            await self.backend.incr_counters(keys, time.time_ns())
+        except Exception:
+            logger.warning("Cache invalidation failed; entries expire with their TTL", exc_info=True)
+
+    def _incr_blocking(self, keys: List[str]):
+        try:
+            self.backend.incr_counters_blocking(keys, time.time_ns())
+        except Exception:
+            logger.warning("Cache invalidation failed; entries expire with their TTL", exc_info=True)
+
+    def stats(self) -> Dict[str, int]:
+        return self.backend.stats()
+
+def create_cache_backend(name: str):
+    if name == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    if name == "memory":
+        # Versions bumped by workers or other web processes would never reach this one
+        if not settings.single_process:
+            raise ValueError(
+                'ANALYTICS_CACHE_BACKEND="memory" needs TASKS_EAGER=True and WEB_CONCURRENCY=1; use "redis"'
+            )
+        return MemoryCacheBackend(max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES)
+    raise ValueError(f"Unknown cache backend {name!r}")
+
+analytics_cache = VersionedCache(
+    create_cache_backend(settings.ANALYTICS_CACHE_BACKEND),
+    ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS,
+    namespace="analytics"
+)
@@ -0,0 +1,39 @@
+"""
+Opaque cursors handed to clients for resumable reads
+
+A cursor is a URL-safe base64 encoding of a short JSON list of values;
+clients pass it back unchanged and never parse it.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor of the next page, absent on the last
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """Decode a cursor made by encode_cursor from values of the given types"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("wrong cursor length")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, payload)
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
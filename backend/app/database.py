@@ -1,9 +1,26 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-# Create database engine
+# Async drivers used for each sync DATABASE_URL dialect
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+# Create database engine (migrations, scripts and table creation)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -11,9 +28,36 @@ engine = create_engine(
     echo=settings.DEBUG
 )
 
+# Create async database engine (request handlers)
+async_engine_options = {"pool_pre_ping": True, "pool_recycle": 300, "echo": settings.DEBUG}
+if not make_url(settings.DATABASE_URL).drivername.startswith("sqlite"):
+    async_engine_options["pool_size"] = settings.DATABASE_POOL_SIZE
+    async_engine_options["max_overflow"] = settings.DATABASE_MAX_OVERFLOW
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL),
+    **async_engine_options
+)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create AsyncSessionLocal class; objects stay readable after commit
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+def dialect_insert(dialect_name: str):
+    """INSERT construct with ON CONFLICT support for the given dialect"""
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+
 # Create Base class
 Base = declarative_base()
 
@@ -24,3 +68,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
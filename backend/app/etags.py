@@ -0,0 +1,59 @@
+"""
+Conditional GET for per-user read endpoints
+
+ETags come from the user's data version (see app.cache.VersionedCache),
+which writers bump after every commit, so they cost one counter read
+instead of a query plus hashing the body.
+"""
+
+import hashlib
+import logging
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.auth import Principal, get_current_user
+from app.cache import analytics_cache
+from app.services.rollups import local_today
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(":".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in candidates}
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
+):
+    """Answer 304 Not Modified before the route runs when the client's copy
+    is current, otherwise tag the response
+
+    The tag covers the URL and the user's local date, since responses such
+    as the dashboard change at midnight without any write. Responses go out
+    untagged while the cache backend is unreachable.
+    """
+    try:
+        version = await analytics_cache.version(current_user.id)
+    except Exception:
+        # Without the version a tag could outlive the data; serve untagged
+        logger.warning("Cache version read failed", exc_info=True)
+        return
+    etag = make_etag(version, local_today(current_user.timezone), request.url.path, request.url.query)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        )
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -1,12 +1,25 @@
+import logging
+
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-from app.database import engine, get_db
+from starlette.concurrency import run_in_threadpool
+from app.cache import analytics_cache
+from app.config import settings
+from app.cursors import NEXT_CURSOR_HEADER
+from app.database import engine, async_engine, get_db
+from app.sorted_sets import streak_leaderboard
 from app.models import Base
-from app.routers import auth, habits, users, categories, analytics
-from app.auth import get_current_user
+from app.routers import auth, habits, users, categories, goals, analytics, sync, notifications
+from app.auth import Principal, get_current_user, password_hasher, principal_cache
 from app.schemas.user import UserResponse
+from app.serialization import FastJSONResponse
+from app.tasks.celery_app import enqueue
+from app.tasks.leaderboard import rebuild_streak_leaderboard
+
+logger = logging.getLogger(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -17,7 +30,8 @@ app = FastAPI(
     description="Backend API for the Kultivate habit tracking app",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse if settings.FAST_JSON else JSONResponse
 )
 
 # Security
@@ -30,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -37,7 +52,28 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
 app.include_router(habits.router, prefix="/api/v1/habits", tags=["Habits"])
 app.include_router(categories.router, prefix="/api/v1/categories", tags=["Categories"])
+app.include_router(goals.router, prefix="/api/v1/goals", tags=["Goals"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+app.include_router(sync.router, prefix="/api/v1/sync", tags=["Sync"])
+app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
+
+@app.on_event("startup")
+async def seed_streak_leaderboard():
+    """Queue a leaderboard rebuild if it was never filled; requests only
+    read it, and the nightly rebuild keeps it repaired"""
+    try:
+        seeded = await run_in_threadpool(streak_leaderboard.seeded)
+    except Exception:
+        logger.warning("Leaderboard unreachable at startup", exc_info=True)
+        return
+    if not seeded:
+        await enqueue(rebuild_streak_leaderboard)
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    """Close pooled async database connections and the hashing pool"""
+    await async_engine.dispose()
+    password_hasher.shutdown()
 
 @app.get("/")
 async def root():
@@ -49,7 +85,7 @@ async def root():
 
 @app.get("/api/v1/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get current user information"""
     return current_user
@@ -57,7 +93,12 @@ async def get_current_user_info(
 @app.get("/api/v1/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "Kultivate API is running"}
+    return {
+        "status": "healthy",
+        "message": "Kultivate API is running",
+        "principal_cache": principal_cache.stats(),
+        "analytics_cache": analytics_cache.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
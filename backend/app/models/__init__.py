@@ -1,21 +1,31 @@
+from app.database import Base
 from .user import User
 from .habit import Habit
 from .habit_log import HabitLog
+from .habit_daily_stat import HabitDailyStat
+from .habit_log_compaction import HabitLogCompaction
 from .category import Category
 from .streak import Streak
 from .achievement import Achievement
 from .mood_entry import MoodEntry
 from .goal import Goal
 from .notification import Notification
+from .tombstone import Tombstone
+from .user_counter import UserCounter
 
 __all__ = [
+    "Base",
     "User",
     "Habit", 
     "HabitLog",
+    "HabitDailyStat",
+    "HabitLogCompaction",
     "Category",
     "Streak",
     "Achievement",
     "MoodEntry",
     "Goal",
-    "Notification"
+    "Notification",
+    "Tombstone",
+    "UserCounter"
 ]
@@ -1,13 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Achievement(Base):
     __tablename__ = "achievements"
+    __table_args__ = (
+        Index("uq_achievements_user_id_code", "user_id", "code", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    code = Column(String(50))  # Rule that unlocks it, see app.services.achievements
     title = Column(String(200), nullable=False)
     description = Column(Text)
     icon = Column(String(50))
@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Date, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Date, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Goal(Base):
     __tablename__ = "goals"
+    __table_args__ = (
+        Index("ix_goals_user_id_updated_at", "user_id", "updated_at"),
+        Index("ix_goals_habit_id", "habit_id"),
+        Index("ix_goals_category_id", "category_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # A linked goal counts completions of one habit or of any habit in a category
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="SET NULL", name="fk_goals_habit_id"))
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL", name="fk_goals_category_id"))
+    start_date = Column(Date)  # First local day counted towards a linked goal
     title = Column(String(200), nullable=False)
     description = Column(Text)
     target_value = Column(Float)
@@ -18,7 +27,7 @@ class Goal(Base):
     completed_at = Column(DateTime(timezone=True))
     progress_percentage = Column(Float, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="goals")
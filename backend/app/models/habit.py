@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, Time
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, Time, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
 import enum
 
@@ -17,10 +17,19 @@ class HabitPriority(str, enum.Enum):
 
 class Habit(Base):
     __tablename__ = "habits"
+    __table_args__ = (
+        Index("ix_habits_user_id_updated_at", "user_id", "updated_at"),
+        # Reminder queue popped in fire time order, see app.services.reminders
+        Index(
+            "ix_habits_next_reminder_at", "next_reminder_at",
+            postgresql_where=text("next_reminder_at IS NOT NULL"),
+            sqlite_where=text("next_reminder_at IS NOT NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text)
     frequency = Column(Enum(HabitFrequency), default=HabitFrequency.DAILY)
@@ -28,18 +37,20 @@ class Habit(Base):
     target_count = Column(Integer, default=1)
     current_streak = Column(Integer, default=0)
     longest_streak = Column(Integer, default=0)
-    reminder_time = Column(Time)
+    reminder_time = Column(Time)  # Local time in the user's timezone
+    next_reminder_at = Column(DateTime(timezone=True))  # UTC; null when no reminder is due
     is_active = Column(Boolean, default=True)
     color = Column(String(7), default="#3B82F6")  # Hex color
     icon = Column(String(50), default="star")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="habits")
     category = relationship("Category", back_populates="habits")
     habit_logs = relationship("HabitLog", back_populates="habit", cascade="all, delete-orphan")
     streaks = relationship("Streak", back_populates="habit", cascade="all, delete-orphan")
+    daily_stats = relationship("HabitDailyStat", back_populates="habit", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Habit(id={self.id}, title='{self.title}', user_id={self.user_id})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Float, Date, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+class HabitDailyStat(Base):
+    """Per-day rollup of a habit's logs, dated in the user's timezone"""
+    __tablename__ = "habit_daily_stats"
+    __table_args__ = (
+        Index("ix_habit_daily_stats_user_id_local_date", "user_id", "local_date"),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    habit_id = Column(Integer, ForeignKey("habits.id"), primary_key=True)
+    local_date = Column(Date, primary_key=True)
+    completion_count = Column(Integer, nullable=False, default=0)
+    quality_sum = Column(Float, nullable=False, default=0)
+    quality_count = Column(Integer, nullable=False, default=0)  # Logs with a quality rating
+    mood_sum = Column(Float, nullable=False, default=0)
+    mood_count = Column(Integer, nullable=False, default=0)  # Logs with a mood rating
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    habit = relationship("Habit", back_populates="daily_stats")
+    
+    def __repr__(self):
+        return f"<HabitDailyStat(habit_id={self.habit_id}, local_date={self.local_date}, completion_count={self.completion_count})>"
@@ -1,20 +1,39 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class HabitLog(Base):
     __tablename__ = "habit_logs"
+    __table_args__ = (
+        Index("ix_habit_logs_user_id_completed_at", "user_id", "completed_at"),
+        Index("ix_habit_logs_habit_id_completed_at", "habit_id", "completed_at"),
+        Index("ix_habit_logs_user_id_updated_at", "user_id", "updated_at"),
+        # Idempotency key of logs uploaded by offline clients; unique indexes
+        # of the partitioned Postgres table must hold the partition key
+        Index("uq_habit_logs_user_id_client_key", "user_id", "client_key", "completed_at", unique=True),
+        # Logs awaiting post-write processing, see app.tasks
+        Index(
+            "ix_habit_logs_unprocessed", "user_id", "id",
+            postgresql_where=text("processed_at IS NULL"),
+            sqlite_where=text("processed_at IS NULL")
+        ),
+    )
     
+    # On Postgres the table is range partitioned by month on completed_at and
+    # its primary key is (id, completed_at), see app.services.partitions
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
-    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     notes = Column(Text)
     mood_rating = Column(Float)  # 1-10 scale
     completion_time = Column(Integer)  # Time taken in minutes
     is_completed = Column(Boolean, default=True)
     quality_rating = Column(Float)  # 1-5 scale
+    client_key = Column(String(64))  # Set by clients syncing offline completions
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    processed_at = Column(DateTime(timezone=True))  # Set once post-write tasks have run
     
     # Relationships
     user = relationship("User", back_populates="habit_logs")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class HabitLogCompaction(Base):
+    """A compaction run; logs completed before compacted_before live on only
+    in habit_daily_stats"""
+    __tablename__ = "habit_log_compactions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    compacted_before = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<HabitLogCompaction(id={self.id}, compacted_before={self.compacted_before})>"
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class MoodEntry(Base):
     __tablename__ = "mood_entries"
+    __table_args__ = (
+        Index("ix_mood_entries_user_id_recorded_at", "user_id", "recorded_at"),
+        Index("ix_mood_entries_user_id_updated_at", "user_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -16,6 +20,7 @@ class MoodEntry(Base):
     stress_level = Column(Float)  # 1-10 scale
     energy_level = Column(Float)  # 1-10 scale
     recorded_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="mood_entries")
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
 import enum
 
@@ -13,6 +13,23 @@ class NotificationType(str, enum.Enum):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Inbox pages, newest first
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+        # Unread notifications, see app.services.notifications; SQLite only
+        # uses a partial index for the predicate exactly as queries spell it
+        Index(
+            "ix_notifications_unread", "user_id", "id",
+            postgresql_where=text("NOT is_read"),
+            sqlite_where=text("is_read = 0")
+        ),
+        # Read notifications, pruned oldest first
+        Index(
+            "ix_notifications_read_at", "read_at",
+            postgresql_where=text("read_at IS NOT NULL"),
+            sqlite_where=text("read_at IS NOT NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
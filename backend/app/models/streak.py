@@ -1,13 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Streak(Base):
     __tablename__ = "streaks"
+    __table_args__ = (
+        # One streak row per habit, maintained by app.services.streaks
+        Index("uq_streaks_habit_id", "habit_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
     current_streak = Column(Integer, default=0)
     longest_streak = Column(Integer, default=0)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class Tombstone(Base):
+    """Record of a deleted row, kept so sync clients can drop their copy"""
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(String(32), nullable=False)  # Sync collection, e.g. "habits"
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<Tombstone(entity='{self.entity}', entity_id={self.entity_id}, user_id={self.user_id})>"
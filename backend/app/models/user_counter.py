@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class UserCounter(Base):
+    """Running per-user total that achievement rules are checked against"""
+    __tablename__ = "user_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String(64), primary_key=True)  # e.g. "completions", "category_completions:3"
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<UserCounter(user_id={self.user_id}, name='{self.name}', value={self.value})>"
@@ -1,151 +1,362 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from app.database import get_db
-from app.models.user import User
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from sqlalchemy import func, and_, case, select
+from collections import deque
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Dict, Any, Literal, Optional
+from starlette.concurrency import run_in_threadpool
+from app.database import get_async_db
+from app.sorted_sets import RankedEntry, streak_leaderboard
 from app.models.habit import Habit
-from app.models.habit_log import HabitLog
+from app.models.habit_daily_stat import HabitDailyStat
 from app.models.streak import Streak
 from app.models.mood_entry import MoodEntry
-from app.auth import get_current_user
+from app.models.user import User
+from app.auth import Principal, get_current_user
+from app.cache import analytics_cache
+from app.etags import conditional_get
+from app.services.rollups import local_bucket_start, local_today, user_zone
+from app.services.correlations import user_correlations
+from app.services.streaks import DAILY, MONTHLY, WEEKLY, period_index
 
 router = APIRouter()
 
-@router.get("/dashboard")
-async def get_dashboard_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get dashboard statistics for the current user"""
-    today = datetime.now().date()
+# Upper bound for the days window accepted by analytics endpoints
+MAX_ANALYTICS_DAYS = 365
+
+# Upper bound for the lag between a habit and the mood it is compared with
+MAX_CORRELATION_LAG = 7
+
+# Upper bound for the mood trends rolling window, in buckets
+MAX_ROLLING_BUCKETS = 90
+
+# Upper bounds for the global leaderboard's top list and the users shown around you
+MAX_LEADERBOARD_SIZE = 100
+MAX_LEADERBOARD_NEIGHBOURS = 25
+
+MOOD_BUCKETS = {"day": DAILY, "week": WEEKLY, "month": MONTHLY}
+
+MOOD_METRICS = {
+    "mood": MoodEntry.mood_rating,
+    "stress": MoodEntry.stress_level,
+    "energy": MoodEntry.energy_level
+}
+
+def day_start(day: date) -> datetime:
+    """UTC midnight opening a day; ranges are [day_start(a), day_start(b))"""
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+def dashboard_stats_query(user_id: int, today: date):
+    """All dashboard figures in one statement
+    
+    Completions are conditionally aggregated over this week's rollup rows;
+    the habit and streak figures ride along as scalar subqueries. today is
+    the user's local date.
+    """
     
     # Total habits
-    total_habits = db.query(Habit).filter(
-        Habit.user_id == current_user.id,
+    total_habits = select(func.count(Habit.id)).where(
+        Habit.user_id == user_id,
         Habit.is_active == True
-    ).count()
-    
-    # Completed habits today
-    completed_today = db.query(HabitLog).filter(
-        HabitLog.user_id == current_user.id,
-        func.date(HabitLog.completed_at) == today
-    ).count()
+    ).scalar_subquery()
     
     # Current streak
-    current_streak = db.query(func.max(Streak.current_streak)).filter(
-        Streak.user_id == current_user.id,
+    current_streak = select(func.max(Streak.current_streak)).where(
+        Streak.user_id == user_id,
         Streak.is_active == True
-    ).scalar() or 0
+    ).scalar_subquery()
     
     # Longest streak
-    longest_streak = db.query(func.max(Streak.longest_streak)).filter(
-        Streak.user_id == current_user.id
-    ).scalar() or 0
-    
-    # Weekly completion rate
-    week_ago = today - timedelta(days=7)
-    weekly_completions = db.query(HabitLog).filter(
-        HabitLog.user_id == current_user.id,
-        func.date(HabitLog.completed_at) >= week_ago
-    ).count()
+    longest_streak = select(func.max(Streak.longest_streak)).where(
+        Streak.user_id == user_id
+    ).scalar_subquery()
     
+    return select(
+        total_habits.label("total_habits"),
+        func.coalesce(func.sum(case((HabitDailyStat.local_date == today, HabitDailyStat.completion_count), else_=0)), 0).label("completed_today"),
+        func.coalesce(current_streak, 0).label("current_streak"),
+        func.coalesce(longest_streak, 0).label("longest_streak"),
+        func.coalesce(func.sum(HabitDailyStat.completion_count), 0).label("weekly_completions")
+    ).where(
+        HabitDailyStat.user_id == user_id,
+        HabitDailyStat.local_date >= today - timedelta(days=7),
+        HabitDailyStat.local_date < today + timedelta(days=1)
+    )
+
+def dashboard_payload(stats) -> Dict[str, Any]:
+    """Shape a dashboard_stats_query row into the dashboard response"""
+    total_habits = stats.total_habits
+    weekly_completions = stats.weekly_completions
     weekly_rate = (weekly_completions / (total_habits * 7)) * 100 if total_habits > 0 else 0
     
     return {
         "total_habits": total_habits,
-        "completed_today": completed_today,
-        "current_streak": current_streak,
-        "longest_streak": longest_streak,
+        "completed_today": stats.completed_today,
+        "current_streak": stats.current_streak,
+        "longest_streak": stats.longest_streak,
         "weekly_completion_rate": round(weekly_rate, 2),
         "weekly_completions": weekly_completions
     }
 
-@router.get("/habits/performance")
+@router.get("/dashboard", dependencies=[Depends(conditional_get)])
+async def get_dashboard_stats(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get dashboard statistics for the current user"""
+    today = local_today(current_user.timezone)
+    
+    async def compute():
+        result = await db.execute(dashboard_stats_query(current_user.id, today))
+        return dashboard_payload(result.one())
+    
+    return await analytics_cache.get_or_compute(current_user.id, "dashboard", [today], compute)
+
+@router.get("/habits/performance", dependencies=[Depends(conditional_get)])
 async def get_habits_performance(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    days: int = 30
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    days: int = Query(30, ge=1, le=MAX_ANALYTICS_DAYS)
 ):
     """Get habits performance over the last N days"""
-    end_date = datetime.now().date()
+    end_date = local_today(current_user.timezone)
     start_date = end_date - timedelta(days=days)
     
-    habits = db.query(Habit).filter(
-        Habit.user_id == current_user.id,
-        Habit.is_active == True
-    ).all()
-    
-    performance_data = []
-    
-    for habit in habits:
-        completions = db.query(HabitLog).filter(
-            HabitLog.habit_id == habit.id,
-            func.date(HabitLog.completed_at) >= start_date,
-            func.date(HabitLog.completed_at) <= end_date
-        ).count()
+    async def compute():
+        # One grouped pass over the rollup: the join condition keeps habits
+        # without completions
+        result = await db.execute(
+            select(
+                Habit.id,
+                Habit.title,
+                Habit.current_streak,
+                Habit.longest_streak,
+                func.coalesce(func.sum(HabitDailyStat.completion_count), 0).label("completions")
+            ).outerjoin(
+                HabitDailyStat,
+                and_(
+                    HabitDailyStat.user_id == Habit.user_id,
+                    HabitDailyStat.habit_id == Habit.id,
+                    HabitDailyStat.local_date >= start_date,
+                    HabitDailyStat.local_date < end_date + timedelta(days=1)
+                )
+            ).where(
+                Habit.user_id == current_user.id,
+                Habit.is_active == True
+            ).group_by(
+                Habit.id, Habit.title, Habit.current_streak, Habit.longest_streak
+            ).order_by(Habit.id)
+        )
         
-        completion_rate = (completions / days) * 100
+        performance_data = []
         
-        performance_data.append({
-            "habit_id": habit.id,
-            "title": habit.title,
-            "completions": completions,
-            "completion_rate": round(completion_rate, 2),
-            "current_streak": habit.current_streak,
-            "longest_streak": habit.longest_streak
-        })
-    
-    return performance_data
-
-@router.get("/mood/trends")
+        for habit in result:
+            completion_rate = (habit.completions / days) * 100
+            
+            performance_data.append({
+                "habit_id": habit.id,
+                "title": habit.title,
+                "completions": habit.completions,
+                "completion_rate": round(completion_rate, 2),
+                "current_streak": habit.current_streak,
+                "longest_streak": habit.longest_streak
+            })
+        
+        return performance_data
+    
+    return await analytics_cache.get_or_compute(current_user.id, "habits_performance", [end_date, days], compute)
+
+@router.get("/mood/trends", dependencies=[Depends(conditional_get)])
 async def get_mood_trends(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    days: int = 30
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    days: int = Query(30, ge=1, le=MAX_ANALYTICS_DAYS),
+    bucket: Optional[Literal["day", "week", "month"]] = None,
+    rolling: int = Query(0, ge=0, le=MAX_ROLLING_BUCKETS)
 ):
-    """Get mood trends over the last N days"""
-    end_date = datetime.now().date()
+    """Get mood trends over the last N days
+
+    Without bucket every entry is returned. With bucket=day|week|month the
+    entries are aggregated in SQL per local day, week (Monday first) or
+    month, and rolling=N adds each metric's average over the N buckets
+    ending at each one.
+    """
+    if bucket is not None:
+        return await get_bucketed_mood_trends(current_user, db, days, bucket, rolling)
+    
+    end_date = datetime.now(timezone.utc).date()
     start_date = end_date - timedelta(days=days)
+    range_start, range_end = day_start(start_date), day_start(end_date + timedelta(days=1))
     
-    mood_entries = db.query(MoodEntry).filter(
-        MoodEntry.user_id == current_user.id,
-        func.date(MoodEntry.recorded_at) >= start_date,
-        func.date(MoodEntry.recorded_at) <= end_date
-    ).order_by(MoodEntry.recorded_at).all()
-    
-    mood_data = []
-    for entry in mood_entries:
-        mood_data.append({
-            "date": entry.recorded_at.date().isoformat(),
-            "mood_rating": entry.mood_rating,
-            "mood_emoji": entry.mood_emoji,
-            "stress_level": entry.stress_level,
-            "energy_level": entry.energy_level
-        })
-    
-    return mood_data
-
-@router.get("/streaks/leaderboard")
+    async def compute():
+        result = await db.execute(
+            select(MoodEntry).where(
+                MoodEntry.user_id == current_user.id,
+                MoodEntry.recorded_at >= range_start,
+                MoodEntry.recorded_at < range_end
+            ).order_by(MoodEntry.recorded_at)
+        )
+        mood_entries = result.scalars().all()
+        
+        mood_data = []
+        for entry in mood_entries:
+            mood_data.append({
+                "date": entry.recorded_at.date().isoformat(),
+                "mood_rating": entry.mood_rating,
+                "mood_emoji": entry.mood_emoji,
+                "stress_level": entry.stress_level,
+                "energy_level": entry.energy_level
+            })
+        
+        return mood_data
+    
+    return await analytics_cache.get_or_compute(current_user.id, "mood_trends", [end_date, days], compute)
+
+async def get_bucketed_mood_trends(current_user: Principal, db: AsyncSession, days: int, bucket: str, rolling: int):
+    """Mood trends with one row per bucket, however many entries there are"""
+    zone = user_zone(current_user.timezone)
+    today = local_today(current_user.timezone)
+    range_start = datetime.combine(today - timedelta(days=days), time.min, tzinfo=zone)
+    range_end = datetime.combine(today + timedelta(days=1), time.min, tzinfo=zone)
+    
+    async def compute():
+        bucket_start = local_bucket_start(db.bind.dialect.name, bucket, MoodEntry.recorded_at, zone).label("bucket_start")
+        columns = [bucket_start, func.count().label("entries")]
+        for name, column in MOOD_METRICS.items():
+            columns += [
+                func.sum(column).label(f"{name}_sum"),
+                func.count(column).label(f"{name}_count"),
+                func.min(column).label(f"{name}_min"),
+                func.max(column).label(f"{name}_max")
+            ]
+        
+        result = await db.execute(
+            select(*columns).where(
+                MoodEntry.user_id == current_user.id,
+                MoodEntry.recorded_at >= range_start,
+                MoodEntry.recorded_at < range_end
+            ).group_by(bucket_start).order_by(bucket_start)
+        )
+        return summarize_mood_buckets(result.mappings().all(), MOOD_BUCKETS[bucket], rolling)
+    
+    return await analytics_cache.get_or_compute(
+        current_user.id, "mood_trends", [today, days, bucket, rolling], compute
+    )
+
+def summarize_mood_buckets(rows, code: int, rolling: int = 0) -> List[Dict[str, Any]]:
+    """Shape aggregated bucket rows for the response
+
+    Rolling averages weigh each bucket by its entries and treat buckets
+    without any as empty rather than skipping over them.
+    """
+    points = []
+    window = deque()
+    for row in rows:
+        start = row["bucket_start"]
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        
+        if rolling:
+            index = period_index(start, code)
+            window.append((index, row))
+            while window[0][0] <= index - rolling:
+                window.popleft()
+        
+        point = {"bucket_start": start.isoformat(), "entries": row["entries"]}
+        for name in MOOD_METRICS:
+            count = row[f"{name}_count"]
+            point[f"{name}_avg"] = round(row[f"{name}_sum"] / count, 2) if count else None
+            point[f"{name}_min"] = row[f"{name}_min"]
+            point[f"{name}_max"] = row[f"{name}_max"]
+            if rolling:
+                total = sum(other[f"{name}_count"] for _, other in window)
+                point[f"{name}_rolling_avg"] = (
+                    round(sum(other[f"{name}_sum"] or 0 for _, other in window) / total, 2) if total else None
+                )
+        points.append(point)
+    
+    return points
+
+@router.get("/correlations", dependencies=[Depends(conditional_get)])
+async def get_correlations(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    days: int = Query(90, ge=1, le=MAX_ANALYTICS_DAYS),
+    max_lag: int = Query(0, ge=0, le=MAX_CORRELATION_LAG)
+):
+    """How each habit's completion relates to mood, sleep, stress and energy
+    the same day and up to max_lag days later"""
+    today = local_today(current_user.timezone)
+    
+    async def compute():
+        pairs = await db.run_sync(
+            user_correlations, current_user.id, user_zone(current_user.timezone), today, days, max_lag
+        )
+        return {
+            "start_date": (today - timedelta(days=days - 1)).isoformat(),
+            "end_date": today.isoformat(),
+            "correlations": pairs
+        }
+    
+    return await analytics_cache.get_or_compute(
+        current_user.id, "correlations", [today, days, max_lag], compute
+    )
+
+@router.get("/streaks/leaderboard", dependencies=[Depends(conditional_get)])
 async def get_streaks_leaderboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get streaks leaderboard for the current user"""
-    streaks = db.query(Streak).filter(
-        Streak.user_id == current_user.id,
-        Streak.is_active == True
-    ).join(Habit).order_by(Streak.current_streak.desc()).limit(10).all()
-    
-    leaderboard = []
-    for i, streak in enumerate(streaks):
-        leaderboard.append({
-            "rank": i + 1,
-            "habit_title": streak.habit.title,
-            "current_streak": streak.current_streak,
-            "longest_streak": streak.longest_streak,
-            "start_date": streak.start_date.isoformat()
-        })
-    
-    return leaderboard
+    
+    async def compute():
+        result = await db.execute(
+            select(Streak).where(
+                Streak.user_id == current_user.id,
+                Streak.is_active == True
+            ).join(Habit).options(contains_eager(Streak.habit)).order_by(Streak.current_streak.desc()).limit(10)
+        )
+        streaks = result.scalars().all()
+        
+        leaderboard = []
+        for i, streak in enumerate(streaks):
+            leaderboard.append({
+                "rank": i + 1,
+                "habit_title": streak.habit.title,
+                "current_streak": streak.current_streak,
+                "longest_streak": streak.longest_streak,
+                "start_date": streak.start_date.isoformat()
+            })
+        
+        return leaderboard
+    
+    return await analytics_cache.get_or_compute(current_user.id, "streaks_leaderboard", [], compute)
+
+@router.get("/streaks/leaderboard/global")
+async def get_global_streaks_leaderboard(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(10, ge=1, le=MAX_LEADERBOARD_SIZE),
+    neighbours: int = Query(2, ge=0, le=MAX_LEADERBOARD_NEIGHBOURS)
+):
+    """Rank every user by their best current streak
+    
+    Returns the top users, the current user's rank and the users just
+    above and below them. Users with the same streak share a rank.
+    """
+    standings = await run_in_threadpool(streak_leaderboard.standings, current_user.id, limit, neighbours)
+    
+    user_ids = {entry[0] for entry in standings.top + standings.around}
+    usernames = dict((await db.execute(select(User.id, User.username).where(User.id.in_(user_ids)))).all())
+    
+    def describe(entry: RankedEntry) -> Dict[str, Any]:
+        user_id, score, rank = entry
+        return {"rank": rank, "user_id": user_id, "username": usernames.get(user_id), "current_streak": score}
+    
+    return {
+        "total": standings.total,
+        "top": [describe(entry) for entry in standings.top],
+        "me": describe(standings.me) if standings.me else None,
+        "around_me": [describe(entry) for entry in standings.around]
+    }
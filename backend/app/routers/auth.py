@@ -1,22 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.auth import Principal, password_hasher, create_access_token, get_current_user
 from app.config import settings
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
+    result = await db.execute(
+        select(User).where(
+            (User.email == user_data.email) | (User.username == user_data.username)
+        )
+    )
+    existing_user = result.scalars().first()
     
     if existing_user:
         if existing_user.email == user_data.email:
@@ -31,7 +35,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -43,18 +47,26 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
     # Find user by email
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    result = await db.execute(select(User).where(User.email == user_credentials.email))
+    user = result.scalars().first()
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if user:
+        verified, new_hash = await password_hasher.verify_and_update(
+            user_credentials.password, user.hashed_password
+        )
+    else:
+        verified, new_hash = False, None
+    
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -67,6 +79,12 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user"
         )
     
+    # Transparently upgrade hashes created with an older cost
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(user)
+    
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -81,7 +99,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(current_user: User = Depends(get_current_user)):
+async def refresh_token(current_user: Principal = Depends(get_current_user)):
     """Refresh access token"""
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
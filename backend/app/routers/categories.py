@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db
-from app.models.user import User
+from app.database import get_async_db
 from app.models.category import Category
+from app.models.habit import Habit
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
-from app.auth import get_current_user
+from app.auth import Principal, get_current_user
+from app.cache import analytics_cache
+from app.etags import conditional_get
+from app.serialization import orm_response
+from app.services.sync import record_deletions
+from app.tasks import enqueue
+from app.tasks.leaderboard import refresh_streak_leaderboard
 
 router = APIRouter()
 
 @router.post("/", response_model=CategoryResponse)
 async def create_category(
     category_data: CategoryCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new category"""
     db_category = Category(
@@ -22,34 +29,42 @@ async def create_category(
     )
     
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
+    await analytics_cache.bump(current_user.id)
     
     return db_category
 
-@router.get("/", response_model=List[CategoryResponse])
+@router.get("/", response_model=List[CategoryResponse], dependencies=[Depends(conditional_get)])
 async def get_categories(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all categories for the current user"""
-    categories = db.query(Category).filter(
-        Category.user_id == current_user.id
-    ).all()
+    result = await db.execute(
+        select(Category).where(
+            Category.user_id == current_user.id
+        )
+    )
+    categories = result.scalars().all()
     
-    return categories
+    return orm_response(CategoryResponse, categories, response)
 
-@router.get("/{category_id}", response_model=CategoryResponse)
+@router.get("/{category_id}", response_model=CategoryResponse, dependencies=[Depends(conditional_get)])
 async def get_category(
     category_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific category by ID"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Category).where(
+            Category.id == category_id,
+            Category.user_id == current_user.id
+        )
+    )
+    category = result.scalars().first()
     
     if not category:
         raise HTTPException(
@@ -63,14 +78,17 @@ async def get_category(
 async def update_category(
     category_id: int,
     category_data: CategoryUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a category"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Category).where(
+            Category.id == category_id,
+            Category.user_id == current_user.id
+        )
+    )
+    category = result.scalars().first()
     
     if not category:
         raise HTTPException(
@@ -83,22 +101,26 @@ async def update_category(
     for field, value in update_data.items():
         setattr(category, field, value)
     
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    await analytics_cache.bump(current_user.id)
     
     return category
 
 @router.delete("/{category_id}")
 async def delete_category(
     category_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a category"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Category).where(
+            Category.id == category_id,
+            Category.user_id == current_user.id
+        )
+    )
+    category = result.scalars().first()
     
     if not category:
         raise HTTPException(
@@ -106,7 +128,16 @@ async def delete_category(
             detail="Category not found"
         )
     
-    db.delete(category)
-    db.commit()
+    # The category's habits are deleted with it
+    habit_ids = await db.scalars(select(Habit.id).where(Habit.category_id == category.id))
+    habit_ids = habit_ids.all()
+    record_deletions(db, current_user.id, "habits", habit_ids)
+    record_deletions(db, current_user.id, "categories", [category.id])
+    
+    await db.delete(category)
+    await db.commit()
+    await analytics_cache.bump(current_user.id)
+    if habit_ids:
+        await enqueue(refresh_streak_leaderboard, current_user.id)
     
     return {"message": "Category deleted successfully"}
@@ -0,0 +1,189 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import List, Optional
+from app.database import get_async_db
+from app.models.category import Category
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.schemas.goal import GoalCreate, GoalUpdate, GoalResponse
+from app.auth import Principal, get_current_user
+from app.cache import analytics_cache
+from app.etags import conditional_get
+from app.serialization import orm_response
+from app.services.achievements import record_goal_completions
+from app.services.goals import settle_goal
+from app.services.rollups import local_today
+from app.services.sync import record_deletions
+
+router = APIRouter()
+
+async def check_goal_link(db: AsyncSession, user_id: int, habit_id: Optional[int], category_id: Optional[int]):
+    """A goal links at most one of the user's own habits or categories"""
+    if habit_id is not None and category_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A goal can be linked to a habit or a category, not both"
+        )
+    
+    if habit_id is not None:
+        owned = await db.scalar(select(Habit.id).where(Habit.id == habit_id, Habit.user_id == user_id))
+        if owned is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Habit not found"
+            )
+    
+    if category_id is not None:
+        owned = await db.scalar(select(Category.id).where(Category.id == category_id, Category.user_id == user_id))
+        if owned is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found"
+            )
+
+@router.post("/", response_model=GoalResponse)
+async def create_goal(
+    goal_data: GoalCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new goal
+    
+    A goal linked to a habit or category counts its completions from
+    start_date on; current_value of other goals is set by hand.
+    """
+    await check_goal_link(db, current_user.id, goal_data.habit_id, goal_data.category_id)
+    
+    db_goal = Goal(
+        **goal_data.dict(exclude={"start_date"}),
+        start_date=goal_data.start_date or local_today(current_user.timezone),
+        user_id=current_user.id
+    )
+    if db_goal.habit_id is not None or db_goal.category_id is not None:
+        db_goal.current_value = 0
+    
+    db.add(db_goal)
+    await db.flush()
+    await db.run_sync(settle_goal, db_goal.id)
+    await db.commit()
+    await db.refresh(db_goal)
+    await analytics_cache.bump(current_user.id)
+    
+    return db_goal
+
+@router.get("/", response_model=List[GoalResponse], dependencies=[Depends(conditional_get)])
+async def get_goals(
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all goals for the current user"""
+    result = await db.execute(
+        select(Goal).where(
+            Goal.user_id == current_user.id
+        ).order_by(Goal.id)
+    )
+    goals = result.scalars().all()
+    
+    return orm_response(GoalResponse, goals, response)
+
+@router.get("/{goal_id}", response_model=GoalResponse, dependencies=[Depends(conditional_get)])
+async def get_goal(
+    goal_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a specific goal by ID"""
+    result = await db.execute(
+        select(Goal).where(
+            Goal.id == goal_id,
+            Goal.user_id == current_user.id
+        )
+    )
+    goal = result.scalars().first()
+    
+    if not goal:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Goal not found"
+        )
+    
+    return goal
+
+@router.put("/{goal_id}", response_model=GoalResponse)
+async def update_goal(
+    goal_id: int,
+    goal_data: GoalUpdate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update a goal"""
+    result = await db.execute(
+        select(Goal).where(
+            Goal.id == goal_id,
+            Goal.user_id == current_user.id
+        )
+    )
+    goal = result.scalars().first()
+    
+    if not goal:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Goal not found"
+        )
+    
+    # Update only provided fields
+    update_data = goal_data.dict(exclude_unset=True)
+    if "current_value" in update_data and (goal.habit_id is not None or goal.category_id is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Progress of a linked goal is counted from its habit completions"
+        )
+    for field, value in update_data.items():
+        setattr(goal, field, value)
+    
+    completed_by_hand = bool(goal.is_completed) and goal.completed_at is None
+    if completed_by_hand:
+        goal.completed_at = datetime.now(timezone.utc)
+    elif not goal.is_completed:
+        goal.completed_at = None
+    
+    await db.flush()
+    await db.run_sync(settle_goal, goal.id)
+    if completed_by_hand:
+        await db.run_sync(record_goal_completions, [goal])
+    await db.commit()
+    await db.refresh(goal)
+    await analytics_cache.bump(current_user.id)
+    
+    return goal
+
+@router.delete("/{goal_id}")
+async def delete_goal(
+    goal_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a goal"""
+    result = await db.execute(
+        select(Goal).where(
+            Goal.id == goal_id,
+            Goal.user_id == current_user.id
+        )
+    )
+    goal = result.scalars().first()
+    
+    if not goal:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Goal not found"
+        )
+    
+    await db.delete(goal)
+    record_deletions(db, current_user.id, "goals", [goal.id])
+    await db.commit()
+    await analytics_cache.bump(current_user.id)
+    
+    return {"message": "Goal deleted successfully"}
@@ -1,57 +1,124 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models.user import User
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
+from typing import List, Optional
+from app.config import settings
+from app.cursors import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.database import get_async_db
 from app.models.habit import Habit
+from app.models.habit_log import HabitLog
 from app.schemas.habit import HabitCreate, HabitUpdate, HabitResponse, HabitWithLogs
-from app.auth import get_current_user
+from app.schemas.habit_log import HabitLogBatch, HabitLogBatchResponse, HabitLogResponse
+from app.auth import Principal, get_current_user
+from app.cache import analytics_cache
+from app.etags import conditional_get
+from app.serialization import FastJSONResponse, dump_orm, orm_response
+from app.services.habit_logs import ingest_habit_logs
+from app.services.reminders import next_reminder
+from app.services.rollups import user_zone
+from app.services.sync import record_deletions
+from app.tasks import enqueue
+from app.tasks.habit_logs import process_habit_logs
+from app.tasks.leaderboard import refresh_streak_leaderboard
 
 router = APIRouter()
 
+# Logs embedded in the habit detail; older ones are paged through /logs
+RECENT_LOGS_LIMIT = 30
+MAX_PAGE_SIZE = 500
+
+def recent_logs_query(habit_id: int):
+    """A habit's logs newest first, in (completed_at, id) keyset order"""
+    return select(HabitLog).where(
+        HabitLog.habit_id == habit_id
+    ).order_by(HabitLog.completed_at.desc(), HabitLog.id.desc())
+
 @router.post("/", response_model=HabitResponse)
 async def create_habit(
     habit_data: HabitCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new habit"""
     db_habit = Habit(
         **habit_data.dict(),
         user_id=current_user.id
     )
+    db_habit.next_reminder_at = next_reminder(db_habit, user_zone(current_user.timezone), datetime.now(timezone.utc))
     
     db.add(db_habit)
-    db.commit()
-    db.refresh(db_habit)
+    await db.commit()
+    await db.refresh(db_habit)
+    await analytics_cache.bump(current_user.id)
     
     return db_habit
 
-@router.get("/", response_model=List[HabitResponse])
+@router.post("/logs:batch", response_model=HabitLogBatchResponse)
+async def create_habit_logs_batch(
+    batch: HabitLogBatch,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record a batch of habit completions queued offline
+    
+    Each log carries a client_key; logs already received under the same
+    key are reported as duplicates, so a failed upload can be retried as is.
+    """
+    results = await db.run_sync(ingest_habit_logs, current_user.id, batch.logs)
+    await db.commit()
+    await analytics_cache.bump(current_user.id)
+    
+    # Streaks and the rest of the fan-out run in the background
+    if any(result.status == "created" for result in results):
+        await enqueue(process_habit_logs, current_user.id)
+    
+    return {"results": results}
+
+@router.get("/", response_model=List[HabitResponse], dependencies=[Depends(conditional_get)])
 async def get_habits(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
 ):
-    """Get all habits for the current user"""
-    habits = db.query(Habit).filter(
-        Habit.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    """Get all habits for the current user
     
-    return habits
+    Pages by skip, or by the cursor from the previous page's X-Next-Cursor
+    header, which stays cheap however deep the page.
+    """
+    query = select(Habit).where(Habit.user_id == current_user.id)
+    if cursor is not None:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(Habit.id > last_id)
+    else:
+        query = query.offset(skip)
+    
+    result = await db.execute(query.order_by(Habit.id).limit(limit))
+    habits = result.scalars().all()
+    
+    if len(habits) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(habits[-1].id)
+    
+    return orm_response(HabitResponse, habits, response)
 
-@router.get("/{habit_id}", response_model=HabitWithLogs)
+@router.get("/{habit_id}", response_model=HabitWithLogs, dependencies=[Depends(conditional_get)])
 async def get_habit(
     habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a specific habit by ID"""
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    """Get a specific habit by ID with its most recent logs"""
+    result = await db.execute(
+        select(Habit).where(
+            Habit.id == habit_id,
+            Habit.user_id == current_user.id
+        )
+    )
+    habit = result.scalars().first()
     
     if not habit:
         raise HTTPException(
@@ -59,20 +126,32 @@ async def get_habit(
             detail="Habit not found"
         )
     
-    return habit
+    result = await db.execute(recent_logs_query(habit.id).limit(RECENT_LOGS_LIMIT))
+    logs = result.scalars().all()
+    
+    if settings.FAST_JSON:
+        return FastJSONResponse({
+            **dump_orm(HabitResponse, habit),
+            "habit_logs": [dump_orm(HabitLogResponse, log) for log in logs]
+        }, headers=dict(response.headers))
+    
+    return HabitWithLogs(**HabitResponse.model_validate(habit).model_dump(), habit_logs=logs)
 
 @router.put("/{habit_id}", response_model=HabitResponse)
 async def update_habit(
     habit_id: int,
     habit_data: HabitUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a habit"""
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Habit).where(
+            Habit.id == habit_id,
+            Habit.user_id == current_user.id
+        )
+    )
+    habit = result.scalars().first()
     
     if not habit:
         raise HTTPException(
@@ -84,23 +163,31 @@ async def update_habit(
     update_data = habit_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(habit, field, value)
+    if "reminder_time" in update_data or "is_active" in update_data:
+        habit.next_reminder_at = next_reminder(habit, user_zone(current_user.timezone), datetime.now(timezone.utc))
     
-    db.commit()
-    db.refresh(habit)
+    await db.commit()
+    await db.refresh(habit)
+    await analytics_cache.bump(current_user.id)
+    if "is_active" in update_data:
+        await enqueue(refresh_streak_leaderboard, current_user.id)
     
     return habit
 
 @router.delete("/{habit_id}")
 async def delete_habit(
     habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a habit"""
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Habit).where(
+            Habit.id == habit_id,
+            Habit.user_id == current_user.id
+        )
+    )
+    habit = result.scalars().first()
     
     if not habit:
         raise HTTPException(
@@ -108,22 +195,34 @@ async def delete_habit(
             detail="Habit not found"
         )
     
-    db.delete(habit)
-    db.commit()
+    await db.delete(habit)
+    record_deletions(db, current_user.id, "habits", [habit.id])
+    await db.commit()
+    await analytics_cache.bump(current_user.id)
+    await enqueue(refresh_streak_leaderboard, current_user.id)
     
     return {"message": "Habit deleted successfully"}
 
-@router.get("/{habit_id}/logs")
+@router.get("/{habit_id}/logs", response_model=List[HabitLogResponse], dependencies=[Depends(conditional_get)])
 async def get_habit_logs(
     habit_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
 ):
-    """Get logs for a specific habit"""
-    habit = db.query(Habit).filter(
-        Habit.id == habit_id,
-        Habit.user_id == current_user.id
-    ).first()
+    """Get logs for a specific habit, newest first
+    
+    Pass the X-Next-Cursor header of a page as cursor to get the next one.
+    """
+    result = await db.execute(
+        select(Habit).where(
+            Habit.id == habit_id,
+            Habit.user_id == current_user.id
+        )
+    )
+    habit = result.scalars().first()
     
     if not habit:
         raise HTTPException(
@@ -131,4 +230,15 @@ async def get_habit_logs(
             detail="Habit not found"
         )
     
-    return habit.habit_logs
+    query = recent_logs_query(habit.id)
+    if cursor is not None:
+        completed_at, log_id = decode_cursor(cursor, datetime, int)
+        query = query.where(tuple_(HabitLog.completed_at, HabitLog.id) < tuple_(completed_at, log_id))
+    
+    result = await db.execute(query.limit(limit))
+    logs = result.scalars().all()
+    
+    if len(logs) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].completed_at, logs[-1].id)
+    
+    return orm_response(HabitLogResponse, logs, response)
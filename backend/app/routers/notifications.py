@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.cursors import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.database import get_async_db
+from app.models.notification import Notification
+from app.schemas.notification import (
+    NotificationMarkRead, NotificationReadResponse, NotificationResponse, UnreadCountResponse
+)
+from app.auth import Principal, get_current_user
+from app.serialization import orm_response
+from app.services.notifications import delete_notification, mark_read, unread_count
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 200
+
+@router.get("/", response_model=List[NotificationResponse])
+async def get_notifications(
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    unread_only: bool = False,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Get the current user's notifications, newest first
+    
+    Pass the X-Next-Cursor header of a page as cursor to get the next one.
+    """
+    query = select(Notification).where(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.is_read == False)
+    if cursor is not None:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(Notification.id < last_id)
+    
+    result = await db.execute(query.order_by(Notification.id.desc()).limit(limit))
+    notifications = result.scalars().all()
+    
+    if len(notifications) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(notifications[-1].id)
+    
+    return orm_response(NotificationResponse, notifications, response)
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the number of unread notifications, for the badge"""
+    return {"unread": await db.run_sync(unread_count, current_user.id)}
+
+@router.post("/mark-read", response_model=NotificationReadResponse)
+async def mark_notifications_read(
+    selection: NotificationMarkRead,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mark notifications read
+    
+    Pass the id of the newest notification the user has seen as up_to_id
+    to mark it and everything older read.
+    """
+    marked = await db.run_sync(mark_read, current_user.id, selection.up_to_id, selection.ids)
+    await db.commit()
+    
+    return {"marked_read": marked, "unread": await db.run_sync(unread_count, current_user.id)}
+
+@router.delete("/{notification_id}")
+async def delete_user_notification(
+    notification_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a notification"""
+    deleted = await db.run_sync(delete_notification, current_user.id, notification_id)
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notification not found"
+        )
+    
+    await db.commit()
+    
+    return {"message": "Notification deleted successfully"}
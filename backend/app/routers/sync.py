@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import settings
+from app.cursors import decode_cursor, encode_cursor
+from app.database import get_async_db
+from app.models.tombstone import Tombstone
+from app.schemas.sync import SyncResponse
+from app.auth import Principal, get_current_user
+from app.serialization import orm_response
+from app.services.rollups import compacted_before
+from app.services.sync import SYNC_MODELS
+
+router = APIRouter()
+
+# Upper bound for the rows in one sync page
+MAX_SYNC_PAGE_SIZE = 5000
+
+# Page cursors: (sync time, full, changed since, collection, last id)
+PAGE_CURSOR_TYPES = (datetime, bool, datetime, str, int)
+
+@router.get("", response_model=SyncResponse)
+async def sync_changes(
+    since: Optional[str] = None,
+    page: Optional[str] = None,
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=MAX_SYNC_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get everything created, updated or deleted since a cursor
+    
+    Without a cursor, or with one older than the tombstone retention, the
+    whole account is returned with full set. Rows changed shortly before
+    the cursor may be sent again; clients apply them as upserts. Habit
+    logs completed before compacted_before are never sent, so a full sync
+    replaces local logs only from there on and keeps the older ones.
+    
+    Rows come limit at a time, collection by collection in id order.
+    While has_more is set, fetch the rest with page=next_page; the pages
+    together make up one sync, so keep cursor, the same on each page, for
+    the next sync only once the last page is in. Rows changed while paging
+    are sent again by that next sync. Deletions come with the first page.
+    """
+    if page is not None:
+        now, full, changed_since, collection, last_id = decode_cursor(page, *PAGE_CURSOR_TYPES)
+        if collection not in SYNC_MODELS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        if full:
+            changed_since = None
+    else:
+        # The database clock stamps updated_at, so it also stamps the cursor
+        now = await db.scalar(select(func.now()))
+        collection, last_id = next(iter(SYNC_MODELS)), 0
+    
+        changed_since = None
+        if since is not None:
+            (cursor_time,) = decode_cursor(since, datetime)
+            if cursor_time > now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+                changed_since = cursor_time - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    
+    names = list(SYNC_MODELS)
+    changes = {name: [] for name in names}
+    next_page = None
+    remaining = limit
+    for name in names[names.index(collection):]:
+        model = SYNC_MODELS[name]
+        query = select(model).where(model.user_id == current_user.id)
+        if changed_since is not None:
+            query = query.where(model.updated_at >= changed_since)
+        if name == collection:
+            query = query.where(model.id > last_id)
+        result = await db.execute(query.order_by(model.id).limit(remaining + 1))
+        rows = result.scalars().all()
+    
+        changes[name] = rows[:remaining]
+        remaining -= len(changes[name])
+        if remaining == 0 and (len(rows) > len(changes[name]) or name != names[-1]):
+            # Filling the page with a collection's last row costs an empty page at worst
+            next_page = encode_cursor(
+                now, changed_since is None, changed_since or now, name, changes[name][-1].id
+            )
+            break
+    
+    deleted = {name: [] for name in SYNC_MODELS}
+    if changed_since is not None and page is None:
+        result = await db.execute(
+            select(Tombstone.entity, Tombstone.entity_id).where(
+                Tombstone.user_id == current_user.id,
+                Tombstone.deleted_at >= changed_since
+            )
+        )
+        for entity, entity_id in result:
+            deleted[entity].append(entity_id)
+    
+    horizon = await db.run_sync(compacted_before)
+    
+    return orm_response(SyncResponse, {
+        "cursor": encode_cursor(now),
+        "full": changed_since is None,
+        "compacted_before": horizon,
+        "has_more": next_page is not None,
+        "next_page": next_page,
+        **changes,
+        "deleted": deleted
+    })
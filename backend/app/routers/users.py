@@ -1,41 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import SessionLocal, get_async_db
 from app.models.user import User
+from app.schemas.data_import import ImportSummary
 from app.schemas.user import UserUpdate, UserResponse
-from app.auth import get_current_user, get_password_hash
+from app.auth import Principal, get_current_user, get_password_hash, principal_cache
+from app.cache import analytics_cache
+from app.services.data_import import import_data
+from app.services.export import stream_export
+from app.services.reminders import reschedule_reminders
+from app.tasks import enqueue
+from app.tasks.leaderboard import refresh_streak_leaderboard
 
 router = APIRouter()
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+async def get_user_row(current_user: Principal, db: AsyncSession) -> User:
+    """Load the ORM row behind a cached principal for writes"""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    return user
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: Principal = Depends(get_current_user)):
     """Get current user information"""
     return current_user
 
+@router.get("/me/export")
+async def export_current_user_data(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = Query(False, description="Compress the download with gzip"),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Download the current user's habits, logs, mood entries, goals and
+    achievements
+    
+    The export is streamed as it is read, so it starts at once and takes
+    constant memory however large the account is.
+    """
+    filename = f"kultivate-export-{datetime.now(timezone.utc):%Y%m%d}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(current_user.id, format, compress=gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def import_upload(user_id: int, upload, format: str) -> ImportSummary:
+    """Run an import on a sync session, whose psycopg2 connection can COPY"""
+    db = SessionLocal()
+    try:
+        return import_data(db, user_id, upload, format)
+    finally:
+        db.close()
+
+@router.post("/me/import", response_model=ImportSummary)
+async def import_current_user_data(
+    file: UploadFile = File(..., description="NDJSON or CSV in the export format, optionally gzipped"),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: Principal = Depends(get_current_user)
+):
+    """Import habits, habit logs and mood entries, e.g. from another tracker
+    
+    The upload is parsed as a stream and loaded in chunked transactions;
+    streaks and achievements are recomputed once at the end. Chunks are
+    committed independently: if one fails, complete is False and the
+    counts cover only the chunks committed before it.
+    """
+    summary = await run_in_threadpool(import_upload, current_user.id, file.file, format)
+    await enqueue(refresh_streak_leaderboard, current_user.id)
+    await analytics_cache.bump(current_user.id)
+    
+    return summary
+
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_data: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user information"""
+    user = await get_user_row(current_user, db)
+    
     # Update only provided fields
     update_data = user_data.dict(exclude_unset=True)
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
+    if "timezone" in update_data:
+        # Reminders fire at local times
+        await db.flush()
+        await db.run_sync(reschedule_reminders, user.id)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(user)
+    await principal_cache.invalidate(current_user.email)
+    # Analytics are dated in the user's timezone
+    await analytics_cache.bump(current_user.id)
     
-    return current_user
+    return user
 
 @router.delete("/me")
 async def delete_current_user(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete current user account"""
-    db.delete(current_user)
-    db.commit()
+    user = await get_user_row(current_user, db)
+    
+    await db.delete(user)
+    await db.commit()
+    await principal_cache.invalidate(current_user.email)
+    await enqueue(refresh_streak_leaderboard, current_user.id)
     
     return {"message": "User account deleted successfully"}
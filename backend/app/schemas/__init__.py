@@ -1,18 +1,24 @@
 from .user import UserCreate, UserUpdate, UserResponse, UserLogin, Token
 from .habit import HabitCreate, HabitUpdate, HabitResponse, HabitWithLogs
-from .habit_log import HabitLogCreate, HabitLogUpdate, HabitLogResponse
+from .habit_log import (
+    HabitLogCreate, HabitLogUpdate, HabitLogResponse,
+    HabitLogBatch, HabitLogBatchItem, HabitLogBatchResult, HabitLogBatchResponse
+)
 from .category import CategoryCreate, CategoryUpdate, CategoryResponse
 from .streak import StreakResponse
 from .achievement import AchievementResponse
 from .mood_entry import MoodEntryCreate, MoodEntryUpdate, MoodEntryResponse
 from .goal import GoalCreate, GoalUpdate, GoalResponse
+from .sync import SyncDeleted, SyncResponse
 
 __all__ = [
     "UserCreate", "UserUpdate", "UserResponse", "UserLogin", "Token",
     "HabitCreate", "HabitUpdate", "HabitResponse", "HabitWithLogs",
     "HabitLogCreate", "HabitLogUpdate", "HabitLogResponse",
+    "HabitLogBatch", "HabitLogBatchItem", "HabitLogBatchResult", "HabitLogBatchResponse",
     "CategoryCreate", "CategoryUpdate", "CategoryResponse",
     "StreakResponse", "AchievementResponse",
     "MoodEntryCreate", "MoodEntryUpdate", "MoodEntryResponse",
-    "GoalCreate", "GoalUpdate", "GoalResponse"
+    "GoalCreate", "GoalUpdate", "GoalResponse",
+    "SyncDeleted", "SyncResponse"
 ]
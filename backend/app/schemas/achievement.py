@@ -5,6 +5,7 @@ from datetime import datetime
 class AchievementResponse(BaseModel):
     id: int
     user_id: int
+    code: Optional[str] = None
     title: str
     description: Optional[str] = None
     icon: Optional[str] = None
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from .habit import HabitBase
+from .habit_log import HabitLogBase
+from .mood_entry import MoodEntryBase
+
+class HabitImport(HabitBase):
+    id: int  # Id in the uploaded file, linking the habit's logs
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+
+class HabitLogImport(HabitLogBase):
+    habit_id: int  # Habit id in the uploaded file
+    completed_at: datetime  # Naive times are UTC
+    is_completed: bool = True
+    client_key: Optional[str] = Field(None, max_length=64)
+
+class MoodEntryImport(MoodEntryBase):
+    recorded_at: datetime  # Naive times are UTC
+
+class ImportSummary(BaseModel):
+    habits: int = 0
+    habit_logs: int = 0
+    mood_entries: int = 0
+    duplicates: int = 0  # Logs already imported under the same client_key
+    ignored: int = 0  # Records of collections that are not imported
+    rejected: int = 0
+    errors: List[str] = []  # The first few rejections, then why the import stopped early
+    chunks: int = 0  # Transactions committed; each stays if a later one fails
+    complete: bool = True  # False when the import stopped early; counts cover committed chunks only
@@ -9,9 +9,12 @@ class GoalBase(BaseModel):
     current_value: Optional[float] = 0
     unit: Optional[str] = None
     deadline: Optional[date] = None
+    habit_id: Optional[int] = None
+    category_id: Optional[int] = None
 
 class GoalCreate(GoalBase):
-    pass
+    # First day counted towards a linked goal; defaults to the user's today
+    start_date: Optional[date] = None
 
 class GoalUpdate(BaseModel):
     title: Optional[str] = None
@@ -25,6 +28,7 @@ class GoalUpdate(BaseModel):
 class GoalResponse(GoalBase):
     id: int
     user_id: int
+    start_date: Optional[date] = None
     is_completed: bool
     completed_at: Optional[datetime] = None
     progress_percentage: float
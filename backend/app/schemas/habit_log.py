@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
+from app.config import settings
 
 class HabitLogBase(BaseModel):
     notes: Optional[str] = None
@@ -27,3 +28,20 @@ class HabitLogResponse(HabitLogBase):
     
     class Config:
         from_attributes = True
+
+class HabitLogBatchItem(HabitLogCreate):
+    client_key: str = Field(..., min_length=1, max_length=64)
+    completed_at: datetime  # Naive times are UTC; retries must resend the same time
+    is_completed: bool = True
+
+class HabitLogBatch(BaseModel):
+    logs: List[HabitLogBatchItem] = Field(..., min_length=1, max_length=settings.HABIT_LOG_BATCH_MAX_ITEMS)
+
+class HabitLogBatchResult(BaseModel):
+    client_key: str
+    status: str  # created, duplicate or rejected
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class HabitLogBatchResponse(BaseModel):
+    results: List[HabitLogBatchResult]
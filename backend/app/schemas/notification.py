@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from app.models.notification import NotificationType
+
+class NotificationResponse(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    message: Optional[str] = None
+    notification_type: NotificationType
+    is_read: bool
+    read_at: Optional[datetime] = None
+    data: Optional[str] = None  # JSON string
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class NotificationMarkRead(BaseModel):
+    """Filters combine; without any, every unread notification is marked"""
+    up_to_id: Optional[int] = None
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=500)
+
+class NotificationReadResponse(BaseModel):
+    marked_read: int
+    unread: int
+
+class UnreadCountResponse(BaseModel):
+    unread: int
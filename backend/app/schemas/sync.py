@@ -0,0 +1,29 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List, Optional
+from .habit import HabitResponse
+from .habit_log import HabitLogResponse
+from .category import CategoryResponse
+from .mood_entry import MoodEntryResponse
+from .goal import GoalResponse
+
+class SyncDeleted(BaseModel):
+    """Ids deleted since the cursor; logs of a deleted habit go with it"""
+    habits: List[int] = []
+    categories: List[int] = []
+    habit_logs: List[int] = []
+    mood_entries: List[int] = []
+    goals: List[int] = []
+
+class SyncResponse(BaseModel):
+    cursor: str  # Pass as since once has_more is False
+    full: bool  # True when the client must replace its local state with all pages
+    compacted_before: Optional[datetime] = None  # Logs completed before this are not sent; a full sync keeps local ones
+    has_more: bool
+    next_page: Optional[str] = None  # Pass as page while has_more is True
+    habits: List[HabitResponse]
+    categories: List[CategoryResponse]
+    habit_logs: List[HabitLogResponse]
+    mood_entries: List[MoodEntryResponse]
+    goals: List[GoalResponse]
+    deleted: SyncDeleted
@@ -0,0 +1,280 @@
+"""
+Declarative achievement rules
+
+Each Rule is a threshold on one per-user counter kept in user_counters
+(completions, longest streak, completions in the best category, goals
+completed) and names the events that can move that counter. Writers update
+the counters incrementally and pass the events that happened to
+evaluate_achievements, which checks only the rules listening for them and
+only achievements the user does not hold yet: a few indexed reads per
+batch of events, never a scan of the user's history.
+
+backfill_achievements rebuilds the counters from the rollup, habits and
+goals and checks every rule, for existing users and to correct drift
+(deleting logs does not lower the counters). Logs still waiting for
+process_pending_logs are in the rollup but not yet counted, so the rebuild
+leaves them out for that step to add. Unlocked achievements are never
+taken back.
+"""
+
+import json
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models.achievement import Achievement
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_daily_stat import HabitDailyStat
+from app.models.habit_log import HabitLog
+from app.models.notification import NotificationType
+from app.models.user import User
+from app.models.user_counter import UserCounter
+from app.services.counters import UPSERT_CHUNK_SIZE, CounterKey, add_to_counters, set_counters
+from app.services.notifications import notify
+
+# Events writers report
+LOG_CREATED = "log_created"
+STREAK_CHANGED = "streak_changed"
+GOAL_COMPLETED = "goal_completed"
+
+# Counters rules can test
+COMPLETIONS = "completions"
+LONGEST_STREAK = "longest_streak"
+GOALS_COMPLETED = "goals_completed"
+# Stored per category as "category_completions:<id>"; rules see the best one
+CATEGORY_COMPLETIONS = "category_completions"
+
+@dataclass(frozen=True)
+class Rule:
+    code: str
+    title: str
+    description: str
+    icon: str
+    points: int
+    counter: str
+    threshold: int
+    events: FrozenSet[str]
+
+RULES = [
+    Rule("first_completion", "First Step", "Complete a habit for the first time", "sprout", 10,
+         COMPLETIONS, 1, frozenset({LOG_CREATED})),
+    Rule("completions_100", "Centurion", "Complete habits 100 times", "award", 50,
+         COMPLETIONS, 100, frozenset({LOG_CREATED})),
+    Rule("completions_1000", "Habit Machine", "Complete habits 1,000 times", "crown", 200,
+         COMPLETIONS, 1000, frozenset({LOG_CREATED})),
+    Rule("streak_7", "On a Roll", "Keep a streak going for 7 periods", "flame", 25,
+         LONGEST_STREAK, 7, frozenset({STREAK_CHANGED})),
+    Rule("streak_30", "Unstoppable", "Keep a streak going for 30 periods", "zap", 100,
+         LONGEST_STREAK, 30, frozenset({STREAK_CHANGED})),
+    Rule("streak_100", "Legend", "Keep a streak going for 100 periods", "trophy", 300,
+         LONGEST_STREAK, 100, frozenset({STREAK_CHANGED})),
+    Rule("category_50", "Specialist", "Complete habits in one category 50 times", "target", 50,
+         CATEGORY_COMPLETIONS, 50, frozenset({LOG_CREATED})),
+    Rule("goal_1", "Goal Getter", "Complete a goal", "flag", 25,
+         GOALS_COMPLETED, 1, frozenset({GOAL_COMPLETED})),
+    Rule("goal_10", "Visionary", "Complete 10 goals", "mountain", 150,
+         GOALS_COMPLETED, 10, frozenset({GOAL_COMPLETED})),
+]
+
+def category_counter(category_id: int) -> str:
+    return f"{CATEGORY_COMPLETIONS}:{category_id}"
+
+def load_counters(db: Session, user_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """Counters by user, with the per-category ones folded into their best"""
+    counters: Dict[int, Dict[str, int]] = defaultdict(dict)
+    rows = db.execute(
+        select(UserCounter.user_id, UserCounter.name, UserCounter.value).where(UserCounter.user_id.in_(set(user_ids)))
+    )
+    for user_id, name, value in rows:
+        if name.startswith(CATEGORY_COMPLETIONS + ":"):
+            name = CATEGORY_COMPLETIONS
+            value = max(value, counters[user_id].get(name, 0))
+        counters[user_id][name] = value
+    return counters
+
+def evaluate_achievements(db: Session, events: Dict[int, Set[str]], now: Optional[datetime] = None) -> int:
+    """Unlock what the given users' events earned them
+
+    events maps user ids to the events that just happened. Returns the
+    number of achievements unlocked; each also gets a notification. The
+    caller commits.
+    """
+    candidates = {
+        user_id: [rule for rule in RULES if rule.events & user_events]
+        for user_id, user_events in events.items()
+    }
+    candidates = {user_id: rules for user_id, rules in candidates.items() if rules}
+    if not candidates:
+        return 0
+
+    codes = {rule.code for rules in candidates.values() for rule in rules}
+    held = set(db.execute(
+        select(Achievement.user_id, Achievement.code).where(
+            Achievement.user_id.in_(candidates.keys()),
+            Achievement.code.in_(codes),
+            Achievement.is_unlocked == True
+        )
+    ).all())
+    counters = load_counters(db, candidates.keys())
+
+    earned = [
+        (user_id, rule)
+        for user_id, rules in candidates.items()
+        for rule in rules
+        if (user_id, rule.code) not in held and counters[user_id].get(rule.counter, 0) >= rule.threshold
+    ]
+    return _unlock(db, earned, now or datetime.now(timezone.utc))
+
+def _unlock(db: Session, earned: List[Tuple[int, Rule]], now: datetime) -> int:
+    if not earned:
+        return 0
+
+    insert = dialect_insert(db.get_bind().dialect.name)
+    rules = {rule.code: rule for rule in RULES}
+    unlocked = []
+    for offset in range(0, len(earned), UPSERT_CHUNK_SIZE):
+        stmt = insert(Achievement).values([
+            {
+                "user_id": user_id,
+                "code": rule.code,
+                "title": rule.title,
+                "description": rule.description,
+                "icon": rule.icon,
+                "points": rule.points,
+                "is_unlocked": True,
+                "unlocked_at": now,
+            }
+            for user_id, rule in earned[offset:offset + UPSERT_CHUNK_SIZE]
+        ])
+        # Rows a concurrent evaluation already unlocked are left alone
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "code"],
+            set_={"is_unlocked": True, "unlocked_at": now},
+            where=Achievement.is_unlocked == False
+        )
+        unlocked += db.execute(stmt.returning(Achievement.id, Achievement.user_id, Achievement.code)).all()
+
+    notify(db, [
+        {
+            "user_id": user_id,
+            "title": f"Achievement unlocked: {rules[code].title}",
+            "message": rules[code].description,
+            "notification_type": NotificationType.ACHIEVEMENT,
+            "data": json.dumps({"achievement_id": achievement_id, "code": code, "points": rules[code].points}),
+        }
+        for achievement_id, user_id, code in unlocked
+    ])
+    return len(unlocked)
+
+def record_logs(db: Session, logs: Iterable):
+    """Count newly processed logs and evaluate the rules they can affect
+
+    Runs after the streak update in the same transaction, so the longest
+    streak counter sees the new streaks.
+    """
+    logs = list(logs)
+    if not logs:
+        return
+
+    categories = dict(db.execute(
+        select(Habit.id, Habit.category_id).where(Habit.id.in_({log.habit_id for log in logs}))
+    ).all())
+    deltas: Dict[CounterKey, int] = Counter()
+    for log in logs:
+        deltas[(log.user_id, COMPLETIONS)] += 1
+        category_id = categories.get(log.habit_id)
+        if category_id is not None:
+            deltas[(log.user_id, category_counter(category_id))] += 1
+    add_to_counters(db, deltas)
+
+    # Streak updates are still pending on the session's Habit instances
+    db.flush()
+    user_ids = {log.user_id for log in logs}
+    longest = db.execute(
+        select(Habit.user_id, func.max(Habit.longest_streak)).where(Habit.user_id.in_(user_ids)).group_by(Habit.user_id)
+    ).all()
+    set_counters(db, {(user_id, LONGEST_STREAK): value or 0 for user_id, value in longest})
+
+    evaluate_achievements(db, {user_id: {LOG_CREATED, STREAK_CHANGED} for user_id in user_ids})
+
+def record_goal_completions(db: Session, goals: Iterable):
+    """Count goals that just became completed and evaluate the goal rules"""
+    deltas: Dict[CounterKey, int] = Counter((goal.user_id, GOALS_COMPLETED) for goal in goals)
+    if not deltas:
+        return
+
+    add_to_counters(db, deltas)
+    evaluate_achievements(db, {user_id: {GOAL_COMPLETED} for user_id, _ in deltas})
+
+def _rebuild_counters(db: Session, first_id: int, last_id: int):
+    """Recompute every counter of users first_id..last_id from source tables"""
+    values: Dict[CounterKey, int] = {}
+    # Unprocessed logs are in the rollup already and get counted when
+    # processed; one statement reads both from the same snapshot
+    counted = union_all(
+        select(HabitDailyStat.user_id, HabitDailyStat.habit_id, HabitDailyStat.completion_count.label("count"))
+        .where(HabitDailyStat.user_id.between(first_id, last_id)),
+        select(HabitLog.user_id, HabitLog.habit_id, literal(-1).label("count"))
+        .where(HabitLog.user_id.between(first_id, last_id), HabitLog.processed_at.is_(None))
+    ).subquery()
+    completions = db.execute(
+        select(counted.c.user_id, Habit.category_id, func.sum(counted.c.count))
+        .join(Habit, Habit.id == counted.c.habit_id)
+        .group_by(counted.c.user_id, Habit.category_id)
+    )
+    for user_id, category_id, count in completions:
+        values[(user_id, COMPLETIONS)] = values.get((user_id, COMPLETIONS), 0) + count
+        if category_id is not None:
+            values[(user_id, category_counter(category_id))] = count
+
+    longest = db.execute(
+        select(Habit.user_id, func.max(Habit.longest_streak))
+        .where(Habit.user_id.between(first_id, last_id))
+        .group_by(Habit.user_id)
+    )
+    values.update({(user_id, LONGEST_STREAK): value or 0 for user_id, value in longest})
+
+    goals = db.execute(
+        select(Goal.user_id, func.count(Goal.id))
+        .where(Goal.user_id.between(first_id, last_id), Goal.is_completed == True)
+        .group_by(Goal.user_id)
+    )
+    values.update({(user_id, GOALS_COMPLETED): count for user_id, count in goals})
+
+    # Only the counters rules read; other services keep theirs in the same table
+    db.execute(delete(UserCounter).where(
+        UserCounter.user_id.between(first_id, last_id),
+        or_(
+            UserCounter.name.in_([COMPLETIONS, LONGEST_STREAK, GOALS_COMPLETED]),
+            UserCounter.name.like(CATEGORY_COMPLETIONS + ":%")
+        )
+    ))
+    set_counters(db, values)
+
+def backfill_achievements(db: Session, user_id: Optional[int] = None, users_per_batch: int = 5000) -> int:
+    """Rebuild counters and check every rule, a batch of users at a time
+
+    Returns the number of achievements unlocked. The caller commits;
+    batches are flushed as they go.
+    """
+    every_event = {event for rule in RULES for event in rule.events}
+    unlocked = 0
+    last_user_id = 0
+    while True:
+        users = select(User.id).where(User.id > last_user_id).order_by(User.id).limit(users_per_batch)
+        if user_id is not None:
+            users = users.where(User.id == user_id)
+        user_ids = db.execute(users).scalars().all()
+        if not user_ids:
+            return unlocked
+
+        last_user_id = user_ids[-1]
+        _rebuild_counters(db, user_ids[0], last_user_id)
+        unlocked += evaluate_achievements(db, {user: every_event for user in user_ids})
+        db.flush()
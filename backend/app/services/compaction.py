@@ -0,0 +1,82 @@
+"""
+Cold habit log history compaction
+
+Logs completed more than HABIT_LOG_HOT_MONTHS months ago (counted from the
+start of the month) are compacted: their days are rebuilt in
+habit_daily_stats one last time, repairing any drift while the logs still
+exist, the horizon is recorded, and the logs are then deleted. Analytics,
+streaks, goals and achievements all read the rollup, so they are
+unaffected; listing a habit's logs and full syncs only reach back to the
+horizon. Sync responses carry the horizon, and deleting compacted logs
+leaves no tombstones, so clients keep their own copies of older logs.
+
+On partitioned Postgres tables whole months are dropped; elsewhere, and
+for stray rows in the default partition, logs are deleted a batch at a
+time.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.habit_log import HabitLog
+from app.models.habit_log_compaction import HabitLogCompaction
+from app.services.partitions import add_months, drop_partitions_before, partition_bounds
+from app.services.rollups import compacted_before, rebuild_daily_stats
+
+habit_logs = HabitLog.__table__
+
+def compaction_horizon(now: Optional[datetime] = None) -> datetime:
+    """Logs completed before this are due for compaction"""
+    now = now or datetime.now(timezone.utc)
+    return partition_bounds(add_months(now.date(), -settings.HABIT_LOG_HOT_MONTHS))[0]
+
+def fold_cold_logs(db: Session, now: Optional[datetime] = None, batch_size: int = 10000) -> Optional[datetime]:
+    """Rebuild the rollup of the days newly past the horizon and record it
+
+    Days straddling either horizon also hold logs on the other side, so
+    they keep their incrementally maintained rows. Returns the new horizon,
+    or None when it has not moved; the caller commits.
+    """
+    horizon = compaction_horizon(now)
+    previous = compacted_before(db)
+    if previous is not None and previous >= horizon:
+        return None
+
+    rebuild_daily_stats(
+        db,
+        batch_size=batch_size,
+        first_day=previous.date() + timedelta(days=1) if previous is not None else None,
+        last_day=horizon.date() - timedelta(days=1)
+    )
+    db.add(HabitLogCompaction(compacted_before=horizon))
+    db.flush()
+    return horizon
+
+def drop_compacted_partitions(db: Session) -> int:
+    """Drop the monthly partitions wholly past the horizon; the caller commits"""
+    horizon = compacted_before(db)
+    if horizon is None:
+        return 0
+    return len(drop_partitions_before(db, horizon))
+
+def delete_compacted_logs(db: Session, limit: int = 5000) -> int:
+    """Delete up to limit processed logs past the horizon
+
+    Logs awaiting post-write processing are left for a later run. Returns
+    the number deleted; call again until it returns 0, committing in
+    between to keep transactions short.
+    """
+    horizon = compacted_before(db)
+    if horizon is None:
+        return 0
+
+    past = (habit_logs.c.completed_at < horizon, habit_logs.c.processed_at.is_not(None))
+    batch = select(habit_logs.c.id).where(*past).order_by(habit_logs.c.id).limit(limit)
+    return db.execute(
+        # The completed_at bound lets Postgres prune partitions
+        delete(habit_logs).where(habit_logs.c.id.in_(batch.scalar_subquery()), habit_logs.c.completed_at < horizon)
+    ).rowcount
@@ -0,0 +1,173 @@
+"""
+Correlation of habit completion with mood
+
+Every day of a user's window gets a completed flag per habit, from the
+habit_daily_stats rollup, and the day's average mood, sleep, stress and
+energy from mood_entries, both dated in the user's timezone and loaded with
+one query. Each habit is then set against each metric on the same day or
+up to max_lag days later:
+
+- r is the Pearson correlation of the completed flag with the metric
+- lift is the metric's mean on completed days minus its mean on the rest
+
+Both come from a few matrix products per lag over (habits x days) and
+(metrics x days) arrays, so a year of data takes milliseconds.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import String, func, null, select, type_coerce, union_all
+from sqlalchemy.orm import Session
+
+from app.models.habit import Habit
+from app.models.habit_daily_stat import HabitDailyStat
+from app.models.mood_entry import MoodEntry
+from app.services.rollups import local_bucket_start
+
+METRICS = {
+    "mood": MoodEntry.mood_rating,
+    "sleep": MoodEntry.sleep_hours,
+    "stress": MoodEntry.stress_level,
+    "energy": MoodEntry.energy_level,
+}
+
+# Pairs observed on fewer days report no r or lift
+MIN_OBSERVED_DAYS = 7
+
+@dataclass
+class DailyMatrices:
+    """completed is (habits, days) and metrics (len(METRICS), days), NaN
+    on days without a mood entry; column 0 is first_day"""
+    first_day: date
+    habit_ids: np.ndarray
+    completed: np.ndarray
+    metrics: np.ndarray
+
+def load_daily_matrices(db: Session, user_id: int, zone: ZoneInfo, first_day: date, last_day: date) -> DailyMatrices:
+    """A user's per-day completions and mood averages over first_day..last_day"""
+    mood_day = local_bucket_start(db.get_bind().dialect.name, "day", MoodEntry.recorded_at, zone)
+    habit_days = select(
+        HabitDailyStat.habit_id, type_coerce(HabitDailyStat.local_date, String), *[null() for _ in METRICS]
+    ).where(
+        HabitDailyStat.user_id == user_id,
+        HabitDailyStat.local_date >= first_day,
+        HabitDailyStat.local_date <= last_day,
+        HabitDailyStat.completion_count > 0
+    )
+    mood_days = select(
+        null(), mood_day, *[func.avg(column) for column in METRICS.values()]
+    ).where(
+        MoodEntry.user_id == user_id,
+        MoodEntry.recorded_at >= datetime.combine(first_day, time.min, tzinfo=zone),
+        MoodEntry.recorded_at < datetime.combine(last_day + timedelta(days=1), time.min, tzinfo=zone)
+    ).group_by(mood_day)
+    rows = db.execute(union_all(habit_days, mood_days)).all()
+
+    day_count = (last_day - first_day).days + 1
+    completed = np.zeros((0, day_count), dtype=bool)
+    metrics = np.full((len(METRICS), day_count), np.nan)
+    if not rows:
+        return DailyMatrices(first_day, np.empty(0, dtype=np.int64), completed, metrics)
+
+    habit_column, day_column, *metric_columns = zip(*rows)
+    # Days arrive as dates or, from SQLite, ISO strings; NumPy parses both
+    offsets = (np.array(day_column, dtype="datetime64[D]") - np.datetime64(first_day, "D")).astype(np.int64)
+    is_habit = np.array([habit_id is not None for habit_id in habit_column])
+
+    ids = np.array([habit_id for habit_id in habit_column if habit_id is not None], dtype=np.int64)
+    habit_ids = np.unique(ids)
+    completed = np.zeros((habit_ids.size, day_count), dtype=bool)
+    completed[np.searchsorted(habit_ids, ids), offsets[is_habit]] = True
+
+    values = np.array(metric_columns, dtype=np.float64)
+    metrics[:, offsets[~is_habit]] = values[:, ~is_habit]
+
+    return DailyMatrices(first_day, habit_ids, completed, metrics)
+
+def correlate(completed: np.ndarray, metrics: np.ndarray, max_lag: int = 0) -> Dict[str, np.ndarray]:
+    """r, lift, days_completed and days_observed of every habit against
+    every metric, each shaped (max_lag + 1, habits, metrics)
+
+    At lag k completion on day t is paired with the metric on day t + k;
+    days without a metric value are left out of that metric's pairs.
+    """
+    habit_count, day_count = completed.shape
+    shape = (max_lag + 1, habit_count, metrics.shape[0])
+    result = {
+        "r": np.full(shape, np.nan),
+        "lift": np.full(shape, np.nan),
+        "days_completed": np.zeros(shape, dtype=np.int64),
+        "days_observed": np.zeros(shape, dtype=np.int64),
+    }
+    flags = completed.astype(np.float64)
+
+    for lag in range(min(max_lag, day_count - 1) + 1):
+        x = flags[:, :day_count - lag]
+        y = metrics[:, lag:]
+        observed = ~np.isnan(y)
+        weights = observed.astype(np.float64)
+
+        n = weights.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_y = np.nansum(y, axis=1) / n
+            centered = np.where(observed, y - mean_y[:, None], 0.0)
+
+            done = x @ weights.T
+            # Sum of centered values on completed days; the rest sum to minus it
+            done_sum = x @ centered.T
+            var_x = done / n * (1 - done / n)
+            var_y = (centered * centered).sum(axis=1) / n
+            r = done_sum / n / np.sqrt(var_x * var_y)
+            lift = done_sum / done + done_sum / (n - done)
+
+        defined = (n >= MIN_OBSERVED_DAYS) & (done > 0) & (done < n) & (var_y > 0)
+        result["r"][lag] = np.where(defined, np.clip(r, -1.0, 1.0), np.nan)
+        result["lift"][lag] = np.where(defined, lift, np.nan)
+        result["days_completed"][lag] = done
+        result["days_observed"][lag] = np.broadcast_to(n, done.shape)
+
+    return result
+
+def user_correlations(db: Session, user_id: int, zone: ZoneInfo, today: date, days: int, max_lag: int = 0) -> List[Dict[str, Any]]:
+    """Habit/metric/lag pairs over the days ending today, strongest first;
+    pairs without enough data come last with r and lift None"""
+    matrices = load_daily_matrices(db, user_id, zone, today - timedelta(days=days - 1), today)
+    if matrices.habit_ids.size == 0:
+        return []
+
+    titles = dict(db.execute(
+        select(Habit.id, Habit.title).where(Habit.id.in_(matrices.habit_ids.tolist()))
+    ).all())
+    result = correlate(matrices.completed, matrices.metrics, max_lag)
+
+    habit_ids = matrices.habit_ids.tolist()
+    names = list(METRICS)
+    defined = ~np.isnan(result["r"])
+    r = np.where(defined, result["r"].round(3), 0.0).tolist()
+    lift = np.where(defined, result["lift"].round(2), 0.0).tolist()
+    defined = defined.tolist()
+    days_completed = result["days_completed"].tolist()
+    days_observed = result["days_observed"].tolist()
+
+    pairs = []
+    for lag in range(max_lag + 1):
+        for habit, habit_id in enumerate(habit_ids):
+            for metric, name in enumerate(names):
+                known = defined[lag][habit][metric]
+                pairs.append({
+                    "habit_id": habit_id,
+                    "title": titles.get(habit_id),
+                    "metric": name,
+                    "lag": lag,
+                    "r": r[lag][habit][metric] if known else None,
+                    "lift": lift[lag][habit][metric] if known else None,
+                    "days_completed": days_completed[lag][habit][metric],
+                    "days_observed": days_observed[lag][habit][metric],
+                })
+
+    pairs.sort(key=lambda pair: -abs(pair["r"]) if pair["r"] is not None else 1)
+    return pairs
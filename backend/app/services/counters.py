@@ -0,0 +1,40 @@
+"""
+Per-user counters kept in user_counters
+
+Writers add deltas in the transaction that changes what is counted, so
+readers get totals with a primary key lookup instead of an aggregate.
+"""
+
+from typing import Dict, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models.user_counter import UserCounter
+
+# Upserted rows per statement
+UPSERT_CHUNK_SIZE = 500
+
+CounterKey = Tuple[int, str]
+
+def _upsert_counters(db: Session, values: Dict[CounterKey, int], add: bool):
+    """Add values onto the counters (add=True) or overwrite them"""
+    if not values:
+        return
+
+    insert = dialect_insert(db.get_bind().dialect.name)
+    rows = [{"user_id": user_id, "name": name, "value": value} for (user_id, name), value in values.items()]
+    for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(UserCounter).values(rows[offset:offset + UPSERT_CHUNK_SIZE])
+        value = UserCounter.value + stmt.excluded.value if add else stmt.excluded.value
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "name"],
+            set_={"value": value, "updated_at": func.now()}
+        ))
+
+def add_to_counters(db: Session, deltas: Dict[CounterKey, int]):
+    _upsert_counters(db, deltas, add=True)
+
+def set_counters(db: Session, values: Dict[CounterKey, int]):
+    _upsert_counters(db, values, add=False)
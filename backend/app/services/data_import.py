@@ -0,0 +1,306 @@
+"""
+Bulk import of habits, logs and mood entries
+
+Uploads use the export format (see app.services.export): NDJSON records
+tagged with their collection, or sectioned CSV, optionally gzipped, so
+history from another tracker only has to be reshaped into it. Files are
+parsed as a stream and loaded IMPORT_CHUNK_SIZE rows per transaction; on
+Postgres logs and mood entries go in with COPY, elsewhere with multi-row
+and executemany INSERTs. Habit ids in the file only link logs to their
+habit, so a habit must come before its logs; imported habits get new ids.
+Logs completed before the compaction horizon are rejected, as their
+client_keys are gone and re-importing a file would count them twice.
+
+Logs are inserted already processed, and each chunk is folded into the
+rollup in its own transaction, so committed chunks stay if a later one
+fails: the import then stops, the summary counts only what was committed
+and says so, and streaks, achievements and reminders are recomputed for
+what landed. They are recomputed once at the end either way, not per log. Goals and
+achievements in the file are ignored, as both are derived here.
+"""
+
+import csv
+import gzip
+import io
+import logging
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Set
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models.habit import Habit
+from app.models.habit_log import HabitLog
+from app.models.mood_entry import MoodEntry
+from app.schemas.data_import import HabitImport, HabitLogImport, ImportSummary, MoodEntryImport
+from app.services.achievements import backfill_achievements
+from app.services.reminders import reschedule_reminders
+from app.services.rollups import apply_habit_logs, compacted_before
+from app.services.streaks import recompute_streaks
+
+# Imported collections in write order
+IMPORT_SCHEMAS = {
+    "habits": HabitImport,
+    "habit_logs": HabitLogImport,
+    "mood_entries": MoodEntryImport,
+}
+
+# Rows per multi-row INSERT outside Postgres
+INSERT_CHUNK_SIZE = 500
+
+MAX_REPORTED_ERRORS = 20
+
+logger = logging.getLogger(__name__)
+
+LOG_COLUMNS = [
+    "user_id", "habit_id", "completed_at", "notes", "mood_rating", "completion_time",
+    "is_completed", "quality_rating", "client_key", "processed_at",
+]
+MOOD_COLUMNS = [
+    "user_id", "mood_rating", "mood_emoji", "notes", "activities",
+    "sleep_hours", "stress_level", "energy_level", "recorded_at",
+]
+
+habits = Habit.__table__
+habit_logs = HabitLog.__table__
+mood_entries = MoodEntry.__table__
+
+class Record(NamedTuple):
+    number: int  # Line of the upload the record starts on
+    collection: Optional[str]
+    fields: dict
+    error: Optional[str] = None
+
+def _utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def _text(stream: BinaryIO) -> io.TextIOWrapper:
+    """The upload as text, gunzipped when it starts with the gzip magic"""
+    magic = stream.read(2)
+    stream.seek(0)
+    if magic == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+def read_records(stream: BinaryIO, format: str) -> Iterator[Record]:
+    """Records of an NDJSON or sectioned CSV upload, one at a time"""
+    lines = _text(stream)
+    if format == "csv":
+        reader = csv.reader(lines)
+        header = None
+        number = 1
+        for row in reader:
+            if row and row[0] == "collection":
+                header = row
+            elif row and header is None:
+                yield Record(number, None, {}, "Row before any header row")
+            elif row:
+                # Empty cells are missing values
+                fields = {key: value for key, value in zip(header[1:], row[1:]) if value != ""}
+                yield Record(number, row[0], fields)
+            number = reader.line_num + 1
+        return
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            fields = orjson.loads(line)
+        except orjson.JSONDecodeError as error:
+            yield Record(number, None, {}, f"Invalid JSON: {error}")
+            continue
+        if not isinstance(fields, dict):
+            yield Record(number, None, {}, "Expected a JSON object")
+            continue
+        yield Record(number, fields.pop("collection", None), fields)
+
+def _copy(db: Session, table_name: str, columns: List[str], rows: List[Dict]):
+    """COPY rows into a table inside the session's transaction (Postgres)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+class _Loader:
+    """Validates records and writes them a chunk per transaction"""
+
+    def __init__(self, db: Session, user_id: int, chunk_size: int):
+        self.db = db
+        self.user_id = user_id
+        self.chunk_size = chunk_size
+        self.use_copy = db.get_bind().dialect.name == "postgresql"
+        self.now = datetime.now(timezone.utc)
+        self.horizon = compacted_before(db)
+        self.summary = ImportSummary()
+        self.habit_ids: Dict[int, int] = {}  # Id in the file -> new id
+        self.pending_habit_ids: Set[int] = set()
+        self.pending: Dict[str, List] = {collection: [] for collection in IMPORT_SCHEMAS}
+
+    def reject(self, record: Record, message: str):
+        self.summary.rejected += 1
+        if len(self.summary.errors) < MAX_REPORTED_ERRORS:
+            self.summary.errors.append(f"Line {record.number}: {message}")
+
+    def add(self, record: Record):
+        if record.error:
+            return self.reject(record, record.error)
+        schema = IMPORT_SCHEMAS.get(record.collection)
+        if schema is None:
+            self.summary.ignored += 1
+            return
+
+        try:
+            item = schema.model_validate(record.fields)
+        except ValidationError as error:
+            first = error.errors()[0]
+            return self.reject(record, f"{'.'.join(map(str, first['loc'])) or record.collection}: {first['msg']}")
+
+        if record.collection == "habits":
+            if item.id in self.habit_ids or item.id in self.pending_habit_ids:
+                return self.reject(record, f"Duplicate habit id {item.id}")
+            self.pending_habit_ids.add(item.id)
+        elif record.collection == "habit_logs":
+            if self.horizon is not None and _utc(item.completed_at) < self.horizon:
+                return self.reject(record, "completed_at: Completed before compacted history")
+            if item.habit_id not in self.habit_ids:
+                if item.habit_id not in self.pending_habit_ids:
+                    return self.reject(record, f"Unknown habit id {item.habit_id}")
+                self.write("habits")
+
+        pending = self.pending[record.collection]
+        pending.append(item)
+        if len(pending) >= self.chunk_size:
+            self.write(record.collection)
+
+    def write(self, collection: str):
+        items = self.pending[collection]
+        if not items:
+            return
+        counted = self.summary.model_copy(deep=True)
+        try:
+            if collection == "habits":
+                self._write_habits(items)
+            elif collection == "habit_logs":
+                self._write_logs(items)
+            else:
+                self._write_mood_entries(items)
+            self.db.commit()
+        except SQLAlchemyError:
+            self.db.rollback()
+            self.summary = counted
+            raise
+        self.pending[collection] = []
+        self.summary.chunks += 1
+
+    def write_all(self):
+        for collection in IMPORT_SCHEMAS:
+            self.write(collection)
+
+    def stop(self, reason: str):
+        """End the import early, keeping the chunks already committed"""
+        self.db.rollback()
+        self.summary.complete = False
+        self.summary.errors.append(f"Import stopped after {self.summary.chunks} committed chunks: {reason}")
+
+    def _write_habits(self, items: List[HabitImport]):
+        rows = [
+            {
+                **item.model_dump(exclude={"id", "created_at"}),
+                "user_id": self.user_id,
+                "created_at": _utc(item.created_at or self.now),
+            }
+            for item in items
+        ]
+        new_ids = self.db.execute(
+            insert(habits).returning(habits.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        self.habit_ids.update(zip((item.id for item in items), new_ids))
+        self.pending_habit_ids.clear()
+        self.summary.habits += len(rows)
+
+    def _write_logs(self, items: List[HabitLogImport]):
+        rows = [
+            {
+                **item.model_dump(),
+                "user_id": self.user_id,
+                "habit_id": self.habit_ids[item.habit_id],
+                "completed_at": _utc(item.completed_at),
+                "processed_at": self.now,
+            }
+            for item in items
+        ]
+        if self.use_copy:
+            # COPY has no ON CONFLICT, so stage the chunk and skip known keys on the way in
+            self.db.execute(text("CREATE TEMPORARY TABLE habit_log_import (LIKE habit_logs INCLUDING DEFAULTS) ON COMMIT DROP"))
+            _copy(self.db, "habit_log_import", LOG_COLUMNS, rows)
+            inserted = self.db.execute(text(
+                "INSERT INTO habit_logs SELECT * FROM habit_log_import "
+                "ON CONFLICT (user_id, client_key, completed_at) DO NOTHING "
+                "RETURNING user_id, habit_id, completed_at, quality_rating, mood_rating"
+            )).all()
+        else:
+            insert_rows = dialect_insert(self.db.get_bind().dialect.name)
+            inserted = []
+            for offset in range(0, len(rows), INSERT_CHUNK_SIZE):
+                stmt = insert_rows(habit_logs).values(rows[offset:offset + INSERT_CHUNK_SIZE]).on_conflict_do_nothing(
+                    index_elements=["user_id", "client_key", "completed_at"]
+                ).returning(
+                    habit_logs.c.user_id, habit_logs.c.habit_id, habit_logs.c.completed_at,
+                    habit_logs.c.quality_rating, habit_logs.c.mood_rating
+                )
+                inserted += self.db.execute(stmt).all()
+
+        apply_habit_logs(self.db, inserted)
+        self.summary.habit_logs += len(inserted)
+        self.summary.duplicates += len(rows) - len(inserted)
+
+    def _write_mood_entries(self, items: List[MoodEntryImport]):
+        rows = [
+            {**item.model_dump(), "user_id": self.user_id, "recorded_at": _utc(item.recorded_at)}
+            for item in items
+        ]
+        if self.use_copy:
+            _copy(self.db, "mood_entries", MOOD_COLUMNS, rows)
+        else:
+            self.db.execute(insert(mood_entries), rows)
+        self.summary.mood_entries += len(rows)
+
+    def finish(self) -> ImportSummary:
+        recompute_streaks(self.db, user_id=self.user_id)
+        backfill_achievements(self.db, user_id=self.user_id)
+        reschedule_reminders(self.db, user_id=self.user_id)
+        self.db.commit()
+        return self.summary
+
+def import_data(
+    db: Session, user_id: int, stream: BinaryIO, format: str = "ndjson", chunk_size: Optional[int] = None
+) -> ImportSummary:
+    """Load an upload into a user's account, committing a chunk at a time
+
+    Invalid records are counted and skipped. A chunk that fails to write,
+    or an upload that cannot be read to the end, stops the import; chunks
+    already committed stay, and the summary is marked incomplete. The
+    caller refreshes the leaderboard and the analytics cache afterwards.
+    """
+    loader = _Loader(db, user_id, chunk_size or settings.IMPORT_CHUNK_SIZE)
+    try:
+        for record in read_records(stream, format):
+            loader.add(record)
+        loader.write_all()
+    except SQLAlchemyError:
+        logger.exception("Import for user %s failed", user_id)
+        loader.stop("database error")
+    except (OSError, EOFError, UnicodeDecodeError, csv.Error) as error:
+        loader.stop(f"unreadable upload ({error})")
+    return loader.finish()
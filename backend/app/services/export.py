@@ -0,0 +1,115 @@
+"""
+Streaming export of a user's data
+
+Each collection is read in id order through a server-side cursor,
+EXPORT_BATCH_SIZE rows at a time, and every batch is encoded (and
+optionally gzipped) as it arrives, so memory stays constant whatever the
+size of the account. All collections are read in one transaction, which
+on Postgres is REPEATABLE READ, so the export is a consistent snapshot.
+
+NDJSON has one object per line: {"collection": "habits", "id": 1, ...}.
+CSV has a section per collection: a header row whose first column is
+"collection", that collection's rows, then a blank line. Timestamps are
+ISO 8601 in UTC.
+"""
+
+import csv
+import enum
+import io
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.achievement import Achievement
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_log import HabitLog
+from app.models.mood_entry import MoodEntry
+
+# Exported collections in output order
+EXPORT_COLLECTIONS = {
+    "habits": Habit.__table__,
+    "habit_logs": HabitLog.__table__,
+    "mood_entries": MoodEntry.__table__,
+    "goals": Goal.__table__,
+    "achievements": Achievement.__table__,
+}
+
+# Server bookkeeping left out of exports
+INTERNAL_COLUMNS = {"user_id", "next_reminder_at", "processed_at"}
+
+JSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC
+
+def export_columns(table) -> List:
+    return [column for column in table.columns if column.name not in INTERNAL_COLUMNS]
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+def _encode_ndjson(name: str, keys: List[str], rows) -> bytes:
+    return b"".join(
+        orjson.dumps({"collection": name, **dict(zip(keys, row))}, option=JSON_OPTIONS) + b"\n"
+        for row in rows
+    )
+
+def _encode_csv(name: str, rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([name, *map(_csv_value, row)] for row in rows)
+    return buffer.getvalue().encode()
+
+def _csv_header(keys: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["collection", *keys])
+    return buffer.getvalue().encode()
+
+async def _encoded(user_id: int, format: str, batch_size: int) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        if db.bind.dialect.name == "postgresql":
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+        for name, table in EXPORT_COLLECTIONS.items():
+            columns = export_columns(table)
+            keys = [column.name for column in columns]
+            if format == "csv":
+                yield _csv_header(keys)
+
+            result = await db.stream(
+                select(*columns).where(table.c.user_id == user_id).order_by(table.c.id)
+                .execution_options(yield_per=batch_size)
+            )
+            async for rows in result.partitions():
+                yield _encode_csv(name, rows) if format == "csv" else _encode_ndjson(name, keys, rows)
+
+            if format == "csv":
+                yield b"\r\n"
+
+async def stream_export(
+    user_id: int, format: str = "ndjson", compress: bool = False, batch_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """A user's habits, logs, mood entries, goals and achievements as
+    NDJSON or CSV chunks, gzipped when compress is set"""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+    async for chunk in _encoded(user_id, format, batch_size or settings.EXPORT_BATCH_SIZE):
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
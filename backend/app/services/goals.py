@@ -0,0 +1,177 @@
+"""
+Progress of goals linked to a habit or a category
+
+A linked goal counts completions of its habit, or of any habit in its
+category, on local days from its start_date through its deadline.
+apply_goal_progress runs in the same transaction as the log insert, like
+the daily rollup: it adds each touched goal's delta to current_value with
+one UPDATE instead of recounting, and completes the goals that reach their
+target. reconcile_goal_progress recounts linked goals from
+habit_daily_stats in bulk and repairs any drift.
+
+Goals that are not linked are updated by their owner through the API.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, bindparam, case, func, or_, select, union_all, update
+from sqlalchemy.orm import Session
+
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_daily_stat import HabitDailyStat
+from app.services.achievements import record_goal_completions
+from app.services.rollups import local_date, user_zones
+
+# Core table for executemany UPDATEs keyed by goal id, which ORM bulk updates don't allow
+goals = Goal.__table__
+
+def _progress(value):
+    """SQL progress_percentage for a goal whose current_value becomes value"""
+    return case(
+        (goals.c.target_value <= 0, 0.0),
+        (value >= goals.c.target_value, 100.0),
+        else_=func.coalesce(value * 100.0 / goals.c.target_value, 0.0)
+    )
+
+def complete_reached_goals(db: Session, goal_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+    """Mark the given goals completed once they reach their target
+
+    Completed goals stay completed if progress later drops. Returns the
+    number of goals completed.
+    """
+    completed = db.execute(
+        update(goals).where(
+            goals.c.id.in_(set(goal_ids)),
+            goals.c.is_completed.is_not(True),
+            goals.c.target_value > 0,
+            goals.c.current_value >= goals.c.target_value
+        ).values(
+            is_completed=True, completed_at=now or datetime.now(timezone.utc)
+        ).returning(goals.c.id, goals.c.user_id)
+    ).all()
+    record_goal_completions(db, completed)
+    return len(completed)
+
+def _add_progress(db: Session, deltas: Dict[int, float]):
+    value = func.coalesce(goals.c.current_value, 0) + bindparam("delta")
+    db.execute(
+        update(goals).where(goals.c.id == bindparam("goal_id")).values(current_value=value, progress_percentage=_progress(value)),
+        [{"goal_id": goal_id, "delta": delta} for goal_id, delta in deltas.items()]
+    )
+
+def apply_goal_progress(db: Session, logs: Iterable, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) logs from their linked goals
+
+    Logs are HabitLog instances or rows with the same attributes. The
+    caller commits.
+    """
+    logs = list(logs)
+    if not logs:
+        return
+
+    categories = dict(db.execute(
+        select(Habit.id, Habit.category_id).where(Habit.id.in_({log.habit_id for log in logs}))
+    ).all())
+    links = [Goal.habit_id.in_(categories.keys())]
+    category_ids = {category_id for category_id in categories.values() if category_id is not None}
+    if category_ids:
+        links.append(Goal.category_id.in_(category_ids))
+    linked = db.execute(
+        select(Goal.id, Goal.habit_id, Goal.category_id, Goal.start_date, Goal.deadline).where(
+            Goal.user_id.in_({log.user_id for log in logs}),
+            or_(*links)
+        )
+    ).all()
+    if not linked:
+        return
+
+    by_habit, by_category = defaultdict(list), defaultdict(list)
+    for goal in linked:
+        if goal.habit_id is not None:
+            by_habit[goal.habit_id].append(goal)
+        else:
+            by_category[goal.category_id].append(goal)
+
+    zones = user_zones(db, {log.user_id for log in logs})
+    deltas = Counter()
+    for log in logs:
+        day = local_date(log.completed_at, zones.get(log.user_id, ZoneInfo("UTC")))
+        for goal in by_habit.get(log.habit_id, []) + by_category.get(categories.get(log.habit_id), []):
+            if (goal.start_date is None or day >= goal.start_date) and (goal.deadline is None or day <= goal.deadline):
+                deltas[goal.id] += sign
+
+    deltas = {goal_id: delta for goal_id, delta in deltas.items() if delta}
+    if deltas:
+        _add_progress(db, deltas)
+        complete_reached_goals(db, deltas.keys())
+
+def _counted(link, *criteria):
+    return select(
+        Goal.id,
+        Goal.current_value,
+        func.coalesce(func.sum(HabitDailyStat.completion_count), 0).label("counted")
+    ).select_from(Goal).outerjoin(Habit, link).outerjoin(
+        HabitDailyStat, and_(
+            HabitDailyStat.user_id == Goal.user_id,
+            HabitDailyStat.habit_id == Habit.id,
+            or_(Goal.start_date.is_(None), HabitDailyStat.local_date >= Goal.start_date),
+            or_(Goal.deadline.is_(None), HabitDailyStat.local_date <= Goal.deadline)
+        )
+    ).where(*criteria).group_by(Goal.id, Goal.current_value)
+
+def counted_progress_query(*criteria):
+    """(goal id, current_value, completions counted from the rollup) per
+    linked goal matching criteria
+
+    Habit goals and category goals are counted separately, so each side
+    joins habits by an indexed column; a goal with both links counts its
+    habit, as apply_goal_progress does.
+    """
+    return union_all(
+        _counted(Habit.id == Goal.habit_id, Goal.habit_id.is_not(None), *criteria),
+        _counted(
+            and_(Habit.user_id == Goal.user_id, Habit.category_id == Goal.category_id),
+            Goal.habit_id.is_(None), Goal.category_id.is_not(None), *criteria
+        )
+    )
+
+def reconcile_goal_progress(db: Session, goal_id: Optional[int] = None, batch_size: int = 1000) -> int:
+    """Recount linked goals from the rollup, a batch of goals at a time
+
+    Repairs are applied as deltas, so logs committed while a batch is
+    being checked are not lost. Returns the number of goals repaired; the
+    caller commits.
+    """
+    repaired = 0
+    last_goal_id = 0
+    while True:
+        query = select(Goal.id).where(
+            Goal.id > last_goal_id,
+            or_(Goal.habit_id.is_not(None), Goal.category_id.is_not(None))
+        ).order_by(Goal.id).limit(batch_size)
+        if goal_id is not None:
+            query = query.where(Goal.id == goal_id)
+        goal_ids = db.execute(query).scalars().all()
+        if not goal_ids:
+            return repaired
+
+        last_goal_id = goal_ids[-1]
+        rows = db.execute(counted_progress_query(Goal.id.in_(goal_ids))).all()
+        drift = {row.id: row.counted - (row.current_value or 0) for row in rows if row.counted != row.current_value}
+        if drift:
+            _add_progress(db, drift)
+            repaired += len(drift)
+        complete_reached_goals(db, goal_ids)
+        db.flush()
+
+def settle_goal(db: Session, goal_id: int):
+    """Bring one goal's progress and completion up to date after its owner
+    created or edited it"""
+    reconcile_goal_progress(db, goal_id=goal_id)
+    # A zero delta recomputes progress_percentage for a changed target
+    _add_progress(db, {goal_id: 0})
+    complete_reached_goals(db, [goal_id])
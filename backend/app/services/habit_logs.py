@@ -0,0 +1,144 @@
+"""
+Batched habit log ingestion for offline clients
+
+Clients tag every log with a client_key that is unique per user, so a
+retried upload reports the logs it already delivered as duplicates instead
+of inserting them twice. Keys are looked up before inserting; the unique
+index that settles concurrent uploads also holds completed_at, the
+partition key, so clients must always send it: a server-side default
+would differ between two retries racing each other. Logs completed before
+the compaction horizon are rejected: compaction deletes their keys along
+with them, so a retry could not be told apart from a new log and would be
+counted twice.
+
+The daily rollup and linked goals are updated in the inserting
+transaction. Everything else a new log affects (streaks, then achievement
+counters and rules) runs afterwards in process_pending_logs, from a
+background task: each log is claimed and marked processed in the same
+transaction as that work, so redelivered or duplicate tasks are no-ops.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models.habit import Habit
+from app.models.habit_log import HabitLog
+from app.schemas.habit_log import HabitLogBatchItem, HabitLogBatchResult
+from app.services.achievements import record_logs
+from app.services.goals import apply_goal_progress
+from app.services.rollups import apply_habit_logs, compacted_before
+from app.services.streaks import update_streaks_for_logs
+
+def _utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def _existing_ids(db: Session, user_id: int, client_keys) -> Dict[str, int]:
+    rows = db.execute(
+        select(HabitLog.client_key, HabitLog.id).where(
+            HabitLog.user_id == user_id,
+            HabitLog.client_key.in_(client_keys)
+        )
+    )
+    return dict(rows.all())
+
+def ingest_habit_logs(db: Session, user_id: int, items: List[HabitLogBatchItem]) -> List[HabitLogBatchResult]:
+    """Insert a batch of logs, returning one result per item in order
+
+    Ownership is checked in one query and new logs go in with one multi-row
+    INSERT that skips keys a concurrent upload already stored. The rollup
+    and goal progress are updated in the same transaction; the caller
+    commits and then schedules process_pending_logs.
+    """
+    owned = set(db.execute(
+        select(Habit.id).where(
+            Habit.user_id == user_id,
+            Habit.id.in_({item.habit_id for item in items})
+        )
+    ).scalars())
+    existing = _existing_ids(db, user_id, {item.client_key for item in items})
+    horizon = compacted_before(db)
+
+    def compacted(item: HabitLogBatchItem) -> bool:
+        return horizon is not None and item.client_key not in existing and _utc(item.completed_at) < horizon
+
+    pending = {}
+    for item in items:
+        if (item.habit_id in owned and item.client_key not in existing and item.client_key not in pending
+                and not compacted(item)):
+            pending[item.client_key] = {
+                **item.model_dump(exclude={"completed_at"}),
+                "user_id": user_id,
+                "completed_at": _utc(item.completed_at),
+            }
+
+    created = {}
+    if pending:
+        insert = dialect_insert(db.get_bind().dialect.name)
+        stmt = insert(HabitLog).values(list(pending.values())).on_conflict_do_nothing(
+            index_elements=["user_id", "client_key", "completed_at"]
+        ).returning(
+            HabitLog.id, HabitLog.client_key, HabitLog.user_id, HabitLog.habit_id,
+            HabitLog.completed_at, HabitLog.quality_rating, HabitLog.mood_rating
+        )
+        logs = db.execute(stmt).all()
+        created = {log.client_key: log.id for log in logs}
+
+        # Keys lost to a concurrent upload of the same logs
+        raced = pending.keys() - created.keys()
+        if raced:
+            existing.update(_existing_ids(db, user_id, raced))
+
+        apply_habit_logs(db, logs)
+        apply_goal_progress(db, logs)
+
+    results = []
+    reported = set()
+    for item in items:
+        key = item.client_key
+        if item.habit_id not in owned:
+            results.append(HabitLogBatchResult(client_key=key, status="rejected", detail="Habit not found"))
+        elif compacted(item):
+            results.append(HabitLogBatchResult(
+                client_key=key, status="rejected", detail="Completed before compacted history"
+            ))
+        elif key in created and key not in reported:
+            results.append(HabitLogBatchResult(client_key=key, status="created", id=created[key]))
+        else:
+            results.append(HabitLogBatchResult(client_key=key, status="duplicate", id=created.get(key, existing.get(key))))
+        reported.add(key)
+
+    return results
+
+def process_pending_logs(db: Session, user_id: Optional[int] = None, limit: int = 1000) -> Set[int]:
+    """Run post-write work for up to limit unprocessed logs
+
+    Returns the ids of the users affected. Concurrent workers skip each
+    other's claimed rows; the caller commits.
+    """
+    query = select(HabitLog).where(HabitLog.processed_at.is_(None))
+    if user_id is not None:
+        query = query.where(HabitLog.user_id == user_id)
+    logs = db.execute(
+        query.order_by(HabitLog.id).limit(limit).with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not logs:
+        return set()
+
+    update_streaks_for_logs(db, logs)
+    record_logs(db, logs)
+
+    # Keep updated_at so sync clients are not sent the logs again
+    db.execute(
+        update(HabitLog).where(
+            HabitLog.id.in_([log.id for log in logs])
+        ).values(
+            processed_at=func.now(), updated_at=HabitLog.updated_at
+        ).execution_options(synchronize_session=False)
+    )
+    return {log.user_id for log in logs}
@@ -0,0 +1,66 @@
+"""
+Scores of the global streak leaderboard (see app.sorted_sets)
+
+A user's score is their best current streak over active habits. Call
+refresh_leaderboard after committing anything that can change it; the
+sorted set must not show uncommitted streaks. rebuild_leaderboard reseeds
+the whole set from the habits table, nightly and on demand.
+"""
+
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.habit import Habit
+from app.sorted_sets import streak_leaderboard
+
+logger = logging.getLogger(__name__)
+
+def best_streaks_query():
+    return select(Habit.user_id, func.max(Habit.current_streak)).where(
+        Habit.is_active == True,
+        Habit.current_streak > 0
+    ).group_by(Habit.user_id)
+
+def best_streaks(db: Session, user_ids: Iterable[int]) -> Dict[int, int]:
+    """Scores of the given users, 0 for users without a streak"""
+    user_ids = set(user_ids)
+    scores = dict.fromkeys(user_ids, 0)
+    scores.update(db.execute(best_streaks_query().where(Habit.user_id.in_(user_ids))).all())
+    return scores
+
+def refresh_leaderboard(db: Session, user_ids: Iterable[int]):
+    """Push the given users' committed scores to the leaderboard
+
+    A failed push is logged rather than raised; the nightly rebuild
+    repairs the set.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    try:
+        streak_leaderboard.set_scores(best_streaks(db, user_ids))
+    except Exception:
+        logger.warning("Leaderboard update failed", exc_info=True)
+
+def rebuild_leaderboard(db: Session, users_per_batch: int = 10000) -> int:
+    """Replace the leaderboard with scores read from the habits table,
+    a batch of users at a time
+
+    Returns the number of users ranked.
+    """
+    scores: Dict[int, int] = {}
+    last_user_id = 0
+    while True:
+        rows = db.execute(
+            best_streaks_query().where(Habit.user_id > last_user_id).order_by(Habit.user_id).limit(users_per_batch)
+        ).all()
+        if not rows:
+            break
+        last_user_id = rows[-1][0]
+        scores.update(rows)
+
+    streak_leaderboard.replace(scores)
+    return len(scores)
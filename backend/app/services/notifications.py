@@ -0,0 +1,141 @@
+"""
+Notification inbox
+
+Each user's unread total is a counter in user_counters, moved in the same
+transaction as the rows it counts: notify adds the notifications it
+inserts, mark_read and delete_notification subtract the unread ones they
+touch. The badge is then a primary key lookup instead of a COUNT over the
+inbox. Unread notifications also sit in a partial index, so listing them,
+marking them read and recounting never touch the read ones.
+
+Read notifications are deleted NOTIFICATION_RETENTION_DAYS after they
+were read, a batch at a time.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.notification import Notification
+from app.models.user import User
+from app.models.user_counter import UserCounter
+from app.services.counters import add_to_counters, set_counters
+
+UNREAD_NOTIFICATIONS = "unread_notifications"
+
+notifications = Notification.__table__
+
+# Spelled as the partial index predicate renders on SQLite, so it can use it
+UNREAD = notifications.c.is_read == False
+
+def notify(db: Session, rows: List[Dict]) -> int:
+    """Insert notifications in one statement and count them as unread
+
+    rows are column values with at least user_id and title. The caller
+    commits.
+    """
+    if not rows:
+        return 0
+
+    db.execute(notifications.insert(), [{**row, "is_read": False} for row in rows])
+    add_to_counters(db, Counter((row["user_id"], UNREAD_NOTIFICATIONS) for row in rows))
+    return len(rows)
+
+def unread_count(db: Session, user_id: int) -> int:
+    value = db.scalar(
+        select(UserCounter.value).where(UserCounter.user_id == user_id, UserCounter.name == UNREAD_NOTIFICATIONS)
+    )
+    return max(value or 0, 0)
+
+def mark_read(
+    db: Session, user_id: int, up_to_id: Optional[int] = None, ids: Optional[Iterable[int]] = None,
+    now: Optional[datetime] = None
+) -> int:
+    """Mark a user's unread notifications read with one UPDATE
+
+    Without filters every unread notification is marked; up_to_id limits
+    it to those up to and including that id, ids to the given ones.
+    Returns the number marked; the caller commits.
+    """
+    stmt = update(notifications).where(notifications.c.user_id == user_id, UNREAD)
+    if up_to_id is not None:
+        stmt = stmt.where(notifications.c.id <= up_to_id)
+    if ids is not None:
+        stmt = stmt.where(notifications.c.id.in_(set(ids)))
+
+    marked = db.execute(stmt.values(is_read=True, read_at=now or datetime.now(timezone.utc))).rowcount
+    if marked:
+        add_to_counters(db, {(user_id, UNREAD_NOTIFICATIONS): -marked})
+    return marked
+
+def delete_notification(db: Session, user_id: int, notification_id: int) -> bool:
+    """Delete one of a user's notifications; the caller commits"""
+    deleted = db.execute(
+        delete(notifications).where(
+            notifications.c.id == notification_id,
+            notifications.c.user_id == user_id
+        ).returning(notifications.c.is_read)
+    ).first()
+    if deleted is None:
+        return False
+
+    if not deleted.is_read:
+        add_to_counters(db, {(user_id, UNREAD_NOTIFICATIONS): -1})
+    return True
+
+def recount_unread(db: Session, user_id: Optional[int] = None, users_per_batch: int = 5000) -> int:
+    """Recount unread counters from the notifications, a batch of users at
+    a time
+
+    Returns the number of counters that were wrong. The caller commits;
+    batches are flushed as they go.
+    """
+    repaired = 0
+    last_user_id = 0
+    while True:
+        users = select(User.id).where(User.id > last_user_id).order_by(User.id).limit(users_per_batch)
+        if user_id is not None:
+            users = users.where(User.id == user_id)
+        user_ids = db.execute(users).scalars().all()
+        if not user_ids:
+            return repaired
+
+        last_user_id = user_ids[-1]
+        counted = dict(db.execute(
+            select(notifications.c.user_id, func.count()).where(
+                notifications.c.user_id.between(user_ids[0], last_user_id), UNREAD
+            ).group_by(notifications.c.user_id)
+        ).all())
+        stored = dict(db.execute(
+            select(UserCounter.user_id, UserCounter.value).where(
+                UserCounter.user_id.between(user_ids[0], last_user_id),
+                UserCounter.name == UNREAD_NOTIFICATIONS
+            )
+        ).all())
+        drift = {
+            (user, UNREAD_NOTIFICATIONS): counted.get(user, 0)
+            for user in user_ids
+            if counted.get(user, 0) != stored.get(user, 0)
+        }
+        set_counters(db, drift)
+        repaired += len(drift)
+        db.flush()
+
+def prune_read_notifications(db: Session, now: Optional[datetime] = None, limit: int = 5000) -> int:
+    """Delete up to limit notifications read more than
+    NOTIFICATION_RETENTION_DAYS ago, oldest first
+
+    Returns the number deleted; call again until it returns 0, committing
+    in between to keep transactions short.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    expired = select(notifications.c.id).where(
+        notifications.c.read_at < cutoff,
+        notifications.c.is_read == True
+    ).order_by(notifications.c.read_at).limit(limit)
+    return db.execute(delete(notifications).where(notifications.c.id.in_(expired.scalar_subquery()))).rowcount
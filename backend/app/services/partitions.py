@@ -0,0 +1,136 @@
+"""
+Monthly partitions of habit_logs on Postgres
+
+Migration 0011 turns habit_logs into a table range partitioned on
+completed_at, one partition per UTC month named habit_logs_yYYYYmMM, plus
+habit_logs_default for timestamps outside them. Queries bounded by
+completed_at only visit the months they cover, each partition is vacuumed
+on its own, and compacted months are dropped whole instead of deleted row
+by row.
+
+ensure_habit_log_partitions keeps HABIT_LOG_PARTITION_MONTHS_AHEAD months
+ready ahead of time. On other databases, and on Postgres before the
+migration, habit_logs is a plain table and these functions do nothing.
+"""
+
+import re
+from datetime import date, datetime, time, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+DEFAULT_PARTITION = "habit_logs_default"
+
+PARTITION_NAME = re.compile(r"^habit_logs_y(\d{4})m(\d{2})$")
+
+# Serializes partition changes between concurrent workers
+PARTITION_LOCK_KEY = 0x68616269
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month months after day's month"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"habit_logs_y{month.year:04d}m{month.month:02d}"
+
+def partition_bounds(month: date) -> Tuple[datetime, datetime]:
+    """UTC range of completed_at held by the month's partition"""
+    start = add_months(month, 0)
+    return (
+        datetime.combine(start, time(), tzinfo=timezone.utc),
+        datetime.combine(add_months(start, 1), time(), tzinfo=timezone.utc)
+    )
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('habit_logs'))"
+    )))
+
+def habit_log_partitions(db: Session) -> List[date]:
+    """Months with a partition, oldest first"""
+    names = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass('habit_logs')"
+    )).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+def _create_partition(db: Session, month: date):
+    """Create and attach a month's partition, first moving any of its rows
+    out of the default partition, which would otherwise block the attach"""
+    name = partition_name(month)
+    start, end = partition_bounds(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    params = {"start": start, "end": end}
+
+    stray = db.scalar(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE completed_at >= :start AND completed_at < :end)"
+    ), params)
+    if not stray:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF habit_logs FOR VALUES {bounds}"))
+        return
+
+    db.execute(text(f"CREATE TABLE {name} (LIKE habit_logs INCLUDING DEFAULTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE completed_at >= :start AND completed_at < :end "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    db.execute(text(f"ALTER TABLE habit_logs ATTACH PARTITION {name} FOR VALUES {bounds}"))
+
+def ensure_habit_log_partitions(
+    db: Session, now: Optional[datetime] = None, months_ahead: Optional[int] = None
+) -> List[str]:
+    """Create the partitions of this month and the next months_ahead ones
+    that are missing
+
+    Returns the names created; the caller commits.
+    """
+    if not is_partitioned(db):
+        return []
+
+    now = now or datetime.now(timezone.utc)
+    months_ahead = settings.HABIT_LOG_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+
+    existing = set(habit_log_partitions(db))
+    this_month = add_months(now.date(), 0)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(this_month, offset)
+        if month not in existing:
+            _create_partition(db, month)
+            created.append(partition_name(month))
+    return created
+
+def drop_partitions_before(db: Session, cutoff: datetime) -> List[str]:
+    """Detach and drop the monthly partitions that end by cutoff
+
+    Months still holding logs awaiting post-write processing are kept for a
+    later run. Returns the names dropped; the caller commits.
+    """
+    if not is_partitioned(db):
+        return []
+
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    dropped = []
+    for month in habit_log_partitions(db):
+        if partition_bounds(month)[1] > cutoff:
+            break
+        name = partition_name(month)
+        if db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE processed_at IS NULL)")):
+            continue
+        db.execute(text(f"ALTER TABLE habit_logs DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
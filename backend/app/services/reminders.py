@@ -0,0 +1,189 @@
+"""
+Habit reminders
+
+Each habit with a reminder_time and is_active carries next_reminder_at,
+the next UTC instant its local reminder_time comes round in the owner's
+timezone, and a partial index over the habits that have one. The index is
+the queue: fire_due_reminders pops the earliest due habits in batches with
+one range scan, writes their notifications in one bulk insert and moves
+each habit to its next fire time with one executemany UPDATE, so every pop
+and reschedule is an index update rather than a scan of all habits.
+
+Writers reschedule when a habit's reminder_time or is_active change, and
+when its owner changes timezone. reschedule_reminders recomputes every
+habit, for existing data and after tzdata updates.
+
+Functions take the current time as an argument; SimulatedClock drives them
+through days of reminders in tests and locally.
+"""
+
+import json
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, Optional, Protocol, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.models.habit import Habit
+from app.models.habit_daily_stat import HabitDailyStat
+from app.models.notification import NotificationType
+from app.models.user import User
+from app.services.notifications import notify
+from app.services.rollups import local_date, user_zone, user_zones
+
+# Reminders found this late, e.g. after a scheduler outage, are skipped
+# rather than sent hours after their time
+MAX_REMINDER_DELAY = timedelta(hours=1)
+
+# Core table for executemany UPDATEs keyed by habit id, which ORM bulk updates don't allow
+habits = Habit.__table__
+
+class Clock(Protocol):
+    def now(self) -> datetime: ...
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+class SimulatedClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self, start: datetime):
+        self.current = _utc(start)
+
+    def now(self) -> datetime:
+        return self.current
+
+    def advance(self, delta: timedelta) -> datetime:
+        self.current += delta
+        return self.current
+
+def _utc(moment: datetime) -> datetime:
+    """Aware UTC datetime; naive ones, as SQLite returns them, are UTC"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def next_fire_time(reminder_time: time, zone: ZoneInfo, after: datetime) -> datetime:
+    """The first instant strictly after `after` at which the clock in zone
+    reads reminder_time, in UTC
+
+    A time skipped by a DST change fires that much later (02:30 becomes
+    03:30 when clocks jump from 02:00 to 03:00); a time repeated by one
+    fires on its first occurrence only.
+    """
+    after = _utc(after)
+    day = after.astimezone(zone).date()
+    while True:
+        fire_at = _utc(datetime.combine(day, reminder_time.replace(tzinfo=None), tzinfo=zone))
+        if fire_at > after:
+            return fire_at
+        day += timedelta(days=1)
+
+def next_reminder(habit, zone: ZoneInfo, now: datetime) -> Optional[datetime]:
+    """A habit's next fire time, or None if it has no reminder to send"""
+    if habit.reminder_time is None or habit.is_active is False:
+        return None
+    return next_fire_time(habit.reminder_time, zone, now)
+
+def _set_next_reminders(db: Session, next_at: Dict[int, Optional[datetime]]):
+    # Keep updated_at so sync clients are not sent the habits again
+    db.execute(
+        update(habits).where(habits.c.id == bindparam("habit_id")).values(
+            next_reminder_at=bindparam("next_at"), updated_at=habits.c.updated_at
+        ),
+        [{"habit_id": habit_id, "next_at": fire_at} for habit_id, fire_at in next_at.items()]
+    )
+
+def reschedule_reminders(
+    db: Session, user_id: Optional[int] = None, now: Optional[datetime] = None, batch_size: int = 1000
+) -> int:
+    """Recompute next_reminder_at of every habit, or of one user's, a
+    batch of habits at a time
+
+    Returns the number of habits with a reminder scheduled; the caller
+    commits.
+    """
+    now = _utc(now or datetime.now(timezone.utc))
+    scheduled = 0
+    last_habit_id = 0
+    while True:
+        query = select(
+            Habit.id, Habit.reminder_time, Habit.is_active, User.timezone
+        ).join(User, User.id == Habit.user_id).where(
+            Habit.id > last_habit_id
+        ).order_by(Habit.id).limit(batch_size)
+        if user_id is not None:
+            query = query.where(Habit.user_id == user_id)
+        rows = db.execute(query).all()
+        if not rows:
+            return scheduled
+
+        last_habit_id = rows[-1].id
+        next_at = {row.id: next_reminder(row, user_zone(row.timezone), now) for row in rows}
+        _set_next_reminders(db, next_at)
+        scheduled += sum(fire_at is not None for fire_at in next_at.values())
+        db.flush()
+
+def _completed(db: Session, habit_days: Iterable[Tuple[int, date]]) -> set:
+    """The (habit id, local date) pairs on which the habit already met its target"""
+    habit_days = set(habit_days)
+    if not habit_days:
+        return set()
+    rows = db.execute(
+        select(HabitDailyStat.habit_id, HabitDailyStat.local_date).join(
+            Habit, Habit.id == HabitDailyStat.habit_id
+        ).where(
+            tuple_(HabitDailyStat.habit_id, HabitDailyStat.local_date).in_(habit_days),
+            HabitDailyStat.completion_count >= func.coalesce(Habit.target_count, 1)
+        )
+    ).all()
+    return {tuple(row) for row in rows}
+
+def fire_due_reminders(db: Session, now: Optional[datetime] = None, limit: int = 1000) -> Tuple[int, int]:
+    """Pop up to limit habits whose reminder is due, notify their owners and
+    schedule their next reminder
+
+    No notification is written for a habit already completed that day or
+    for a reminder more than MAX_REMINDER_DELAY late. Returns the number of
+    habits popped and of notifications written. Concurrent schedulers skip
+    each other's claimed rows; the caller commits.
+    """
+    now = _utc(now or datetime.now(timezone.utc))
+    due = db.execute(
+        select(
+            Habit.id, Habit.user_id, Habit.title, Habit.reminder_time, Habit.is_active, Habit.next_reminder_at
+        ).where(
+            Habit.next_reminder_at.is_not(None),
+            Habit.next_reminder_at <= now
+        ).order_by(Habit.next_reminder_at).limit(limit).with_for_update(skip_locked=True)
+    ).all()
+    if not due:
+        return 0, 0
+
+    zones = user_zones(db, {habit.user_id for habit in due})
+    utc = ZoneInfo("UTC")
+    fire_days = {
+        habit.id: local_date(habit.next_reminder_at, zones.get(habit.user_id, utc)) for habit in due
+    }
+    completed = _completed(db, fire_days.items())
+    reminded = [
+        habit for habit in due
+        if now - _utc(habit.next_reminder_at) <= MAX_REMINDER_DELAY and (habit.id, fire_days[habit.id]) not in completed
+    ]
+    notify(db, [
+        {
+            "user_id": habit.user_id,
+            "title": f"Reminder: {habit.title}",
+            "message": f"It's time for {habit.title}",
+            "notification_type": NotificationType.REMINDER,
+            "data": json.dumps({"habit_id": habit.id, "scheduled_for": _utc(habit.next_reminder_at).isoformat()}),
+        }
+        for habit in reminded
+    ])
+
+    _set_next_reminders(db, {
+        habit.id: next_reminder(habit, zones.get(habit.user_id, utc), now) for habit in due
+    })
+    return len(due), len(reminded)
@@ -0,0 +1,209 @@
+"""
+Incrementally maintained habit_daily_stats rollup
+
+Writers call apply_habit_logs in the same transaction as the log insert or
+delete; rebuild_daily_stats recomputes the rollup from raw habit_logs.
+Logs past the compaction horizon are deleted once folded in (see
+app.services.compaction), so the rollup rows of those days are kept as
+they are by later rebuilds.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import Date, cast, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models.habit_daily_stat import HabitDailyStat
+from app.models.habit_log import HabitLog
+from app.models.habit_log_compaction import HabitLogCompaction
+from app.models.user import User
+
+# Rows per multi-row upsert statement
+UPSERT_CHUNK_SIZE = 500
+
+RollupKey = Tuple[int, int, date]
+
+def user_zone(name: Optional[str]) -> ZoneInfo:
+    """The user's timezone, falling back to UTC for unknown names"""
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+def local_date(moment: datetime, zone: ZoneInfo) -> date:
+    """Calendar date of a timestamp in a timezone; naive timestamps are UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(zone).date()
+
+def local_today(timezone_name: Optional[str]) -> date:
+    return datetime.now(user_zone(timezone_name)).date()
+
+def local_bucket_start(dialect_name: str, bucket: str, column, zone: ZoneInfo):
+    """SQL expression for the first local date of the bucket holding column
+
+    SQLite has no time zone support, so there the timestamp is shifted by
+    the zone's current UTC offset, which is an hour out across a DST change.
+    """
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc(bucket, func.timezone(zone.key, column)), Date)
+
+    offset = datetime.now(zone).utcoffset()
+    local = func.datetime(column, f"{int(offset.total_seconds()) // 60:+d} minutes")
+    if bucket == "week":
+        # Forward to the next Sunday (Sundays stay put), then back to Monday
+        return func.date(local, "weekday 0", "-6 days")
+    if bucket == "month":
+        return func.date(local, "start of month")
+    return func.date(local)
+
+def user_zones(db: Session, user_ids: Iterable[int]) -> Dict[int, ZoneInfo]:
+    """Timezones of the given users in one query"""
+    rows = db.execute(select(User.id, User.timezone).where(User.id.in_(set(user_ids))))
+    return {user_id: user_zone(name) for user_id, name in rows}
+
+def _new_delta() -> List[float]:
+    # completion_count, quality_sum, quality_count, mood_sum, mood_count
+    return [0, 0.0, 0, 0.0, 0]
+
+def _accumulate(deltas: Dict[RollupKey, List[float]], log, zone: ZoneInfo, sign: int):
+    delta = deltas[(log.user_id, log.habit_id, local_date(log.completed_at, zone))]
+    delta[0] += sign
+    if log.quality_rating is not None:
+        delta[1] += sign * log.quality_rating
+        delta[2] += sign
+    if log.mood_rating is not None:
+        delta[3] += sign * log.mood_rating
+        delta[4] += sign
+
+def _write_deltas(db: Session, deltas: Dict[RollupKey, List[float]]):
+    """Add deltas onto existing rollup rows, creating missing ones"""
+    if not deltas:
+        return
+    
+    insert = dialect_insert(db.get_bind().dialect.name)
+    rows = [
+        {
+            "user_id": user_id,
+            "habit_id": habit_id,
+            "local_date": day,
+            "completion_count": delta[0],
+            "quality_sum": delta[1],
+            "quality_count": delta[2],
+            "mood_sum": delta[3],
+            "mood_count": delta[4],
+        }
+        for (user_id, habit_id, day), delta in deltas.items()
+    ]
+    
+    for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(HabitDailyStat).values(rows[offset:offset + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "habit_id", "local_date"],
+            set_={
+                **{
+                    column: getattr(HabitDailyStat, column) + getattr(stmt.excluded, column)
+                    for column in ("completion_count", "quality_sum", "quality_count", "mood_sum", "mood_count")
+                },
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
+
+def apply_habit_logs(db: Session, logs: Iterable, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) logs from the rollup
+    
+    Logs are HabitLog instances or rows with the same attributes and must
+    have completed_at set. The caller commits.
+    """
+    logs = list(logs)
+    if not logs:
+        return
+    
+    zones = user_zones(db, {log.user_id for log in logs})
+    
+    deltas = defaultdict(_new_delta)
+    for log in logs:
+        _accumulate(deltas, log, zones.get(log.user_id, ZoneInfo("UTC")), sign)
+    _write_deltas(db, deltas)
+    
+    if sign < 0:
+        db.execute(
+            delete(HabitDailyStat).where(
+                HabitDailyStat.user_id.in_(zones.keys()),
+                HabitDailyStat.completion_count <= 0
+            )
+        )
+
+def compacted_before(db: Session) -> Optional[datetime]:
+    """Logs completed before this have been compacted away, if any have"""
+    horizon = db.scalar(select(func.max(HabitLogCompaction.compacted_before)))
+    if horizon is not None and horizon.tzinfo is None:
+        horizon = horizon.replace(tzinfo=timezone.utc)
+    return horizon
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=timezone.utc)
+
+def rebuild_daily_stats(
+    db: Session, user_id: Optional[int] = None, batch_size: int = 10000,
+    first_day: Optional[date] = None, last_day: Optional[date] = None
+) -> int:
+    """Recompute the rollup from habit_logs for one user or everyone
+    
+    Only local days from first_day up to, not including, last_day are
+    rebuilt. first_day defaults to the day after the compaction horizon,
+    the first day none of whose logs can have been compacted. Logs are
+    streamed and folded in batches, so memory stays bounded by batch_size
+    rollup rows. Returns the number of logs read.
+    """
+    if first_day is None:
+        horizon = compacted_before(db)
+        if horizon is not None:
+            first_day = horizon.date() + timedelta(days=1)
+    
+    clear = delete(HabitDailyStat)
+    logs = select(
+        HabitLog.user_id,
+        HabitLog.habit_id,
+        HabitLog.completed_at,
+        HabitLog.quality_rating,
+        HabitLog.mood_rating,
+        User.timezone
+    ).join(User, User.id == HabitLog.user_id).where(HabitLog.completed_at.is_not(None))
+    if user_id is not None:
+        clear = clear.where(HabitDailyStat.user_id == user_id)
+        logs = logs.where(HabitLog.user_id == user_id)
+    # Local days reach up to a day either side of the UTC date
+    if first_day is not None:
+        clear = clear.where(HabitDailyStat.local_date >= first_day)
+        logs = logs.where(HabitLog.completed_at >= _day_start(first_day - timedelta(days=1)))
+    if last_day is not None:
+        clear = clear.where(HabitDailyStat.local_date < last_day)
+        logs = logs.where(HabitLog.completed_at < _day_start(last_day + timedelta(days=1)))
+    
+    db.execute(clear)
+    
+    zones: Dict[Optional[str], ZoneInfo] = {}
+    deltas = defaultdict(_new_delta)
+    count = 0
+    for row in db.execute(logs.execution_options(yield_per=batch_size)):
+        zone = zones.get(row.timezone)
+        if zone is None:
+            zone = zones[row.timezone] = user_zone(row.timezone)
+        if first_day is not None or last_day is not None:
+            day = local_date(row.completed_at, zone)
+            if (first_day is not None and day < first_day) or (last_day is not None and day >= last_day):
+                continue
+        _accumulate(deltas, row, zone, 1)
+        count += 1
+        if len(deltas) >= batch_size:
+            _write_deltas(db, deltas)
+            deltas.clear()
+    _write_deltas(db, deltas)
+    
+    return count
@@ -0,0 +1,356 @@
+"""
+Streak engine for habits
+
+A streak is a run of consecutive periods (days, ISO weeks or calendar
+months, by HabitFrequency) with at least one completion. Two paths keep
+Habit.current_streak/longest_streak and the habit's Streak row current:
+
+- update_streaks_for_logs advances the stored state in O(1) per log from
+  the last completion date. Logs older than the last completion, which
+  offline sync can deliver, fall back to recomputing that one habit.
+- recompute_streaks rebuilds many habits at once from habit_daily_stats
+  with NumPy over sorted day ordinals, for backfills and repairs.
+
+A streak whose last period is before the previous one is broken: its
+current length reads as 0 and the Streak row is inactive.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert
+from app.models.habit import Habit, HabitFrequency
+from app.models.habit_daily_stat import HabitDailyStat
+from app.models.streak import Streak
+from app.models.user import User
+from app.services.rollups import local_date, user_zone, user_zones
+
+# Period codes; custom schedules are tracked day by day
+DAILY, WEEKLY, MONTHLY = 0, 1, 2
+FREQUENCY_CODES = {
+    HabitFrequency.DAILY: DAILY,
+    HabitFrequency.WEEKLY: WEEKLY,
+    HabitFrequency.MONTHLY: MONTHLY,
+    HabitFrequency.CUSTOM: DAILY,
+}
+
+# date.toordinal() of 1970-01-01, the numpy datetime64 epoch
+EPOCH_ORDINAL = 719163
+
+@dataclass(frozen=True)
+class StreakState:
+    """current is the displayed length, 0 once broken; the run itself is
+    always start_date..last_date since its periods are consecutive"""
+    current: int = 0
+    longest: int = 0
+    last_date: Optional[date] = None
+    start_date: Optional[date] = None
+
+def frequency_code(frequency: Optional[HabitFrequency]) -> int:
+    return FREQUENCY_CODES.get(frequency or HabitFrequency.DAILY, DAILY)
+
+def period_index(day: date, code: int) -> int:
+    """Index of the period containing day; consecutive periods differ by 1"""
+    if code == WEEKLY:
+        # Ordinal 1 (0001-01-01) is a Monday, so weeks run Monday-Sunday
+        return (day.toordinal() - 1) // 7
+    if code == MONTHLY:
+        return (day.year - 1970) * 12 + day.month - 1
+    return day.toordinal()
+
+def advance(state: StreakState, day: date, code: int) -> Optional[StreakState]:
+    """Fold one completion into a streak in O(1)
+
+    Returns None when day is before the last completion, in which case
+    the habit has to be recomputed from its history.
+    """
+    if state.last_date is None:
+        return StreakState(current=1, longest=max(state.longest, 1), last_date=day, start_date=day)
+    if day < state.last_date:
+        return None
+
+    last_period = period_index(state.last_date, code)
+    run = last_period - period_index(state.start_date or state.last_date, code) + 1
+    gap = period_index(day, code) - last_period
+    if gap == 0:
+        current, start_date = run, state.start_date
+    elif gap == 1:
+        current, start_date = run + 1, state.start_date
+    else:
+        current, start_date = 1, day
+
+    return StreakState(
+        current=current,
+        longest=max(state.longest, current),
+        last_date=day,
+        start_date=start_date
+    )
+
+def decay(state: StreakState, today: date, code: int) -> StreakState:
+    """Zero the current length once a whole period has passed without completion"""
+    if state.last_date is None or period_index(today, code) - period_index(state.last_date, code) <= 1:
+        return state
+    return replace(state, current=0)
+
+def compute_state(days: Iterable[date], code: int) -> StreakState:
+    """Reference scalar recompute over a habit's completion days"""
+    state = StreakState()
+    for day in sorted(set(days)):
+        state = advance(state, day, code)
+    return state
+
+def period_indices(ordinals: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Vectorized period_index over day ordinals and per-row frequency codes"""
+    periods = ordinals.copy()
+    weekly = codes == WEEKLY
+    periods[weekly] = (ordinals[weekly] - 1) // 7
+    monthly = codes == MONTHLY
+    if monthly.any():
+        days = (ordinals[monthly] - EPOCH_ORDINAL).astype("datetime64[D]")
+        periods[monthly] = days.astype("datetime64[M]").astype(np.int64)
+    return periods
+
+def bulk_compute(habit_ids: np.ndarray, ordinals: np.ndarray, codes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Streak state for many habits at once
+
+    Takes one row per completion day (duplicates and any order are fine)
+    with the habit's frequency code, and returns parallel arrays with one
+    entry per habit: habit_id, current, longest, last_ordinal and
+    start_ordinal. Matches compute_state habit by habit.
+    """
+    habit_ids = np.asarray(habit_ids, dtype=np.int64)
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    if habit_ids.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return {key: empty for key in ("habit_id", "current", "longest", "last_ordinal", "start_ordinal")}
+
+    periods = period_indices(ordinals, codes)
+    order = np.lexsort((ordinals, periods, habit_ids))
+    habit_ids, periods, ordinals = habit_ids[order], periods[order], ordinals[order]
+
+    # Last completion per habit is the final row of its group
+    habit_change = habit_ids[1:] != habit_ids[:-1]
+    last_ordinals = ordinals[np.append(np.flatnonzero(habit_change), habit_ids.size - 1)]
+
+    # One row per (habit, period), keeping the period's earliest day
+    first_in_period = np.concatenate(([True], habit_change | (periods[1:] != periods[:-1])))
+    habit_ids, periods, ordinals = habit_ids[first_in_period], periods[first_in_period], ordinals[first_in_period]
+
+    habit_change = habit_ids[1:] != habit_ids[:-1]
+    new_run = np.concatenate(([True], habit_change | (periods[1:] != periods[:-1] + 1)))
+    run_ids = np.cumsum(new_run) - 1
+    run_lengths = np.bincount(run_ids)
+    run_starts = np.flatnonzero(new_run)
+
+    habit_starts = np.concatenate(([0], np.flatnonzero(habit_change) + 1))
+    habit_ends = np.append(habit_starts[1:], habit_ids.size) - 1
+    current_runs = run_ids[habit_ends]
+
+    return {
+        "habit_id": habit_ids[habit_starts],
+        "current": run_lengths[current_runs],
+        "longest": np.maximum.reduceat(run_lengths[run_ids], habit_starts),
+        "last_ordinal": last_ordinals,
+        "start_ordinal": ordinals[run_starts[current_runs]],
+    }
+
+def _today(zone) -> date:
+    return datetime.now(zone).date()
+
+def _store(db: Session, habit: Habit, streak: Optional[Streak], state: StreakState):
+    habit.current_streak = state.current
+    habit.longest_streak = state.longest
+    if streak is None:
+        streak = Streak(user_id=habit.user_id, habit_id=habit.id, start_date=state.start_date)
+        db.add(streak)
+    streak.current_streak = state.current
+    streak.longest_streak = state.longest
+    streak.start_date = state.start_date
+    streak.last_completion_date = state.last_date
+    streak.is_active = 1 if state.current else 0
+
+def _completion_days(db: Session, habits: List[Habit]) -> Dict[int, List[date]]:
+    rows = db.execute(
+        select(HabitDailyStat.habit_id, HabitDailyStat.local_date).where(
+            HabitDailyStat.user_id.in_({habit.user_id for habit in habits}),
+            HabitDailyStat.habit_id.in_([habit.id for habit in habits]),
+            HabitDailyStat.completion_count > 0
+        )
+    )
+    days = defaultdict(list)
+    for habit_id, day in rows:
+        days[habit_id].append(day)
+    return days
+
+def update_streaks_for_logs(db: Session, logs: Iterable):
+    """Advance the streaks of the habits these new logs belong to
+
+    Call after apply_habit_logs, since habits needing a recompute read
+    their history from the rollup. The caller commits.
+    """
+    logs = list(logs)
+    if not logs:
+        return
+
+    zones = user_zones(db, {log.user_id for log in logs})
+    new_days = defaultdict(list)
+    for log in logs:
+        new_days[log.habit_id].append(local_date(log.completed_at, zones.get(log.user_id, user_zone(None))))
+
+    # Locked so concurrent workers fold logs of one habit one after another
+    habits = db.execute(
+        select(Habit).where(Habit.id.in_(new_days.keys())).order_by(Habit.id).with_for_update()
+    ).scalars().all()
+    streaks = {
+        streak.habit_id: streak
+        for streak in db.execute(select(Streak).where(Streak.habit_id.in_(new_days.keys()))).scalars()
+    }
+
+    stale = []
+    for habit in habits:
+        code = frequency_code(habit.frequency)
+        streak = streaks.get(habit.id)
+        state = StreakState(
+            current=habit.current_streak or 0,
+            longest=habit.longest_streak or 0,
+            last_date=streak.last_completion_date if streak else None,
+            start_date=streak.start_date if streak else None
+        )
+        for day in sorted(new_days[habit.id]):
+            state = advance(state, day, code)
+            if state is None:
+                stale.append(habit)
+                break
+        else:
+            _store(db, habit, streak, decay(state, _today(zones[habit.user_id]), code))
+
+    if stale:
+        history = _completion_days(db, stale)
+        for habit in stale:
+            code = frequency_code(habit.frequency)
+            state = compute_state(history[habit.id], code)
+            _store(db, habit, streaks.get(habit.id), decay(state, _today(zones[habit.user_id]), code))
+
+def _write_bulk(db: Session, habits: list, result: Dict[str, np.ndarray], today_ordinals: Dict[int, int]):
+    """Persist bulk_compute output for one batch of habits"""
+    by_id = {habit.id: habit for habit in habits}
+    codes = np.fromiter((frequency_code(by_id[h].frequency) for h in result["habit_id"]), dtype=np.int64, count=result["habit_id"].size)
+    today = np.fromiter((today_ordinals[by_id[h].user_id] for h in result["habit_id"]), dtype=np.int64, count=result["habit_id"].size)
+    broken = period_indices(today, codes) - period_indices(result["last_ordinal"], codes) > 1
+    current = np.where(broken, 0, result["current"])
+
+    habit_rows, streak_rows = [], []
+    for i, habit_id in enumerate(result["habit_id"].tolist()):
+        habit = by_id[habit_id]
+        habit_rows.append({"id": habit_id, "current_streak": int(current[i]), "longest_streak": int(result["longest"][i])})
+        streak_rows.append({
+            "user_id": habit.user_id,
+            "habit_id": habit_id,
+            "current_streak": int(current[i]),
+            "longest_streak": int(result["longest"][i]),
+            "start_date": date.fromordinal(int(result["start_ordinal"][i])),
+            "last_completion_date": date.fromordinal(int(result["last_ordinal"][i])),
+            "is_active": 0 if broken[i] else 1,
+        })
+
+    # Habits without any completion have no streak at all
+    computed = set(result["habit_id"].tolist())
+    idle = [habit.id for habit in habits if habit.id not in computed]
+    habit_rows.extend({"id": habit_id, "current_streak": 0, "longest_streak": 0} for habit_id in idle)
+    if idle:
+        db.execute(Streak.__table__.delete().where(Streak.habit_id.in_(idle)))
+
+    if habit_rows:
+        db.execute(update(Habit), habit_rows)
+    if streak_rows:
+        insert = dialect_insert(db.get_bind().dialect.name)
+        stmt = insert(Streak)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["habit_id"],
+            set_={
+                column: getattr(stmt.excluded, column)
+                for column in ("current_streak", "longest_streak", "start_date", "last_completion_date", "is_active")
+            }
+        )
+        db.execute(stmt, streak_rows)
+
+def recompute_streaks(db: Session, user_id: Optional[int] = None, users_per_batch: int = 5000) -> int:
+    """Recompute streaks from habit_daily_stats, a batch of users at a time
+
+    Returns the number of habits written. The caller commits; batches are
+    flushed as they go so memory stays bounded by users_per_batch.
+    """
+    written = 0
+    last_user_id = 0
+    while True:
+        users = select(User.id, User.timezone).where(User.id > last_user_id).order_by(User.id).limit(users_per_batch)
+        if user_id is not None:
+            users = users.where(User.id == user_id)
+        user_rows = db.execute(users).all()
+        if not user_rows:
+            return written
+
+        first_id, last_user_id = user_rows[0].id, user_rows[-1].id
+        today_ordinals = {row.id: _today(user_zone(row.timezone)).toordinal() for row in user_rows}
+        habits = db.execute(
+            select(Habit.id, Habit.user_id, Habit.frequency).where(Habit.user_id.between(first_id, last_user_id))
+        ).all()
+        codes = {habit.id: frequency_code(habit.frequency) for habit in habits}
+        days = db.execute(
+            select(HabitDailyStat.habit_id, HabitDailyStat.local_date).where(
+                HabitDailyStat.user_id.between(first_id, last_user_id),
+                HabitDailyStat.completion_count > 0
+            )
+        ).all()
+
+        habit_ids = np.fromiter((row.habit_id for row in days), dtype=np.int64, count=len(days))
+        ordinals = np.fromiter((row.local_date.toordinal() for row in days), dtype=np.int64, count=len(days))
+        row_codes = np.fromiter((codes.get(row.habit_id, DAILY) for row in days), dtype=np.int64, count=len(days))
+
+        _write_bulk(db, habits, bulk_compute(habit_ids, ordinals, row_codes), today_ordinals)
+        db.flush()
+        written += len(habits)
+
+def expire_broken_streaks(db: Session, now: Optional[datetime] = None) -> Set[int]:
+    """Zero streaks that missed a whole period, without touching history
+
+    Uses the earliest calendar date on Earth (UTC-12) as today, so a streak
+    can expire a few hours late for eastern timezones but never early.
+    Returns the ids of the users with a streak expired.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = (now - timedelta(hours=12)).date()
+    this_month = today.replace(day=1)
+    cutoffs = {
+        # Last completion must fall in the previous period or later
+        DAILY: today - timedelta(days=1),
+        WEEKLY: today - timedelta(days=today.weekday() + 7),
+        MONTHLY: (this_month - timedelta(days=1)).replace(day=1),
+    }
+
+    user_ids = set()
+    for code, cutoff in cutoffs.items():
+        frequencies = [frequency for frequency, value in FREQUENCY_CODES.items() if value == code]
+        habit_ids = select(Habit.id).where(Habit.frequency.in_(frequencies))
+        user_ids.update(db.execute(
+            update(Streak).where(
+                Streak.is_active == 1,
+                Streak.last_completion_date < cutoff,
+                Streak.habit_id.in_(habit_ids)
+            ).values(current_streak=0, is_active=0).returning(Streak.user_id).execution_options(synchronize_session=False)
+        ).scalars())
+
+    user_ids.update(db.execute(
+        update(Habit).where(
+            Habit.current_streak != 0,
+            Habit.id.in_(select(Streak.habit_id).where(Streak.is_active == 0))
+        ).values(current_streak=0).returning(Habit.user_id).execution_options(synchronize_session=False)
+    ).scalars())
+    return user_ids
@@ -0,0 +1,40 @@
+"""
+Change tracking for the mobile delta sync
+
+Synced rows carry an indexed (user_id, updated_at); deletes leave a
+Tombstone naming the sync collection and id. Tombstones are pruned after
+SYNC_TOMBSTONE_RETENTION_DAYS, so older cursors get a full resync.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.category import Category
+from app.models.goal import Goal
+from app.models.habit import Habit
+from app.models.habit_log import HabitLog
+from app.models.mood_entry import MoodEntry
+from app.models.tombstone import Tombstone
+
+# Sync collections in response order
+SYNC_MODELS = {
+    "habits": Habit,
+    "categories": Category,
+    "habit_logs": HabitLog,
+    "mood_entries": MoodEntry,
+    "goals": Goal,
+}
+
+def record_deletions(db, user_id: int, entity: str, ids: Iterable[int]):
+    """Leave tombstones for deleted rows; works with sync and async sessions"""
+    db.add_all([Tombstone(user_id=user_id, entity=entity, entity_id=entity_id) for entity_id in ids])
+
+def prune_tombstones(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete tombstones past the retention window; the caller commits"""
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    return db.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff)).rowcount
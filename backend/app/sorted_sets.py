@@ -0,0 +1,290 @@
+"""
+Global streak leaderboard kept in a sorted set
+
+Members are user ids scored by the user's best current streak; users
+without a streak are left out. Writers push a user's new score after the
+commit that changed it, and rank queries read the sorted set instead of
+ordering the streaks table, so top N, a user's rank and the users around
+them each cost O(log n + k).
+
+The Redis backend stores a ZSET shared by every worker. The memory backend
+keeps the same ordering in a skiplist in this process, so it only runs
+where tasks are eager and one web worker serves requests. Both order ties
+by member, descending, as Redis does; ranks count the users with a
+strictly higher score, so ties share a rank.
+"""
+
+import random
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+Entry = Tuple[int, int]  # (user id, score)
+RankedEntry = Tuple[int, int, int]  # (user id, score, rank)
+
+class _Node:
+    __slots__ = ("key", "forward", "span")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.forward: List[Optional["_Node"]] = [None] * level
+        # Entries passed by following forward[i]; ranks are summed along the search path
+        self.span = [0] * level
+
+class SkipList:
+    """Sorted keys with O(log n) expected insert, remove, rank and
+    access by rank, laid out like a Redis sorted set's skiplist"""
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._length = 0
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, key):
+        """Add a key that is not present yet"""
+        update = [self._head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while node.forward[i] is not None and node.forward[i].key < key:
+                rank[i] += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                self._head.span[i] = self._length
+            self._level = level
+
+        new = _Node(key, level)
+        for i in range(level):
+            new.forward[i] = update[i].forward[i]
+            update[i].forward[i] = new
+            new.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+        self._length += 1
+
+    def remove(self, key) -> bool:
+        update = [self._head] * self.MAX_LEVEL
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.forward[i] is not None and node.forward[i].key < key:
+                node = node.forward[i]
+            update[i] = node
+
+        target = node.forward[0]
+        if target is None or target.key != key:
+            return False
+
+        for i in range(self._level):
+            if update[i].forward[i] is target:
+                update[i].span[i] += target.span[i] - 1
+                update[i].forward[i] = target.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._length -= 1
+        return True
+
+    def count_while(self, predicate) -> int:
+        """Length of the leading run of keys for which predicate holds;
+        predicate must hold for a prefix of the order"""
+        count = 0
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.forward[i] is not None and predicate(node.forward[i].key):
+                count += node.span[i]
+                node = node.forward[i]
+        return count
+
+    def slice(self, start: int, stop: int) -> list:
+        """Keys at 0-based ranks start..stop-1"""
+        start = max(start, 0)
+        if start >= min(stop, self._length):
+            return []
+
+        traversed = 0
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.forward[i] is not None and traversed + node.span[i] <= start + 1:
+                traversed += node.span[i]
+                node = node.forward[i]
+
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.forward[0]
+        return keys
+
+@dataclass
+class Standings:
+    total: int
+    top: List[RankedEntry]
+    me: Optional[RankedEntry]
+    around: List[RankedEntry]  # The user and their neighbours
+
+def _ranked(entries: List[Entry], start: int, first_rank: int) -> List[RankedEntry]:
+    """Competition ranks for entries at descending positions start.. whose
+    first entry has first_rank"""
+    ranked = []
+    for i, (user_id, score) in enumerate(entries):
+        if i == 0:
+            rank = first_rank
+        elif score == entries[i - 1][1]:
+            rank = ranked[-1][2]
+        else:
+            rank = start + i + 1
+        ranked.append((user_id, score, rank))
+    return ranked
+
+def _standings(
+    total: int, top: List[Entry], user_id: int, around: List[Entry], start: int, first_rank: int
+) -> Standings:
+    around = _ranked(around, start, first_rank)
+    me = next((entry for entry in around if entry[0] == user_id), None)
+    return Standings(total=total, top=_ranked(top, 0, 1), me=me, around=around)
+
+class MemoryLeaderboardBackend:
+    """Sorted set in this process"""
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}
+        self._index = SkipList()
+        self._lock = Lock()
+        self._seeded = False
+
+    def _set(self, member: str, score: int):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            self._index.remove((old, member))
+        if score > 0:
+            self._scores[member] = score
+            self._index.insert((score, member))
+
+    def set_scores(self, scores: Dict[int, int]):
+        with self._lock:
+            for user_id, score in scores.items():
+                self._set(str(user_id), score)
+
+    def replace(self, scores: Dict[int, int]):
+        with self._lock:
+            self._scores = {}
+            self._index = SkipList()
+            for user_id, score in scores.items():
+                self._set(str(user_id), score)
+            self._seeded = True
+
+    def seeded(self) -> bool:
+        return self._seeded
+
+    def _descending(self, start: int, stop: int) -> List[Entry]:
+        """Entries at descending positions start..stop-1"""
+        length = len(self._index)
+        keys = self._index.slice(length - stop, length - start)
+        return [(int(member), score) for score, member in reversed(keys)]
+
+    def _count_above(self, score: int) -> int:
+        return len(self._index) - self._index.count_while(lambda key: key[0] <= score)
+
+    def standings(self, user_id: int, limit: int, neighbours: int) -> Standings:
+        with self._lock:
+            top = self._descending(0, limit)
+            member = str(user_id)
+            score = self._scores.get(member)
+            if score is None:
+                return _standings(len(self._index), top, user_id, [], 0, 0)
+
+            position = len(self._index) - self._index.count_while(lambda key: key <= (score, member))
+            start = max(position - neighbours, 0)
+            around = self._descending(start, position + neighbours + 1)
+            return _standings(len(self._index), top, user_id, around, start, self._count_above(around[0][1]) + 1)
+
+class RedisLeaderboardBackend:
+    """Sorted set shared by every worker through Redis"""
+
+    KEY = "leaderboard:streaks"
+    SEEDED_KEY = "leaderboard:streaks:seeded"
+    REBUILD_CHUNK_SIZE = 10000
+
+    def __init__(self, redis_url: str):
+        import redis
+        self._redis = redis.Redis.from_url(redis_url)
+
+    def set_scores(self, scores: Dict[int, int]):
+        with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, score in scores.items():
+                if score > 0:
+                    pipe.zadd(self.KEY, {str(user_id): score})
+                else:
+                    pipe.zrem(self.KEY, str(user_id))
+            pipe.execute()
+
+    def replace(self, scores: Dict[int, int]):
+        """Fill a new set and swap it in, so readers never see it half built"""
+        staging = f"{self.KEY}:rebuild"
+        members = [(str(user_id), score) for user_id, score in scores.items() if score > 0]
+        self._redis.delete(staging)
+        for offset in range(0, len(members), self.REBUILD_CHUNK_SIZE):
+            self._redis.zadd(staging, dict(members[offset:offset + self.REBUILD_CHUNK_SIZE]))
+        with self._redis.pipeline() as pipe:
+            if members:
+                pipe.rename(staging, self.KEY)
+            else:
+                pipe.delete(self.KEY)
+            pipe.set(self.SEEDED_KEY, 1)
+            pipe.execute()
+
+    def seeded(self) -> bool:
+        return bool(self._redis.exists(self.SEEDED_KEY))
+
+    def standings(self, user_id: int, limit: int, neighbours: int) -> Standings:
+        member = str(user_id)
+        with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zcard(self.KEY)
+            pipe.zrevrange(self.KEY, 0, limit - 1, withscores=True)
+            pipe.zrevrank(self.KEY, member)
+            pipe.zscore(self.KEY, member)
+            total, top, position, score = pipe.execute()
+        top = [(int(member), int(score)) for member, score in top]
+        if position is None:
+            return _standings(total, top, user_id, [], 0, 0)
+
+        start = max(position - neighbours, 0)
+        around = [
+            (int(member), int(score))
+            for member, score in self._redis.zrevrange(self.KEY, start, position + neighbours, withscores=True)
+        ]
+        first_rank = self._redis.zcount(self.KEY, f"({around[0][1]}", "+inf") + 1
+        return _standings(total, top, user_id, around, start, first_rank)
+
+def create_leaderboard_backend(name: str):
+    if name == "redis":
+        return RedisLeaderboardBackend(settings.REDIS_URL)
+    if name == "memory":
+        # Scores pushed by workers or other web processes would never reach this one
+        if not settings.single_process:
+            raise ValueError('LEADERBOARD_BACKEND="memory" needs TASKS_EAGER=True and WEB_CONCURRENCY=1; use "redis"')
+        return MemoryLeaderboardBackend()
+    raise ValueError(f"Unknown leaderboard backend {name!r}")
+
+streak_leaderboard = create_leaderboard_backend(settings.LEADERBOARD_BACKEND)
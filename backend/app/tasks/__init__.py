@@ -0,0 +1,12 @@
+"""
+Background tasks
+
+Run a worker with beat for the periodic sweeps:
+
+    celery -A app.tasks worker --beat --loglevel=info
+"""
+
+from .celery_app import celery_app, enqueue
+from . import habit_logs, leaderboard, maintenance, reminders
+
+__all__ = ["celery_app", "enqueue"]
@@ -0,0 +1,78 @@
+import logging
+
+from celery import Celery
+from celery.schedules import crontab
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery("kultivate")
+
+if settings.TASKS_EAGER:
+    # Tasks run inline when enqueued; nothing leaves the process
+    celery_app.conf.update(
+        broker_url="memory://",
+        task_always_eager=True,
+        task_eager_propagates=True
+    )
+else:
+    celery_app.conf.update(broker_url=settings.TASK_BROKER_URL or settings.REDIS_URL)
+
+celery_app.conf.update(
+    task_ignore_result=True,
+    # Redeliver tasks whose worker died mid-run; tasks are idempotent
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "process-pending-habit-logs": {
+            "task": "habit_logs.process_pending",
+            "schedule": 60.0,
+        },
+        "fire-due-reminders": {
+            "task": "reminders.fire_due",
+            "schedule": 60.0,
+        },
+        "create-log-partitions": {
+            "task": "maintenance.create_log_partitions",
+            "schedule": crontab(hour=2, minute=0),
+        },
+        "expire-broken-streaks": {
+            "task": "maintenance.expire_streaks",
+            "schedule": crontab(minute=15),
+        },
+        "prune-tombstones": {
+            "task": "maintenance.prune_tombstones",
+            "schedule": crontab(hour=3, minute=30),
+        },
+        "prune-notifications": {
+            "task": "maintenance.prune_notifications",
+            "schedule": crontab(hour=3, minute=45),
+        },
+        "reconcile-goals": {
+            "task": "maintenance.reconcile_goals",
+            "schedule": crontab(hour=4, minute=0),
+        },
+        "rebuild-leaderboard": {
+            "task": "leaderboard.rebuild",
+            "schedule": crontab(hour=4, minute=30),
+        },
+        "compact-habit-logs": {
+            "task": "maintenance.compact_habit_logs",
+            "schedule": crontab(hour=5, minute=0),
+        },
+    },
+)
+
+async def enqueue(task, *args, **kwargs):
+    """Schedule a task from a request handler without blocking the event loop
+
+    A broker outage is logged rather than failing the request; the
+    periodic sweeps pick the work up later.
+    """
+    try:
+        await run_in_threadpool(task.apply_async, args=args, kwargs=kwargs)
+    except Exception:
+        logger.warning("Could not enqueue %s", task.name, exc_info=True)
@@ -0,0 +1,30 @@
+from typing import Optional
+
+from app.cache import analytics_cache
+from app.config import settings
+from app.database import SessionLocal
+from app.services.habit_logs import process_pending_logs
+from app.services.leaderboard import refresh_leaderboard
+from app.tasks.celery_app import celery_app
+
+@celery_app.task(name="habit_logs.process_pending")
+def process_habit_logs(user_id: Optional[int] = None) -> int:
+    """Run post-write work for unprocessed logs, of one user or everyone
+
+    Batches of TASK_BATCH_SIZE logs each commit on their own; returns the
+    number of batches. Tasks queued by a burst of writes coalesce: the
+    first drains the backlog and the rest find nothing to claim.
+    """
+    batches = 0
+    db = SessionLocal()
+    try:
+        while True:
+            user_ids = process_pending_logs(db, user_id=user_id, limit=settings.TASK_BATCH_SIZE)
+            if not user_ids:
+                return batches
+            db.commit()
+            analytics_cache.bump_blocking(*user_ids)
+            refresh_leaderboard(db, user_ids)
+            batches += 1
+    finally:
+        db.close()
@@ -0,0 +1,21 @@
+from app.database import SessionLocal
+from app.services.leaderboard import rebuild_leaderboard, refresh_leaderboard
+from app.tasks.celery_app import celery_app
+
+@celery_app.task(name="leaderboard.refresh")
+def refresh_streak_leaderboard(user_id: int):
+    """Push one user's best current streak to the leaderboard"""
+    db = SessionLocal()
+    try:
+        refresh_leaderboard(db, [user_id])
+    finally:
+        db.close()
+
+@celery_app.task(name="leaderboard.rebuild")
+def rebuild_streak_leaderboard() -> int:
+    """Reseed the leaderboard from the habits table"""
+    db = SessionLocal()
+    try:
+        return rebuild_leaderboard(db)
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+from app.cache import analytics_cache
+from app.database import SessionLocal
+from app.services.compaction import delete_compacted_logs, drop_compacted_partitions, fold_cold_logs
+from app.services.goals import reconcile_goal_progress
+from app.services.leaderboard import refresh_leaderboard
+from app.services.notifications import prune_read_notifications
+from app.services.partitions import ensure_habit_log_partitions
+from app.services.streaks import expire_broken_streaks
+from app.services.sync import prune_tombstones
+from app.tasks.celery_app import celery_app
+
+@celery_app.task(name="maintenance.expire_streaks")
+def expire_streaks() -> int:
+    """Reset streaks that missed a whole period"""
+    db = SessionLocal()
+    try:
+        user_ids = expire_broken_streaks(db)
+        db.commit()
+        refresh_leaderboard(db, user_ids)
+    finally:
+        db.close()
+    if user_ids:
+        analytics_cache.bump_blocking(*user_ids)
+    return len(user_ids)
+
+@celery_app.task(name="maintenance.prune_tombstones")
+def prune_sync_tombstones() -> int:
+    """Delete sync tombstones past their retention"""
+    db = SessionLocal()
+    try:
+        count = prune_tombstones(db)
+        db.commit()
+    finally:
+        db.close()
+    return count
+
+@celery_app.task(name="maintenance.reconcile_goals")
+def reconcile_goals() -> int:
+    """Recount linked goals from the rollup and repair any drift"""
+    db = SessionLocal()
+    try:
+        count = reconcile_goal_progress(db)
+        db.commit()
+    finally:
+        db.close()
+    if count:
+        analytics_cache.bump_all_blocking()
+    return count
+
+@celery_app.task(name="maintenance.prune_notifications")
+def prune_notifications(batch_size: int = 5000) -> int:
+    """Delete read notifications past their retention, a batch per transaction"""
+    count = 0
+    db = SessionLocal()
+    try:
+        while True:
+            deleted = prune_read_notifications(db, limit=batch_size)
+            db.commit()
+            if not deleted:
+                return count
+            count += deleted
+    finally:
+        db.close()
+
+@celery_app.task(name="maintenance.create_log_partitions")
+def create_log_partitions() -> int:
+    """Create the habit_logs partitions of the coming months"""
+    db = SessionLocal()
+    try:
+        created = ensure_habit_log_partitions(db)
+        db.commit()
+    finally:
+        db.close()
+    return len(created)
+
+@celery_app.task(name="maintenance.compact_habit_logs")
+def compact_habit_logs(batch_size: int = 5000) -> int:
+    """Fold logs past the hot horizon into the rollup and delete them
+
+    The fold commits before any log is deleted, and deletes run a
+    partition or a batch per transaction.
+    """
+    count = 0
+    db = SessionLocal()
+    try:
+        folded = fold_cold_logs(db)
+        db.commit()
+        if folded is not None:
+            analytics_cache.bump_all_blocking()
+
+        drop_compacted_partitions(db)
+        db.commit()
+        while True:
+            deleted = delete_compacted_logs(db, limit=batch_size)
+            db.commit()
+            if not deleted:
+                return count
+            count += deleted
+    finally:
+        db.close()
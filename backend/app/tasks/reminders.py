@@ -0,0 +1,29 @@
+from typing import Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.reminders import Clock, SystemClock, fire_due_reminders
+from app.tasks.celery_app import celery_app
+
+def drain_due_reminders(clock: Clock, batch_size: Optional[int] = None) -> int:
+    """Fire every reminder due at clock.now()
+
+    Batches of REMINDER_BATCH_SIZE habits each commit on their own; returns
+    the number of notifications written.
+    """
+    sent = 0
+    db = SessionLocal()
+    try:
+        while True:
+            popped, notified = fire_due_reminders(db, now=clock.now(), limit=batch_size or settings.REMINDER_BATCH_SIZE)
+            if not popped:
+                return sent
+            db.commit()
+            sent += notified
+    finally:
+        db.close()
+
+@celery_app.task(name="reminders.fire_due")
+def fire_reminders() -> int:
+    """Send the habit reminders that have come due"""
+    return drain_due_reminders(SystemClock())
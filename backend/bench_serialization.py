@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark: response_model validation vs FAST_JSON
+
+Builds detached ORM rows (1k habits, 10k habit logs by default) and times
+what FastAPI does with a route's return value (validate against the
+response_model, dump to JSON-compatible data, json.dumps) against the
+FAST_JSON path (read the schema's fields off the rows, orjson), checking
+both produce the same document.
+
+    python bench_serialization.py --habits 1000 --logs 10000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time as timer
+from datetime import datetime, time, timedelta, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.models import Habit, HabitLog
+from app.models.habit import HabitFrequency, HabitPriority
+from app.schemas.habit import HabitResponse
+from app.schemas.habit_log import HabitLogResponse
+from app.serialization import FastJSONResponse, dump_orm
+
+def make_habits(count, rng):
+    now = datetime.now(timezone.utc)
+    return [
+        Habit(
+            id=i, user_id=1, category_id=None, title=f"Habit {i}", description="Keep going",
+            frequency=HabitFrequency.DAILY, priority=HabitPriority.MEDIUM, target_count=1,
+            current_streak=rng.randint(0, 30), longest_streak=rng.randint(30, 90),
+            reminder_time=time(7, 30), is_active=True, color="#3B82F6", icon="star",
+            created_at=now - timedelta(days=i), updated_at=now
+        )
+        for i in range(1, count + 1)
+    ]
+
+def make_logs(count, rng):
+    now = datetime.now(timezone.utc)
+    return [
+        HabitLog(
+            id=i, user_id=1, habit_id=rng.randint(1, 1000), completed_at=now - timedelta(minutes=i),
+            notes=None, mood_rating=rng.uniform(1, 10), completion_time=rng.randint(1, 60),
+            is_completed=True, quality_rating=float(rng.randint(1, 5))
+        )
+        for i in range(1, count + 1)
+    ]
+
+def validated(schema):
+    """FastAPI's path: validate from attributes, dump to JSON mode, json.dumps"""
+    adapter = TypeAdapter(List[schema])
+
+    def render(rows):
+        content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    return render
+
+def fast(schema):
+    def render(rows):
+        return FastJSONResponse([dump_orm(schema, row) for row in rows]).body
+
+    return render
+
+def time_calls(render, rows, samples):
+    timings = []
+    for _ in range(samples):
+        started = timer.perf_counter()
+        render(rows)
+        timings.append((timer.perf_counter() - started) * 1000)
+    return timings
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {name:<12} mean {statistics.mean(samples):8.3f} ms   p50 {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    payloads = [
+        (f"{args.habits} habits", HabitResponse, make_habits(args.habits, rng)),
+        (f"{args.logs} logs", HabitLogResponse, make_logs(args.logs, rng)),
+    ]
+
+    for label, schema, rows in payloads:
+        assert json.loads(validated(schema)(rows)) == json.loads(fast(schema)(rows)), label
+
+        print(f"Serializing {label} ({args.samples} samples):")
+        report("validated", time_calls(validated(schema), rows, args.samples))
+        report("fast", time_calls(fast(schema), rows, args.samples))
+
+if __name__ == "__main__":
+    main()
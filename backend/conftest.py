@@ -0,0 +1,64 @@
+import os
+import tempfile
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+
+# Settings are read at import time, so point the app at a test database first
+os.environ["DATABASE_URL"] = os.environ.get(
+    "DATABASE_TEST_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='kultivate-tests-')}/test.db"
+)
+os.environ["DEBUG"] = "False"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("TASKS_EAGER", "True")
+os.environ.setdefault("ANALYTICS_CACHE_BACKEND", "memory")
+os.environ.setdefault("LEADERBOARD_BACKEND", "memory")
+
+# test_api.py is a manual smoke script that needs a running server
+collect_ignore = ["test_api.py"]
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def register(client):
+    """Register a fresh user and return its credentials"""
+    name = uuid.uuid4().hex[:12]
+    credentials = {"email": f"{name}@example.com", "password": "test-password"}
+    response = client.post("/api/v1/auth/register", json={**credentials, "username": name})
+    assert response.status_code == 200, response.text
+    return credentials
+
+
+def login(client, credentials):
+    response = client.post("/api/v1/auth/login", json=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def user_id_of(client, headers):
+    return client.get("/api/v1/users/me", headers=headers).json()["id"]
+
+
+def log_days(client, headers, habit_id, days):
+    """Log a habit at 09:00 UTC on each of the last days days, today included"""
+    today = datetime.now(timezone.utc).date()
+    response = client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex,
+         "completed_at": datetime.combine(today - timedelta(days=offset), time(9), tzinfo=timezone.utc).isoformat()}
+        for offset in range(days)
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Register a fresh user and return its bearer token header"""
+    return login(client, register(client))
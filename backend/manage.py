@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Kultivate API - Maintenance Commands
+
+    python manage.py rebuild-rollups [--user-id ID]
+    python manage.py recompute-streaks [--user-id ID]
+    python manage.py expire-streaks
+    python manage.py prune-tombstones
+    python manage.py evaluate-achievements [--user-id ID]
+    python manage.py reconcile-goals
+    python manage.py rebuild-leaderboard
+    python manage.py reschedule-reminders [--user-id ID]
+    python manage.py simulate-reminders [--hours N] [--step-minutes N]
+    python manage.py prune-notifications
+    python manage.py recount-notifications [--user-id ID]
+    python manage.py create-log-partitions [--months-ahead N]
+    python manage.py compact-logs
+    python manage.py import-data --user-id ID [--format ndjson|csv] FILE
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from app.cache import analytics_cache
+from app.database import SessionLocal
+from app.services.achievements import backfill_achievements
+from app.services.data_import import import_data
+from app.services.goals import reconcile_goal_progress
+from app.services.leaderboard import rebuild_leaderboard, refresh_leaderboard
+from app.services.notifications import recount_unread
+from app.services.partitions import ensure_habit_log_partitions
+from app.services.reminders import SimulatedClock, reschedule_reminders
+from app.services.rollups import rebuild_daily_stats
+from app.services.streaks import expire_broken_streaks, recompute_streaks
+from app.services.sync import prune_tombstones
+from app.tasks.maintenance import compact_habit_logs, prune_notifications
+from app.tasks.reminders import drain_due_reminders
+
+def invalidate_analytics(user_id=None):
+    """Drop cached analytics made stale by a maintenance command"""
+    if user_id:
+        analytics_cache.bump_blocking(user_id)
+    else:
+        analytics_cache.bump_all_blocking()
+
+def rebuild_rollups(args):
+    """Recompute habit_daily_stats from habit_logs"""
+    db = SessionLocal()
+    try:
+        count = rebuild_daily_stats(db, user_id=args.user_id, batch_size=args.batch_size)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_analytics(args.user_id)
+    
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Rebuilt daily stats for {scope} from {count} habit logs")
+
+def recompute(args):
+    """Recompute habit streaks from habit_daily_stats"""
+    db = SessionLocal()
+    try:
+        count = recompute_streaks(db, user_id=args.user_id, users_per_batch=args.users_per_batch)
+        db.commit()
+        if args.user_id:
+            refresh_leaderboard(db, [args.user_id])
+        else:
+            rebuild_leaderboard(db)
+    finally:
+        db.close()
+    invalidate_analytics(args.user_id)
+    
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Recomputed streaks of {count} habits for {scope}")
+
+def expire(args):
+    """Reset streaks that missed a whole period"""
+    db = SessionLocal()
+    try:
+        user_ids = expire_broken_streaks(db)
+        db.commit()
+        refresh_leaderboard(db, user_ids)
+    finally:
+        db.close()
+    invalidate_analytics()
+    
+    print(f"Expired broken streaks of {len(user_ids)} users")
+
+def prune(args):
+    """Delete sync tombstones past their retention"""
+    db = SessionLocal()
+    try:
+        count = prune_tombstones(db)
+        db.commit()
+    finally:
+        db.close()
+    
+    print(f"Pruned {count} tombstones")
+
+def evaluate(args):
+    """Rebuild achievement counters and award anything already earned"""
+    db = SessionLocal()
+    try:
+        count = backfill_achievements(db, user_id=args.user_id, users_per_batch=args.users_per_batch)
+        db.commit()
+    finally:
+        db.close()
+    
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Evaluated achievements for {scope}, {count} unlocked")
+
+def reconcile(args):
+    """Recount linked goals from the rollup and repair any drift"""
+    db = SessionLocal()
+    try:
+        count = reconcile_goal_progress(db, batch_size=args.batch_size)
+        db.commit()
+    finally:
+        db.close()
+    if count:
+        invalidate_analytics()
+    
+    print(f"Repaired progress of {count} goals")
+
+def rebuild_streak_leaderboard(args):
+    """Reseed the global streak leaderboard from the habits table"""
+    db = SessionLocal()
+    try:
+        count = rebuild_leaderboard(db, users_per_batch=args.users_per_batch)
+    finally:
+        db.close()
+    
+    print(f"Ranked {count} users on the streak leaderboard")
+
+def reschedule(args):
+    """Recompute the next fire time of every habit reminder"""
+    db = SessionLocal()
+    try:
+        count = reschedule_reminders(db, user_id=args.user_id, batch_size=args.batch_size)
+        db.commit()
+    finally:
+        db.close()
+    
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Scheduled {count} habit reminders for {scope}")
+
+def simulate(args):
+    """Run the reminder scheduler on a simulated clock, writing real notifications"""
+    clock = SimulatedClock(datetime.now(timezone.utc))
+    end = clock.now() + timedelta(hours=args.hours)
+    total = 0
+    while clock.now() < end:
+        clock.advance(timedelta(minutes=args.step_minutes))
+        sent = drain_due_reminders(clock)
+        if sent:
+            print(f"{clock.now():%Y-%m-%d %H:%M} UTC  sent {sent} reminders")
+        total += sent
+    
+    print(f"Sent {total} reminders over {args.hours} simulated hours")
+
+def prune_inbox(args):
+    """Delete read notifications past NOTIFICATION_RETENTION_DAYS"""
+    count = prune_notifications(batch_size=args.batch_size)
+    
+    print(f"Pruned {count} read notifications")
+
+def recount(args):
+    """Recount unread notification counters and repair drift"""
+    db = SessionLocal()
+    try:
+        count = recount_unread(db, user_id=args.user_id, users_per_batch=args.users_per_batch)
+        db.commit()
+    finally:
+        db.close()
+    
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Recounted unread notifications for {scope}, {count} repaired")
+
+def create_partitions(args):
+    """Create missing habit_logs partitions up to --months-ahead months out (Postgres)"""
+    db = SessionLocal()
+    try:
+        created = ensure_habit_log_partitions(db, months_ahead=args.months_ahead)
+        db.commit()
+    finally:
+        db.close()
+    
+    print(f"Created {len(created)} habit log partitions" + (f": {', '.join(created)}" if created else ""))
+
+def compact(args):
+    """Fold habit logs older than HABIT_LOG_HOT_MONTHS into the rollup and delete them"""
+    count = compact_habit_logs(batch_size=args.batch_size)
+    
+    print(f"Compacted habit logs, {count} deleted outside dropped partitions")
+
+def import_file(args):
+    """Import habits, logs and mood entries from an export-format file into a user's account"""
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as upload:
+            summary = import_data(db, args.user_id, upload, args.format, chunk_size=args.chunk_size)
+        refresh_leaderboard(db, [args.user_id])
+    finally:
+        db.close()
+    invalidate_analytics(args.user_id)
+    
+    print(
+        f"Imported {summary.habits} habits, {summary.habit_logs} habit logs and {summary.mood_entries} mood entries "
+        f"for user {args.user_id}; {summary.duplicates} duplicate logs, {summary.ignored} ignored, "
+        f"{summary.rejected} rejected"
+    )
+    for error in summary.errors:
+        print(f"  {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Kultivate API maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    rollups = commands.add_parser("rebuild-rollups", help=rebuild_rollups.__doc__)
+    rollups.add_argument("--user-id", type=int, help="Only rebuild this user's rows")
+    rollups.add_argument("--batch-size", type=int, default=10000)
+    rollups.set_defaults(handler=rebuild_rollups)
+    
+    streaks = commands.add_parser("recompute-streaks", help=recompute.__doc__)
+    streaks.add_argument("--user-id", type=int, help="Only recompute this user's habits")
+    streaks.add_argument("--users-per-batch", type=int, default=5000)
+    streaks.set_defaults(handler=recompute)
+    
+    expiry = commands.add_parser("expire-streaks", help=expire.__doc__)
+    expiry.set_defaults(handler=expire)
+    
+    tombstones = commands.add_parser("prune-tombstones", help=prune.__doc__)
+    tombstones.set_defaults(handler=prune)
+    
+    achievements = commands.add_parser("evaluate-achievements", help=evaluate.__doc__)
+    achievements.add_argument("--user-id", type=int, help="Only evaluate this user")
+    achievements.add_argument("--users-per-batch", type=int, default=5000)
+    achievements.set_defaults(handler=evaluate)
+    
+    goals = commands.add_parser("reconcile-goals", help=reconcile.__doc__)
+    goals.add_argument("--batch-size", type=int, default=1000)
+    goals.set_defaults(handler=reconcile)
+    
+    leaderboard = commands.add_parser("rebuild-leaderboard", help=rebuild_streak_leaderboard.__doc__)
+    leaderboard.add_argument("--users-per-batch", type=int, default=10000)
+    leaderboard.set_defaults(handler=rebuild_streak_leaderboard)
+    
+    reminders = commands.add_parser("reschedule-reminders", help=reschedule.__doc__)
+    reminders.add_argument("--user-id", type=int, help="Only reschedule this user's habits")
+    reminders.add_argument("--batch-size", type=int, default=1000)
+    reminders.set_defaults(handler=reschedule)
+    
+    simulation = commands.add_parser("simulate-reminders", help=simulate.__doc__)
+    simulation.add_argument("--hours", type=int, default=24)
+    simulation.add_argument("--step-minutes", type=int, default=1)
+    simulation.set_defaults(handler=simulate)
+    
+    inbox = commands.add_parser("prune-notifications", help=prune_inbox.__doc__)
+    inbox.add_argument("--batch-size", type=int, default=5000)
+    inbox.set_defaults(handler=prune_inbox)
+    
+    unread = commands.add_parser("recount-notifications", help=recount.__doc__)
+    unread.add_argument("--user-id", type=int, help="Only recount this user")
+    unread.add_argument("--users-per-batch", type=int, default=5000)
+    unread.set_defaults(handler=recount)
+    
+    partitions = commands.add_parser("create-log-partitions", help=create_partitions.__doc__)
+    partitions.add_argument("--months-ahead", type=int, help="Defaults to HABIT_LOG_PARTITION_MONTHS_AHEAD")
+    partitions.set_defaults(handler=create_partitions)
+    
+    compaction = commands.add_parser("compact-logs", help=compact.__doc__)
+    compaction.add_argument("--batch-size", type=int, default=5000)
+    compaction.set_defaults(handler=compact)
+    
+    importer = commands.add_parser("import-data", help=import_file.__doc__)
+    importer.add_argument("path", help="NDJSON or CSV file, optionally gzipped")
+    importer.add_argument("--user-id", type=int, required=True)
+    importer.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    importer.add_argument("--chunk-size", type=int, help="Defaults to IMPORT_CHUNK_SIZE")
+    importer.set_defaults(handler=import_file)
+    
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
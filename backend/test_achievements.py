@@ -0,0 +1,119 @@
+"""
+Achievement rules run off counters updated as logs are processed
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from conftest import log_days, user_id_of
+from app.database import SessionLocal
+from app.models import Achievement, Notification, UserCounter
+from app.models.notification import NotificationType
+from app.schemas.habit_log import HabitLogBatchItem
+from app.services.achievements import (
+    COMPLETIONS, GOAL_COMPLETED, GOALS_COMPLETED, LOG_CREATED, LONGEST_STREAK,
+    backfill_achievements, category_counter, evaluate_achievements, set_counters,
+)
+from app.services.habit_logs import ingest_habit_logs, process_pending_logs
+from app.services.notifications import UNREAD_NOTIFICATIONS
+
+
+def counters_of(db, user_id):
+    """The user's achievement counters; the inbox keeps its unread total alongside"""
+    return dict(db.execute(select(UserCounter.name, UserCounter.value).where(
+        UserCounter.user_id == user_id, UserCounter.name != UNREAD_NOTIFICATIONS
+    )).all())
+
+
+def codes_of(db, user_id):
+    return set(db.execute(select(Achievement.code).where(Achievement.user_id == user_id)).scalars())
+
+
+def test_logs_unlock_achievements(client, auth_headers):
+    category_id = client.post("/api/v1/categories/", json={"name": "Fitness"}, headers=auth_headers).json()["id"]
+    habit_id = client.post(
+        "/api/v1/habits/", json={"title": "Stretch", "category_id": category_id}, headers=auth_headers
+    ).json()["id"]
+    log_days(client, auth_headers, habit_id, 7)
+    user_id = user_id_of(client, auth_headers)
+
+    db = SessionLocal()
+    try:
+        assert counters_of(db, user_id) == {
+            COMPLETIONS: 7, category_counter(category_id): 7, LONGEST_STREAK: 7
+        }
+        assert codes_of(db, user_id) == {"first_completion", "streak_7"}
+
+        notifications = db.execute(select(Notification).where(Notification.user_id == user_id)).scalars().all()
+        assert len(notifications) == 2
+        assert {notification.notification_type for notification in notifications} == {NotificationType.ACHIEVEMENT}
+    finally:
+        db.close()
+
+
+def test_only_rules_listening_for_the_event_run(client, auth_headers):
+    user_id = user_id_of(client, auth_headers)
+    db = SessionLocal()
+    try:
+        set_counters(db, {(user_id, GOALS_COMPLETED): 1})
+        assert evaluate_achievements(db, {user_id: {LOG_CREATED}}) == 0
+        assert evaluate_achievements(db, {user_id: {GOAL_COMPLETED}}) == 1
+        assert evaluate_achievements(db, {user_id: {GOAL_COMPLETED}}) == 0
+        db.commit()
+        assert codes_of(db, user_id) == {"goal_1"}
+    finally:
+        db.close()
+
+
+def test_backfill_rebuilds_counters(client, auth_headers):
+    habit_id = client.post("/api/v1/habits/", json={"title": "Journal"}, headers=auth_headers).json()["id"]
+    log_days(client, auth_headers, habit_id, 3)
+    user_id = user_id_of(client, auth_headers)
+
+    db = SessionLocal()
+    try:
+        incremental = counters_of(db, user_id)
+        db.query(UserCounter).filter(UserCounter.user_id == user_id).delete()
+        db.query(Achievement).filter(Achievement.user_id == user_id).delete()
+        db.commit()
+
+        assert backfill_achievements(db, user_id=user_id) == 1
+        db.commit()
+        assert counters_of(db, user_id) == incremental == {COMPLETIONS: 3, LONGEST_STREAK: 3}
+        assert codes_of(db, user_id) == {"first_completion"}
+
+        assert backfill_achievements(db, user_id=user_id) == 0
+    finally:
+        db.close()
+
+
+def test_backfill_leaves_pending_logs_to_processing(client, auth_headers):
+    category_id = client.post("/api/v1/categories/", json={"name": "Mind"}, headers=auth_headers).json()["id"]
+    habit_id = client.post(
+        "/api/v1/habits/", json={"title": "Read", "category_id": category_id}, headers=auth_headers
+    ).json()["id"]
+    log_days(client, auth_headers, habit_id, 3)
+    user_id = user_id_of(client, auth_headers)
+
+    db = SessionLocal()
+    try:
+        # Two logs in the rollup whose task has not run yet
+        now = datetime.now(timezone.utc)
+        ingest_habit_logs(db, user_id, [
+            HabitLogBatchItem(habit_id=habit_id, client_key=uuid.uuid4().hex, completed_at=now - timedelta(hours=hours))
+            for hours in (1, 2)
+        ])
+        db.commit()
+
+        backfill_achievements(db, user_id=user_id)
+        db.commit()
+        assert counters_of(db, user_id)[COMPLETIONS] == 3
+
+        process_pending_logs(db, user_id=user_id)
+        db.commit()
+        counters = counters_of(db, user_id)
+        assert counters[COMPLETIONS] == counters[category_counter(category_id)] == 5
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+"""
+Rewritten analytics queries return what the original per-query versions did
+"""
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from bench_dashboard import legacy_dashboard
+from app.database import engine
+from app.models import Habit, HabitLog
+from app.routers.analytics import day_start
+
+
+def seed(client, headers, rng):
+    """Three habits, one inactive, with two weeks of logs at random times"""
+    habits = [
+        client.post("/api/v1/habits/", json={"title": title}, headers=headers).json()
+        for title in ("Run", "Read", "Paint")
+    ]
+    now = datetime.now(timezone.utc)
+    response = client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": rng.choice(habits)["id"], "client_key": uuid.uuid4().hex,
+         "completed_at": (now - timedelta(minutes=rng.randrange(60 * 24 * 14))).isoformat()}
+        for _ in range(60)
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+    client.put(f"/api/v1/habits/{habits[2]['id']}", json={"is_active": False}, headers=headers)
+    return client.get("/api/v1/users/me", headers=headers).json()["id"]
+
+
+def legacy_performance(conn, user_id, today, days):
+    """Habit performance as one count query per active habit"""
+    start_date = today - timedelta(days=days)
+    habits = conn.execute(
+        select(Habit.id, Habit.title, Habit.current_streak, Habit.longest_streak)
+        .where(Habit.user_id == user_id, Habit.is_active == True).order_by(Habit.id)
+    ).all()
+    performance_data = []
+    for habit in habits:
+        completions = conn.scalar(select(func.count(HabitLog.id)).where(
+            HabitLog.habit_id == habit.id,
+            HabitLog.completed_at >= day_start(start_date),
+            HabitLog.completed_at < day_start(today + timedelta(days=1))
+        ))
+        performance_data.append({
+            "habit_id": habit.id,
+            "title": habit.title,
+            "completions": completions,
+            "completion_rate": round((completions / days) * 100, 2),
+            "current_streak": habit.current_streak,
+            "longest_streak": habit.longest_streak
+        })
+    return performance_data
+
+
+def test_dashboard_matches_the_five_query_version(client, auth_headers):
+    user_id = seed(client, auth_headers, random.Random(3))
+    dashboard = client.get("/api/v1/analytics/dashboard", headers=auth_headers).json()
+
+    # Fresh users are in UTC, so both agree on day boundaries
+    with engine.connect() as conn:
+        expected = legacy_dashboard(conn, user_id, datetime.now(timezone.utc).date())
+    assert dashboard == expected
+    assert expected["weekly_completions"] > 0 and expected["longest_streak"] > 0
+
+
+@pytest.mark.parametrize("days", [1, 7, 30])
+def test_performance_matches_the_per_habit_queries(client, auth_headers, days):
+    user_id = seed(client, auth_headers, random.Random(days))
+    response = client.get("/api/v1/analytics/habits/performance", params={"days": days}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    with engine.connect() as conn:
+        expected = legacy_performance(conn, user_id, datetime.now(timezone.utc).date(), days)
+    assert response.json() == expected
+    assert len(expected) == 2 and sum(habit["completions"] for habit in expected) > 0
@@ -0,0 +1,66 @@
+"""
+Analytics are served from cache until the user writes something
+"""
+
+import asyncio
+
+from sqlalchemy import event
+
+from app.cache import MemoryCacheBackend, VersionedCache
+from app.database import async_engine
+
+
+def count_analytics_queries(client, path, headers):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.text
+    return response.json(), len(statements)
+
+
+def test_dashboard_cached_until_write(client, auth_headers):
+    path = "/api/v1/analytics/dashboard"
+    first, _ = count_analytics_queries(client, path, auth_headers)
+    cached, queries = count_analytics_queries(client, path, auth_headers)
+    assert cached == first and queries == 0
+
+    client.post("/api/v1/habits/", json={"title": "Meditate"}, headers=auth_headers)
+    fresh, queries = count_analytics_queries(client, path, auth_headers)
+    assert queries > 0
+    assert fresh["total_habits"] == first["total_habits"] + 1
+
+
+def test_versions_survive_eviction():
+    async def scenario():
+        backend = MemoryCacheBackend(max_entries=10)
+        cache = VersionedCache(backend, ttl_seconds=60, namespace="test")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        assert await cache.get_or_compute(1, "x", [], compute) == {"n": 1}
+        assert await cache.get_or_compute(1, "x", [], compute) == {"n": 1}
+        before = await cache.version(1)
+
+        await cache.bump(2)
+        assert await cache.version(1) == before
+        await cache.bump(1)
+        assert await cache.get_or_compute(1, "x", [], compute) == {"n": 2}
+        await cache.bump_all()
+        assert await cache.get_or_compute(1, "x", [], compute) == {"n": 3}
+
+        # A lost counter restarts from the clock, never at an old value
+        backend._counters.clear()
+        assert await cache.version(1) != before
+        assert await cache.get_or_compute(1, "x", [], compute) == {"n": 4}
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""
+Every analytics query must be answered from an index, never a full scan
+"""
+
+import asyncio
+import re
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import async_engine
+
+ANALYTICS_ENDPOINTS = [
+    "/api/v1/analytics/dashboard",
+    "/api/v1/analytics/habits/performance",
+    "/api/v1/analytics/mood/trends",
+    "/api/v1/analytics/mood/trends?bucket=day",
+    "/api/v1/analytics/mood/trends?bucket=week&rolling=4",
+    "/api/v1/analytics/correlations?max_lag=2",
+    "/api/v1/analytics/streaks/leaderboard",
+    "/api/v1/analytics/streaks/leaderboard/global",
+]
+
+# SQLite reports "SCAN <table>", Postgres "Seq Scan on <table>"
+FULL_SCAN = re.compile(r"^(?:SCAN (?!CONSTANT ROW)|.*Seq Scan on )(\w+)")
+
+
+def capture_selects(client, path, headers):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200, response.text
+    return statements
+
+
+async def explain(statements):
+    engine = create_async_engine(async_engine.url, poolclass=NullPool)
+    plans = []
+    async with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Tiny test tables always favour seq scans; only flag unindexable ones
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            prefix = "EXPLAIN "
+        else:
+            prefix = "EXPLAIN QUERY PLAN "
+
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(prefix + statement, tuple(parameters))
+            plans.append((statement, [str(row[-1]) for row in result]))
+    await engine.dispose()
+    return plans
+
+
+@pytest.mark.parametrize("path", ANALYTICS_ENDPOINTS)
+def test_analytics_queries_use_indexes(client, auth_headers, path):
+    client.post("/api/v1/habits/", json={"title": "Read"}, headers=auth_headers)
+
+    statements = capture_selects(client, path, auth_headers)
+    assert statements
+
+    for statement, plan in asyncio.run(explain(statements)):
+        scans = [line for line in plan if FULL_SCAN.match(line.strip())]
+        assert not scans, f"full scan in {statement!r}: {scans}"
@@ -0,0 +1,60 @@
+"""
+Handlers on the async engine read the same rows the sync Session did
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.database import SessionLocal
+from app.models import Category, Goal, Habit, User
+from app.schemas.category import CategoryResponse
+from app.schemas.goal import GoalResponse
+from app.schemas.habit import HabitResponse
+from app.schemas.user import UserResponse
+
+
+def dump(schema, rows):
+    return [schema.model_validate(row).model_dump(mode="json") for row in rows]
+
+
+def by_id(items):
+    return sorted(items, key=lambda item: item["id"])
+
+
+def test_async_reads_match_the_sync_session(client, auth_headers):
+    category = client.post("/api/v1/categories/", json={"name": "Health"}, headers=auth_headers).json()
+    habits = [
+        client.post("/api/v1/habits/", json={"title": title, "category_id": category["id"]}, headers=auth_headers).json()
+        for title in ("Walk", "Stretch")
+    ]
+    client.post("/api/v1/goals/", json={"title": "Walk often", "target_value": 5, "habit_id": habits[0]["id"]},
+                headers=auth_headers)
+    now = datetime.now(timezone.utc)
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habits[0]["id"], "client_key": uuid.uuid4().hex,
+         "completed_at": (now - timedelta(days=offset)).isoformat()}
+        for offset in range(3)
+    ]}, headers=auth_headers)
+    me = client.get("/api/v1/users/me", headers=auth_headers).json()
+
+    # The queries the handlers ran on the sync Session before the port
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == me["id"]).one()
+        expected = {
+            "/api/v1/users/me": UserResponse.model_validate(user).model_dump(mode="json"),
+            "/api/v1/habits/": dump(HabitResponse, db.query(Habit).filter(Habit.user_id == user.id).order_by(Habit.id)),
+            "/api/v1/categories/": dump(CategoryResponse, db.query(Category).filter(Category.user_id == user.id)),
+            "/api/v1/goals/": dump(GoalResponse, db.query(Goal).filter(Goal.user_id == user.id).order_by(Goal.id)),
+        }
+    finally:
+        db.close()
+
+    assert expected["/api/v1/habits/"][0]["current_streak"] == 3
+    for path, rows in expected.items():
+        response = client.get(path, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        if path == "/api/v1/categories/":
+            assert by_id(response.json()) == by_id(rows), path
+        else:
+            assert response.json() == rows, path
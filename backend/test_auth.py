@@ -0,0 +1,177 @@
+"""
+Password hashing on a bounded pool, with hashes upgraded to the configured
+cost, and the principal cache in front of the users table
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from sqlalchemy import select, update
+
+from conftest import login, register
+from app import auth
+from app.auth import PasswordHasher, Principal, PrincipalCache, principal_cache
+from app.config import settings
+from app.database import SessionLocal
+from app.models import User
+from app.routers import auth as auth_router
+
+
+def stored_hash(email):
+    db = SessionLocal()
+    try:
+        return db.execute(select(User.hashed_password).where(User.email == email)).scalar_one()
+    finally:
+        db.close()
+
+
+def test_hashing_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def record_thread(password):
+        threads.append(threading.current_thread())
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(auth, "get_password_hash", record_thread)
+    hasher = PasswordHasher(workers=1, max_pending=4)
+
+    async def scenario():
+        return await hasher.hash("secret"), threading.current_thread()
+
+    try:
+        hashed, loop_thread = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert hashed == "hashed:secret"
+    assert threads[0] is not loop_thread
+    assert threads[0].name.startswith("password-hasher")
+
+
+def test_full_queue_is_rejected_with_503(monkeypatch):
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait(5)
+        return password
+
+    monkeypatch.setattr(auth, "get_password_hash", slow_hash)
+    hasher = PasswordHasher(workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(hasher.hash("first"))
+        await asyncio.sleep(0)
+        assert hasher.pending == 1
+        try:
+            with pytest.raises(HTTPException) as busy:
+                await hasher.hash("second")
+        finally:
+            release.set()
+        assert await first == "first"
+        assert hasher.pending == 0
+        return busy.value
+
+    try:
+        busy = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "1"
+
+
+def test_login_is_503_while_hashing_is_saturated(client, monkeypatch):
+    credentials = register(client)
+    saturated = PasswordHasher(workers=1, max_pending=0)
+    monkeypatch.setattr(auth_router, "password_hasher", saturated)
+    try:
+        response = client.post("/api/v1/auth/login", json=credentials)
+    finally:
+        saturated.shutdown()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_login_rehashes_at_the_configured_cost(client):
+    credentials = register(client)
+    configured = f"$2b${settings.BCRYPT_ROUNDS:02d}$"
+    assert stored_hash(credentials["email"]).startswith(configured)
+
+    # A hash from before the cost changed
+    db = SessionLocal()
+    try:
+        old_hash = bcrypt.using(rounds=settings.BCRYPT_ROUNDS + 1).hash(credentials["password"])
+        db.execute(update(User).where(User.email == credentials["email"]).values(hashed_password=old_hash))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.post("/api/v1/auth/login", json=credentials)
+    assert response.status_code == 200, response.text
+    upgraded = stored_hash(credentials["email"])
+    assert upgraded != old_hash and upgraded.startswith(configured)
+
+    # The upgraded hash still verifies, and is left alone from now on
+    assert client.post("/api/v1/auth/login", json=credentials).status_code == 200
+    assert stored_hash(credentials["email"]) == upgraded
+
+
+def principal(user_id):
+    return Principal(
+        id=user_id, email=f"user{user_id}@example.com", username=f"user{user_id}", first_name=None,
+        last_name=None, bio=None, timezone=None, role=None, is_active=True, is_verified=False,
+        profile_picture=None, created_at=None, updated_at=None
+    )
+
+
+def test_principal_cache_hits_expire_and_evict():
+    async def scenario():
+        cache = PrincipalCache(max_entries=2, ttl_seconds=60)
+        await cache.set("a", principal(1))
+        await cache.set("b", principal(2))
+        assert (await cache.get("a")).id == 1
+        assert await cache.get("missing") is None
+
+        # "b" is now least recently used
+        await cache.set("c", principal(3))
+        assert await cache.get("b") is None
+        assert (await cache.get("a")).id == 1 and (await cache.get("c")).id == 3
+        assert cache.stats()["evictions"] == 1
+
+        short = PrincipalCache(max_entries=2, ttl_seconds=0.05)
+        await short.set("a", principal(1))
+        assert await short.get("a") is not None
+        time.sleep(0.1)
+        assert await short.get("a") is None
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hits"] == 3 and stats["misses"] == 2
+
+
+def test_requests_reuse_the_cached_principal(client):
+    credentials = register(client)
+    headers = login(client, credentials)
+    client.get("/api/v1/users/me", headers=headers)
+
+    hits = principal_cache.stats()["hits"]
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 200
+    assert principal_cache.stats()["hits"] == hits + 1
+    assert asyncio.run(principal_cache.get(credentials["email"])) is not None
+
+
+def test_principal_is_dropped_on_update_and_delete(client):
+    credentials = register(client)
+    headers = login(client, credentials)
+    # /api/v1/me answers from the principal itself
+    assert client.get("/api/v1/me", headers=headers).json()["first_name"] is None
+
+    client.put("/api/v1/users/me", json={"first_name": "Ada"}, headers=headers)
+    assert asyncio.run(principal_cache.get(credentials["email"])) is None
+    assert client.get("/api/v1/me", headers=headers).json()["first_name"] == "Ada"
+
+    assert client.delete("/api/v1/users/me", headers=headers).status_code == 200
+    assert asyncio.run(principal_cache.get(credentials["email"])) is None
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 401
@@ -0,0 +1,148 @@
+"""
+Habit log history: month partitions and cold-log compaction into the rollup
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+
+from app.database import SessionLocal
+from app.models import Habit, HabitDailyStat, HabitLog, HabitLogCompaction, User
+from app.services.compaction import compaction_horizon, delete_compacted_logs, fold_cold_logs
+from app.services.partitions import add_months, ensure_habit_log_partitions, partition_bounds, partition_name
+from app.services.rollups import apply_habit_logs, local_date, rebuild_daily_stats, user_zone
+
+
+def test_month_partitions():
+    assert add_months(date(2026, 11, 20), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == "habit_logs_y2026m03"
+    assert partition_bounds(date(2026, 12, 9)) == (
+        datetime(2026, 12, 1, tzinfo=timezone.utc), datetime(2027, 1, 1, tzinfo=timezone.utc)
+    )
+
+    db = SessionLocal()
+    try:
+        # habit_logs is a plain table outside Postgres
+        assert ensure_habit_log_partitions(db) == []
+    finally:
+        db.close()
+
+
+def test_compaction_folds_logs_into_the_rollup():
+    now = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+    horizon = compaction_horizon(now)
+    db = SessionLocal()
+    try:
+        user = User(email="compaction@example.com", username="compaction", hashed_password="x",
+                    timezone="America/New_York")
+        db.add(user)
+        db.flush()
+        habit = Habit(user_id=user.id, title="Journal")
+        db.add(habit)
+        db.flush()
+
+        moments = [horizon - timedelta(days=40), horizon - timedelta(days=10),
+                   horizon - timedelta(days=10, hours=-1), horizon + timedelta(days=5)]
+        logs = [
+            HabitLog(user_id=user.id, habit_id=habit.id, completed_at=moment, quality_rating=4, processed_at=now)
+            for moment in moments
+        ]
+        # Still waiting for its streak update, so it outlives the compaction
+        pending = HabitLog(user_id=user.id, habit_id=habit.id, completed_at=horizon - timedelta(days=20))
+        db.add_all(logs + [pending])
+        db.flush()
+        apply_habit_logs(db, logs + [pending])
+
+        zone = user_zone(user.timezone)
+        drifted = local_date(moments[1], zone)
+        db.execute(
+            update(HabitDailyStat).where(
+                HabitDailyStat.user_id == user.id, HabitDailyStat.local_date == drifted
+            ).values(completion_count=7)
+        )
+
+        assert fold_cold_logs(db, now=now) == horizon
+        assert fold_cold_logs(db, now=now) is None
+        while delete_compacted_logs(db, limit=1):
+            pass
+        db.flush()
+
+        remaining = db.execute(select(HabitLog.id).where(HabitLog.user_id == user.id)).scalars().all()
+        assert sorted(remaining) == sorted([pending.id, logs[-1].id])
+
+        def rollup():
+            return dict(db.execute(
+                select(HabitDailyStat.local_date, HabitDailyStat.completion_count).where(
+                    HabitDailyStat.user_id == user.id
+                )
+            ).all())
+
+        expected = {
+            local_date(moments[0], zone): 1,
+            local_date(pending.completed_at, zone): 1,
+            drifted: 2,
+            local_date(moments[-1], zone): 1,
+        }
+        assert rollup() == expected
+
+        # Rebuilds leave the compacted days alone
+        assert rebuild_daily_stats(db, user_id=user.id) == 1
+        assert rollup() == expected
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_retries_across_a_compaction_are_not_counted_twice(client, auth_headers):
+    habit = client.post("/api/v1/habits/", json={"title": "Row"}, headers=auth_headers).json()
+    # Compacted long ago, so the horizon leaves every other test's logs alone
+    then = datetime(2001, 6, 18, tzinfo=timezone.utc)
+    horizon = compaction_horizon(then)
+    old = {"habit_id": habit["id"], "client_key": uuid.uuid4().hex,
+           "completed_at": (horizon - timedelta(days=3)).isoformat()}
+
+    def upload(*logs):
+        response = client.post("/api/v1/habits/logs:batch", json={"logs": list(logs)}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return [(result["status"], result["detail"]) for result in response.json()["results"]]
+
+    def folded_count(db):
+        return db.scalar(select(func.sum(HabitDailyStat.completion_count)).where(
+            HabitDailyStat.habit_id == habit["id"], HabitDailyStat.local_date < horizon.date()
+        ))
+
+    assert upload(old) == [("created", None)]
+    db = SessionLocal()
+    try:
+        assert fold_cold_logs(db, now=then) == horizon
+        assert delete_compacted_logs(db) == 1
+        db.commit()
+
+        # The retry's key went with the compacted log
+        recent = {"habit_id": habit["id"], "client_key": uuid.uuid4().hex,
+                  "completed_at": datetime.now(timezone.utc).isoformat()}
+        compacted = ("rejected", "Completed before compacted history")
+        assert upload(old, {**old, "client_key": uuid.uuid4().hex}, recent) == [
+            compacted, compacted, ("created", None)
+        ]
+        db.expire_all()
+        assert folded_count(db) == 1
+
+        lines = [
+            '{"collection": "habits", "id": 1, "title": "Row"}',
+            '{"collection": "habit_logs", "habit_id": 1, "client_key": "%s", "completed_at": "%s"}'
+            % (old["client_key"], old["completed_at"]),
+        ]
+        response = client.post(
+            "/api/v1/users/me/import", files={"file": ("history.ndjson", "\n".join(lines))}, headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        summary = response.json()
+        assert summary["habit_logs"] == 0 and summary["rejected"] == 1
+        assert summary["errors"] == ["Line 2: completed_at: Completed before compacted history"]
+    finally:
+        db.execute(delete(HabitLogCompaction))
+        db.commit()
+        db.close()
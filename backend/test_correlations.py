@@ -0,0 +1,87 @@
+"""
+The vectorized correlation engine matches a scalar reference
+"""
+
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.database import SessionLocal
+from app.models import MoodEntry
+from app.services.correlations import MIN_OBSERVED_DAYS, correlate
+
+
+def reference(flags, values):
+    """Pearson r and lift over the days where the metric was recorded"""
+    observed = ~np.isnan(values)
+    x, y = flags[observed].astype(float), values[observed]
+    if len(y) < MIN_OBSERVED_DAYS or x.min() == x.max() or y.min() == y.max():
+        return None, None
+    return np.corrcoef(x, y)[0, 1], y[x == 1].mean() - y[x == 0].mean()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    days = int(rng.integers(5, 120))
+    completed = rng.random((6, days)) < rng.random((6, 1))
+    metrics = rng.normal(5, 2, (4, days))
+    metrics[rng.random((4, days)) < 0.3] = np.nan
+    max_lag = 3
+
+    result = correlate(completed, metrics, max_lag)
+    for lag in range(max_lag + 1):
+        for habit in range(6):
+            for metric in range(4):
+                r, lift = reference(completed[habit, :days - lag], metrics[metric, lag:])
+                if r is None:
+                    assert np.isnan(result["r"][lag, habit, metric])
+                else:
+                    assert result["r"][lag, habit, metric] == pytest.approx(r)
+                    assert result["lift"][lag, habit, metric] == pytest.approx(lift)
+
+
+def test_correlations_endpoint(client, auth_headers):
+    habit_id = client.post("/api/v1/habits/", json={"title": "Run"}, headers=auth_headers).json()["id"]
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    today = datetime.now(timezone.utc).date()
+    run_days = [today - timedelta(days=offset) for offset in range(1, 29, 2)]
+
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex,
+         "completed_at": datetime.combine(day, time(7), tzinfo=timezone.utc).isoformat()}
+        for day in run_days
+    ]}, headers=auth_headers)
+
+    # Better mood on days with a run, better sleep the night after
+    db = SessionLocal()
+    try:
+        for offset in range(28):
+            day = today - timedelta(days=offset)
+            ran = day in run_days
+            db.add(MoodEntry(
+                user_id=user_id, mood_rating=8.0 if ran else 5.0,
+                sleep_hours=8.0 if day - timedelta(days=1) in run_days else 6.0,
+                recorded_at=datetime.combine(day, time(21), tzinfo=timezone.utc)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/api/v1/analytics/correlations", params={"days": 30, "max_lag": 1}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    pairs = {(pair["metric"], pair["lag"]): pair for pair in response.json()["correlations"]}
+
+    assert pairs[("mood", 0)]["r"] == 1.0
+    assert pairs[("mood", 0)]["lift"] == 3.0
+    assert pairs[("mood", 0)]["days_completed"] == len(run_days)
+    assert pairs[("sleep", 1)]["r"] == 1.0
+    assert pairs[("sleep", 0)]["r"] == -1.0
+    assert pairs[("stress", 0)]["r"] is None
+
+
+def test_max_lag_is_bounded(client, auth_headers):
+    response = client.get("/api/v1/analytics/correlations", params={"max_lag": 30}, headers=auth_headers)
+    assert response.status_code == 422
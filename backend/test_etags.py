@@ -0,0 +1,61 @@
+"""
+Unchanged resources answer If-None-Match with an empty 304
+"""
+
+import threading
+
+import pytest
+
+from app.cache import analytics_cache, create_cache_backend
+from app.config import settings
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_not_modified_until_write(client, auth_headers, monkeypatch, fast_json):
+    monkeypatch.setattr(settings, "FAST_JSON", fast_json)
+    client.post("/api/v1/habits/", json={"title": "Floss"}, headers=auth_headers)
+
+    for path in ["/api/v1/habits/", "/api/v1/categories/", "/api/v1/analytics/dashboard"]:
+        first = client.get(path, headers=auth_headers)
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        cached = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304, path
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+    habits_etag = client.get("/api/v1/habits/", headers=auth_headers).headers["ETag"]
+    client.post("/api/v1/categories/", json={"name": "Care"}, headers=auth_headers)
+    changed = client.get("/api/v1/habits/", headers={**auth_headers, "If-None-Match": habits_etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != habits_etag
+
+
+def test_etag_differs_per_query(client, auth_headers):
+    first = client.get("/api/v1/habits/", params={"limit": 1}, headers=auth_headers).headers["ETag"]
+    second = client.get("/api/v1/habits/", params={"limit": 2}, headers=auth_headers).headers["ETag"]
+    assert first != second
+
+
+def test_worker_bump_invalidates_etag(client, auth_headers):
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    etag = client.get("/api/v1/habits/", headers=auth_headers).headers["ETag"]
+
+    # Tasks bump after their commit from a worker thread, outside the event loop
+    worker = threading.Thread(target=analytics_cache.bump_blocking, args=(user_id,))
+    worker.start()
+    worker.join()
+
+    changed = client.get("/api/v1/habits/", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("eager, web_workers", [(False, 1), (True, 2)])
+def test_memory_backend_needs_a_single_process(monkeypatch, eager, web_workers):
+    # Bumps from Celery workers or other web workers would never reach this process
+    monkeypatch.setattr(settings, "TASKS_EAGER", eager)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", web_workers)
+    with pytest.raises(ValueError):
+        create_cache_backend("memory")
@@ -0,0 +1,100 @@
+"""
+Streaming export of a user's data as NDJSON or CSV, optionally gzipped
+"""
+
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.database import SessionLocal
+from app.models import MoodEntry
+
+
+def seed(client, headers, logs):
+    habit = client.post("/api/v1/habits/", json={"title": "Stretch", "reminder_time": "07:30:00"}, headers=headers).json()
+    now = datetime.now(timezone.utc)
+    response = client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit["id"], "client_key": uuid.uuid4().hex, "notes": f"Session, \"{i}\"\nline two",
+         "completed_at": (now - timedelta(hours=i)).isoformat()}
+        for i in range(logs)
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+    client.post("/api/v1/goals/", json={"title": "Stretch daily", "habit_id": habit["id"], "target_value": 30},
+                headers=headers)
+
+    user_id = client.get("/api/v1/users/me", headers=headers).json()["id"]
+    db = SessionLocal()
+    try:
+        db.add(MoodEntry(user_id=user_id, mood_rating=7.5, notes="Calm"))
+        db.commit()
+    finally:
+        db.close()
+    return habit
+
+
+def export(client, headers, **params):
+    response = client.get("/api/v1/users/me/export", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_ndjson_export(client, auth_headers):
+    habit = seed(client, auth_headers, 5)
+    response = export(client, auth_headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in response.headers["content-disposition"]
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    collections = [record["collection"] for record in records]
+    assert collections == sorted(collections, key=["habits", "habit_logs", "mood_entries", "goals", "achievements"].index)
+    assert collections.count("habit_logs") == 5
+    assert collections.count("mood_entries") == 1
+    assert collections.count("goals") == 1
+    assert "achievements" in collections
+
+    exported = records[0]
+    assert exported["id"] == habit["id"] and exported["frequency"] == "daily"
+    assert exported["reminder_time"] == "07:30:00"
+    assert "user_id" not in exported and "next_reminder_at" not in exported
+    logs = [record for record in records if record["collection"] == "habit_logs"]
+    assert all(log["habit_id"] == habit["id"] and log["completed_at"].endswith("Z") for log in logs)
+    assert "processed_at" not in logs[0]
+
+
+def test_csv_export_is_sectioned_and_gzips(client, auth_headers):
+    seed(client, auth_headers, 3)
+    plain = export(client, auth_headers, format="csv")
+    assert plain.headers["content-type"].startswith("text/csv")
+
+    sections, header = {}, None
+    for row in csv.reader(io.StringIO(plain.text)):
+        if not row:
+            header = None
+        elif header is None:
+            header = row
+            assert header[0] == "collection"
+        else:
+            sections.setdefault(row[0], []).append(dict(zip(header, row)))
+    assert len(sections["habit_logs"]) == 3
+    assert sections["habit_logs"][0]["notes"].startswith('Session, "')
+    assert sections["habits"][0]["is_active"] == "true"
+    assert sections["mood_entries"][0]["mood_rating"] == "7.5"
+
+    compressed = export(client, auth_headers, format="csv", gzip=True)
+    assert compressed.headers["content-type"] == "application/gzip"
+    assert compressed.headers["content-disposition"].endswith('.csv.gz"')
+    assert gzip.decompress(compressed.content).decode() == plain.text
+
+
+def test_export_only_includes_the_caller(client, auth_headers):
+    name = uuid.uuid4().hex[:12]
+    credentials = {"email": f"{name}@example.com", "password": "test-password"}
+    client.post("/api/v1/auth/register", json={**credentials, "username": name})
+    other_headers = {"Authorization": f"Bearer {client.post('/api/v1/auth/login', json=credentials).json()['access_token']}"}
+    seed(client, other_headers, 2)
+
+    assert export(client, auth_headers).text == ""
+    assert client.get("/api/v1/users/me/export", params={"format": "xml"}, headers=auth_headers).status_code == 422
@@ -0,0 +1,140 @@
+"""
+Linked goals track completions incrementally and reconcile against the rollup
+"""
+
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import select, update
+
+from app.database import SessionLocal
+from app.models import Achievement, Goal
+from app.services.goals import reconcile_goal_progress
+
+
+def create(client, headers, path, payload):
+    response = client.post(f"/api/v1/{path}/", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def log(client, headers, habit_id, days_ago=0):
+    day = datetime.now(timezone.utc).date() - timedelta(days=days_ago)
+    response = client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex,
+         "completed_at": datetime.combine(day, time(12), tzinfo=timezone.utc).isoformat()}
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_habit_goal_completes(client, auth_headers):
+    habit = create(client, auth_headers, "habits", {"title": "Swim"})
+    goal = create(client, auth_headers, "goals", {"title": "Swim 3 times", "target_value": 3, "habit_id": habit["id"]})
+    assert goal["current_value"] == 0
+    assert goal["start_date"] == datetime.now(timezone.utc).date().isoformat()
+
+    log(client, auth_headers, habit["id"])
+    log(client, auth_headers, habit["id"])
+    goal = client.get(f"/api/v1/goals/{goal['id']}", headers=auth_headers).json()
+    assert goal["current_value"] == 2
+    assert round(goal["progress_percentage"], 2) == 66.67
+    assert not goal["is_completed"]
+
+    log(client, auth_headers, habit["id"])
+    goal = client.get(f"/api/v1/goals/{goal['id']}", headers=auth_headers).json()
+    assert goal["current_value"] == 3
+    assert goal["progress_percentage"] == 100
+    assert goal["is_completed"]
+    assert goal["completed_at"] is not None
+
+    db = SessionLocal()
+    try:
+        codes = db.execute(select(Achievement.code).where(Achievement.user_id == goal["user_id"])).scalars().all()
+        assert "goal_1" in codes
+    finally:
+        db.close()
+
+
+def test_category_goal_counts_from_start_date(client, auth_headers):
+    category = create(client, auth_headers, "categories", {"name": "Mind"})
+    read = create(client, auth_headers, "habits", {"title": "Read", "category_id": category["id"]})
+    meditate = create(client, auth_headers, "habits", {"title": "Meditate", "category_id": category["id"]})
+    log(client, auth_headers, read["id"], days_ago=3)
+    log(client, auth_headers, read["id"], days_ago=1)
+
+    start = (datetime.now(timezone.utc).date() - timedelta(days=2)).isoformat()
+    goal = create(client, auth_headers, "goals", {
+        "title": "Mindful week", "target_value": 10, "category_id": category["id"], "start_date": start
+    })
+    # Logged before the goal existed, counted from the rollup
+    assert goal["current_value"] == 1
+
+    log(client, auth_headers, meditate["id"])
+    log(client, auth_headers, meditate["id"], days_ago=5)
+    goal = client.get(f"/api/v1/goals/{goal['id']}", headers=auth_headers).json()
+    assert goal["current_value"] == 2
+
+
+def test_reconcile_repairs_drift(client, auth_headers):
+    habit = create(client, auth_headers, "habits", {"title": "Walk"})
+    goal = create(client, auth_headers, "goals", {"title": "Walk", "target_value": 2, "habit_id": habit["id"]})
+    log(client, auth_headers, habit["id"])
+
+    db = SessionLocal()
+    try:
+        db.execute(update(Goal).where(Goal.id == goal["id"]).values(current_value=7))
+        db.commit()
+        assert reconcile_goal_progress(db) >= 1
+        db.commit()
+        assert db.get(Goal, goal["id"]).current_value == 1
+        assert reconcile_goal_progress(db, goal_id=goal["id"]) == 0
+    finally:
+        db.close()
+
+
+def test_reconcile_counts_habit_and_category_goals(client, auth_headers):
+    category = create(client, auth_headers, "categories", {"name": "Outdoors"})
+    hike = create(client, auth_headers, "habits", {"title": "Hike", "category_id": category["id"]})
+    cycle = create(client, auth_headers, "habits", {"title": "Cycle", "category_id": category["id"]})
+    habit_goal = create(client, auth_headers, "goals", {"title": "Hike", "target_value": 9, "habit_id": hike["id"]})
+    category_goal = create(client, auth_headers, "goals", {
+        "title": "Outdoors", "target_value": 9, "category_id": category["id"]
+    })
+    log(client, auth_headers, hike["id"])
+    log(client, auth_headers, cycle["id"])
+    log(client, auth_headers, cycle["id"])
+
+    db = SessionLocal()
+    try:
+        db.execute(update(Goal).where(Goal.id.in_([habit_goal["id"], category_goal["id"]])).values(current_value=0))
+        db.commit()
+        assert reconcile_goal_progress(db, batch_size=1) >= 2
+        db.commit()
+        assert db.get(Goal, habit_goal["id"]).current_value == 1
+        assert db.get(Goal, category_goal["id"]).current_value == 3
+    finally:
+        db.close()
+
+
+def test_manual_goal_completes_on_update(client, auth_headers):
+    goal = create(client, auth_headers, "goals", {"title": "Save", "target_value": 100, "unit": "EUR"})
+    updated = client.put(f"/api/v1/goals/{goal['id']}", json={"current_value": 100}, headers=auth_headers).json()
+    assert updated["is_completed"]
+    assert updated["progress_percentage"] == 100
+
+
+def test_goal_links_are_validated(client, auth_headers):
+    habit = create(client, auth_headers, "habits", {"title": "Cook"})
+    category = create(client, auth_headers, "categories", {"name": "Food"})
+
+    both = client.post("/api/v1/goals/", json={
+        "title": "Both", "habit_id": habit["id"], "category_id": category["id"]
+    }, headers=auth_headers)
+    assert both.status_code == 400
+
+    foreign = client.post("/api/v1/goals/", json={"title": "Other", "habit_id": 10 ** 9}, headers=auth_headers)
+    assert foreign.status_code == 404
+
+    goal = create(client, auth_headers, "goals", {"title": "Cook", "target_value": 5, "habit_id": habit["id"]})
+    manual = client.put(f"/api/v1/goals/{goal['id']}", json={"current_value": 5}, headers=auth_headers)
+    assert manual.status_code == 400
@@ -0,0 +1,70 @@
+"""
+Offline batches are inserted once, however many times they are retried
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+def create_habit(client, headers):
+    response = client.post("/api/v1/habits/", json={"title": "Read"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_batch_is_idempotent(client, auth_headers):
+    habit_id = create_habit(client, auth_headers)
+    now = datetime.now(timezone.utc)
+    logs = [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex, "completed_at": (now - timedelta(days=day)).isoformat()}
+        for day in range(3)
+    ]
+    logs.append(dict(logs[0]))
+    logs.append({"habit_id": 10 ** 9, "client_key": uuid.uuid4().hex, "completed_at": now.isoformat()})
+
+    response = client.post("/api/v1/habits/logs:batch", json={"logs": logs}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created", "created", "created", "duplicate", "rejected"]
+    assert results[3]["id"] == results[0]["id"]
+
+    retry = client.post("/api/v1/habits/logs:batch", json={"logs": logs[:3]}, headers=auth_headers)
+    assert [result["status"] for result in retry.json()["results"]] == ["duplicate"] * 3
+    assert [result["id"] for result in retry.json()["results"]] == [result["id"] for result in results[:3]]
+
+    logged = client.get(f"/api/v1/habits/{habit_id}/logs", headers=auth_headers).json()
+    assert len(logged) == 3
+
+    habit = client.get(f"/api/v1/habits/{habit_id}", headers=auth_headers).json()
+    assert habit["current_streak"] == 3
+
+
+def test_batch_rejects_other_users_habits(client, auth_headers):
+    name = uuid.uuid4().hex[:12]
+    credentials = {"email": f"{name}@example.com", "password": "test-password"}
+    client.post("/api/v1/auth/register", json={**credentials, "username": name})
+    token = client.post("/api/v1/auth/login", json=credentials).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+
+    habit_id = create_habit(client, other_headers)
+    response = client.post(
+        "/api/v1/habits/logs:batch",
+        json={"logs": [{"habit_id": habit_id, "client_key": "k1",
+                        "completed_at": datetime.now(timezone.utc).isoformat()}]},
+        headers=auth_headers
+    )
+    assert response.json()["results"] == [
+        {"client_key": "k1", "status": "rejected", "id": None, "detail": "Habit not found"}
+    ]
+
+
+def test_batch_items_need_completed_at(client, auth_headers):
+    # A server default would give two racing retries different partition keys
+    habit_id = create_habit(client, auth_headers)
+    key = uuid.uuid4().hex
+    response = client.post(
+        "/api/v1/habits/logs:batch", json={"logs": [{"habit_id": habit_id, "client_key": key}]}, headers=auth_headers
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "logs", 0, "completed_at"]
+    assert client.get(f"/api/v1/habits/{habit_id}/logs", headers=auth_headers).json() == []
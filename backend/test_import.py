@@ -0,0 +1,153 @@
+"""
+Bulk import in the export format: streaming parse, chunked loads, one recompute at the end
+"""
+
+import gzip
+import io
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from conftest import login, register, user_id_of
+from app.database import SessionLocal
+from app.models import HabitDailyStat, HabitLog, MoodEntry
+from app.services import data_import
+from app.services.data_import import import_data
+from app.services.rollups import apply_habit_logs
+
+
+def upload(client, headers, content, format="ndjson"):
+    response = client.post(
+        "/api/v1/users/me/import", params={"format": format},
+        files={"file": (f"history.{format}", content)}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_export_round_trips_into_another_account(client, auth_headers):
+    habit = client.post("/api/v1/habits/", json={"title": "Read", "reminder_time": "21:00:00"}, headers=auth_headers).json()
+    today = datetime.now(timezone.utc).date()
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit["id"], "client_key": uuid.uuid4().hex, "quality_rating": 4,
+         "completed_at": datetime.combine(today - timedelta(days=offset), time(12), tzinfo=timezone.utc).isoformat()}
+        for offset in range(3)
+    ]}, headers=auth_headers)
+    exported = client.get("/api/v1/users/me/export", params={"gzip": True}, headers=auth_headers).content
+
+    other_headers = login(client, register(client))
+    summary = upload(client, other_headers, exported)
+    assert summary["habits"] == 1 and summary["habit_logs"] == 3
+    assert summary["rejected"] == 0 and summary["ignored"] >= 1  # achievements are derived
+
+    imported = client.get("/api/v1/habits/", headers=other_headers).json()
+    assert [(h["title"], h["current_streak"], h["reminder_time"]) for h in imported] == [("Read", 3, "21:00:00")]
+    assert client.get("/api/v1/analytics/streaks/leaderboard/global", headers=other_headers).json()["me"] is not None
+
+    # Logs keep their client keys, so importing the file again adds no logs
+    again = upload(client, other_headers, exported)
+    assert again["habit_logs"] == 0 and again["duplicates"] == 3
+
+
+def test_csv_import_in_chunks_reports_bad_rows(client, auth_headers):
+    user_id = user_id_of(client, auth_headers)
+    base = datetime(2025, 3, 1, 8, tzinfo=timezone.utc)
+    lines = [
+        "stray,row",
+        "collection,id,title,frequency",
+        "habits,10,Walk,daily",
+        "habits,11,Plank,weekly",
+        "habits,12,,daily",
+        "",
+        "collection,habit_id,completed_at,mood_rating,notes",
+        *[f"habit_logs,10,{(base + timedelta(days=day)).isoformat()},{day % 10},\"day, {day}\"" for day in range(7)],
+        f"habit_logs,99,{base.isoformat()},,",
+        "habit_logs,11,not a time,,",
+        "",
+        "collection,mood_rating,recorded_at,sleep_hours",
+        f"mood_entries,6.5,{base.isoformat()},7",
+        f"mood_entries,7,{base.isoformat()},",
+        "collection,title",
+        "goals,Walk more",
+    ]
+    content = gzip.compress("\r\n".join(lines).encode())
+
+    db = SessionLocal()
+    try:
+        summary = import_data(db, user_id, io.BytesIO(content), "csv", chunk_size=2)
+        assert (summary.habits, summary.habit_logs, summary.mood_entries) == (2, 7, 2)
+        assert (summary.rejected, summary.ignored, summary.duplicates) == (4, 1, 0)
+        assert summary.errors[0] == "Line 1: Row before any header row"
+        assert summary.errors[1].startswith("Line 5: title")
+        assert any("Unknown habit id 99" in error for error in summary.errors)
+
+        assert db.scalar(select(func.count()).select_from(HabitLog).where(HabitLog.user_id == user_id)) == 7
+        assert db.scalar(
+            select(func.sum(HabitDailyStat.completion_count)).where(HabitDailyStat.user_id == user_id)
+        ) == 7
+        assert db.scalar(
+            select(func.count()).select_from(HabitLog).where(HabitLog.user_id == user_id, HabitLog.processed_at.is_(None))
+        ) == 0
+        notes = db.execute(select(HabitLog.notes).where(HabitLog.user_id == user_id)).scalars().all()
+        assert "day, 3" in notes
+        assert db.scalar(select(func.count()).select_from(MoodEntry).where(MoodEntry.user_id == user_id)) == 2
+    finally:
+        db.close()
+
+    walk = next(h for h in client.get("/api/v1/habits/", headers=auth_headers).json() if h["title"] == "Walk")
+    assert walk["longest_streak"] == 7
+
+
+def test_a_failed_chunk_keeps_the_committed_ones(client, auth_headers, monkeypatch):
+    user_id = user_id_of(client, auth_headers)
+    today = datetime.now(timezone.utc).date()
+    lines = ['{"collection": "habits", "id": 1, "title": "Swim"}'] + [
+        '{"collection": "habit_logs", "habit_id": 1, "completed_at": "%s"}'
+        % datetime.combine(today - timedelta(days=day), time(7), tzinfo=timezone.utc).isoformat()
+        for day in range(6)
+    ]
+
+    calls = []
+
+    def fail_third_chunk(db, logs, sign=1):
+        calls.append(len(logs))
+        if len(calls) == 3:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        apply_habit_logs(db, logs, sign)
+
+    monkeypatch.setattr(data_import, "apply_habit_logs", fail_third_chunk)
+    db = SessionLocal()
+    try:
+        summary = import_data(db, user_id, io.BytesIO("\n".join(lines).encode()), chunk_size=2)
+        # The habit and two chunks of logs landed; the third chunk rolled back
+        assert summary.complete is False and summary.chunks == 3
+        assert (summary.habits, summary.habit_logs) == (1, 4)
+        assert summary.errors == ["Import stopped after 3 committed chunks: database error"]
+        assert db.scalar(select(func.count()).select_from(HabitLog).where(HabitLog.user_id == user_id)) == 4
+    finally:
+        db.close()
+
+    # Streaks are recomputed for what landed
+    swim = next(h for h in client.get("/api/v1/habits/", headers=auth_headers).json() if h["title"] == "Swim")
+    assert swim["current_streak"] == 4
+
+
+def test_a_truncated_upload_reports_what_landed(client, auth_headers):
+    today = datetime.now(timezone.utc).date()
+    lines = ['{"collection": "habits", "id": 1, "title": "Walk"}'] + [
+        '{"collection": "habit_logs", "habit_id": 1, "client_key": "%s", "completed_at": "%s"}'
+        % (uuid.uuid4().hex, datetime.combine(today - timedelta(days=day), time(7), tzinfo=timezone.utc).isoformat())
+        for day in range(400)
+    ]
+    content = gzip.compress("\n".join(lines).encode())
+
+    db = SessionLocal()
+    try:
+        summary = import_data(db, user_id_of(client, auth_headers), io.BytesIO(content[:-100]), chunk_size=50)
+    finally:
+        db.close()
+    assert summary.complete is False and summary.chunks >= 2
+    assert summary.errors[-1].startswith(f"Import stopped after {summary.chunks} committed chunks: unreadable upload")
+    assert summary.habit_logs == 50 * (summary.chunks - 1)
@@ -0,0 +1,121 @@
+"""
+Global streak leaderboard: skiplist ordering, ranks and incremental updates
+"""
+
+import bisect
+import random
+
+import pytest
+
+from conftest import log_days
+from app.config import settings
+from app.database import SessionLocal
+from app.routers import analytics
+from app.services.leaderboard import rebuild_leaderboard
+from app.sorted_sets import MemoryLeaderboardBackend, SkipList, create_leaderboard_backend, streak_leaderboard
+
+
+def test_skiplist_matches_a_sorted_list():
+    rng = random.Random(7)
+    skiplist, reference = SkipList(), []
+    for step in range(5000):
+        if reference and rng.random() < 0.4:
+            key = reference.pop(rng.randrange(len(reference)))
+            assert skiplist.remove(key)
+        else:
+            key = (rng.randrange(30), str(rng.randrange(10 ** 6)))
+            if key in reference:
+                continue
+            bisect.insort(reference, key)
+            skiplist.insert(key)
+
+        if step % 100 == 0:
+            assert len(skiplist) == len(reference)
+            start = rng.randrange(len(reference) + 2)
+            stop = start + rng.randrange(8)
+            assert skiplist.slice(start, stop) == reference[start:stop]
+            score = rng.randrange(30)
+            assert skiplist.count_while(lambda key: key[0] <= score) == sum(key[0] <= score for key in reference)
+    assert not skiplist.remove((99, "missing"))
+
+
+def test_ranks_ties_and_neighbours():
+    board = MemoryLeaderboardBackend()
+    board.replace({1: 5, 2: 9, 3: 5, 4: 5, 5: 1, 6: 0})
+
+    standings = board.standings(5, limit=3, neighbours=2)
+    assert standings.total == 5
+    assert standings.top == [(2, 9, 1), (4, 5, 2), (3, 5, 2)]
+    assert standings.me == (5, 1, 5)
+    assert standings.around == [(3, 5, 2), (1, 5, 2), (5, 1, 5)]
+
+    board.set_scores({5: 12, 2: 0})
+    standings = board.standings(5, limit=2, neighbours=1)
+    assert standings.top == [(5, 12, 1), (4, 5, 2)]
+    assert standings.around == [(5, 12, 1), (4, 5, 2)]
+    assert board.standings(2, limit=1, neighbours=1).me is None
+
+
+def leaderboard(client, headers, **params):
+    response = client.get("/api/v1/analytics/streaks/leaderboard/global", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_streak_changes_move_users(client, auth_headers):
+    habit_id = client.post("/api/v1/habits/", json={"title": "Run"}, headers=auth_headers).json()["id"]
+    me = client.get("/api/v1/users/me", headers=auth_headers).json()
+
+    assert leaderboard(client, auth_headers)["me"] is None
+    log_days(client, auth_headers, habit_id, 400)
+    board = leaderboard(client, auth_headers, limit=5, neighbours=1)
+    assert board["me"] == {"rank": 1, "user_id": me["id"], "username": me["username"], "current_streak": 400}
+    assert board["top"][0]["user_id"] == me["id"]
+    assert me["id"] in [entry["user_id"] for entry in board["around_me"]]
+
+    # Wiped and reseeded from the habits table
+    streak_leaderboard.replace({})
+    db = SessionLocal()
+    try:
+        assert rebuild_leaderboard(db) >= 1
+    finally:
+        db.close()
+    assert leaderboard(client, auth_headers)["me"]["current_streak"] == 400
+
+    client.put(f"/api/v1/habits/{habit_id}", json={"is_active": False}, headers=auth_headers)
+    board = leaderboard(client, auth_headers)
+    assert board["me"] is None
+    assert me["id"] not in [entry["user_id"] for entry in board["top"]]
+
+
+def test_deleting_a_category_drops_its_habits_streaks(client, auth_headers):
+    category_id = client.post("/api/v1/categories/", json={"name": "Fitness"}, headers=auth_headers).json()["id"]
+    habit_id = client.post(
+        "/api/v1/habits/", json={"title": "Swim", "category_id": category_id}, headers=auth_headers
+    ).json()["id"]
+    log_days(client, auth_headers, habit_id, 3)
+    assert leaderboard(client, auth_headers)["me"]["current_streak"] == 3
+
+    client.delete(f"/api/v1/categories/{category_id}", headers=auth_headers)
+    assert leaderboard(client, auth_headers)["me"] is None
+
+
+def test_leaderboard_bounds(client, auth_headers):
+    response = client.get("/api/v1/analytics/streaks/leaderboard/global", params={"limit": 0}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_seeded_at_startup_not_by_requests(client, auth_headers, monkeypatch):
+    assert streak_leaderboard.seeded()
+
+    unseeded = MemoryLeaderboardBackend()
+    monkeypatch.setattr(analytics, "streak_leaderboard", unseeded)
+    assert leaderboard(client, auth_headers)["total"] == 0
+    assert not unseeded.seeded()
+
+
+def test_memory_backend_needs_a_single_process(monkeypatch):
+    # Refresh tasks in a Celery worker would update that worker's copy only
+    monkeypatch.setattr(settings, "TASKS_EAGER", False)
+    with pytest.raises(ValueError):
+        create_leaderboard_backend("memory")
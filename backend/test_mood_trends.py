@@ -0,0 +1,92 @@
+"""
+Bucketed mood trends are aggregated in SQL, one row per bucket
+"""
+
+from datetime import datetime, time, timedelta, timezone
+
+from app.database import SessionLocal
+from app.models import MoodEntry
+from app.routers.analytics import summarize_mood_buckets
+from app.services.streaks import DAILY
+
+
+def add_entries(client, auth_headers, entries):
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    db = SessionLocal()
+    try:
+        db.add_all(MoodEntry(user_id=user_id, **entry) for entry in entries)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_bucket_by_day(client, auth_headers):
+    today = datetime.now(timezone.utc).date()
+    entries = []
+    for offset in range(3):
+        day = today - timedelta(days=offset)
+        for hour, rating in [(8, 4.0), (13, 6.0), (20, 8.0)]:
+            entries.append({
+                "mood_rating": rating + offset,
+                "stress_level": 5.0 if hour == 13 else None,
+                "recorded_at": datetime.combine(day, time(hour), tzinfo=timezone.utc)
+            })
+    add_entries(client, auth_headers, entries)
+
+    raw = client.get("/api/v1/analytics/mood/trends", params={"days": 7}, headers=auth_headers).json()
+    assert len(raw) == 9
+
+    response = client.get(
+        "/api/v1/analytics/mood/trends", params={"days": 7, "bucket": "day", "rolling": 2}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    points = response.json()
+    assert [point["bucket_start"] for point in points] == [
+        (today - timedelta(days=offset)).isoformat() for offset in (2, 1, 0)
+    ]
+
+    latest = points[-1]
+    assert latest["entries"] == 3
+    assert (latest["mood_avg"], latest["mood_min"], latest["mood_max"]) == (6.0, 4.0, 8.0)
+    assert (latest["stress_avg"], latest["stress_min"], latest["stress_max"]) == (5.0, 5.0, 5.0)
+    assert latest["energy_avg"] is None
+    # Today's and yesterday's entries: (4 + 6 + 8 + 5 + 7 + 9) / 6
+    assert latest["mood_rolling_avg"] == 6.5
+
+
+def test_bucket_by_week_and_month(client, auth_headers):
+    today = datetime.now(timezone.utc).date()
+    days = [today - timedelta(days=offset) for offset in range(0, 60, 3)]
+    add_entries(client, auth_headers, [
+        {"mood_rating": 5.0, "recorded_at": datetime.combine(day, time(12), tzinfo=timezone.utc)}
+        for day in days
+    ])
+
+    for bucket, start_of in [
+        ("week", lambda day: day - timedelta(days=day.weekday())),
+        ("month", lambda day: day.replace(day=1)),
+    ]:
+        points = client.get(
+            "/api/v1/analytics/mood/trends", params={"days": 60, "bucket": bucket}, headers=auth_headers
+        ).json()
+        expected = sorted({start_of(day) for day in days})
+        assert [point["bucket_start"] for point in points] == [day.isoformat() for day in expected]
+        assert sum(point["entries"] for point in points) == len(days)
+        assert "mood_rolling_avg" not in points[0]
+
+
+def test_invalid_bucket(client, auth_headers):
+    response = client.get("/api/v1/analytics/mood/trends", params={"bucket": "year"}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_rolling_average_counts_missing_buckets_as_empty():
+    def row(day, rating):
+        row = {"bucket_start": day, "entries": 1}
+        for name in ("mood", "stress", "energy"):
+            row.update({f"{name}_sum": rating, f"{name}_count": 1, f"{name}_min": rating, f"{name}_max": rating})
+        return row
+
+    rows = [row("2026-10-01", 2.0), row("2026-10-02", 4.0), row("2026-10-05", 9.0)]
+    points = summarize_mood_buckets(rows, DAILY, rolling=2)
+    assert [point["mood_rolling_avg"] for point in points] == [2.0, 3.0, 9.0]
@@ -0,0 +1,120 @@
+"""
+Notification inbox: keyset pages, maintained unread counter, bulk reads, pruning
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from conftest import login, register, user_id_of
+from app.database import SessionLocal
+from app.models import Notification
+from app.services.counters import set_counters
+from app.services.notifications import (
+    UNREAD_NOTIFICATIONS, mark_read, notify, prune_read_notifications, recount_unread, unread_count,
+)
+
+
+def seed(user_id, count):
+    db = SessionLocal()
+    try:
+        notify(db, [{"user_id": user_id, "title": f"Notice {i}"} for i in range(count)])
+        db.commit()
+        return db.execute(
+            select(Notification.id).where(Notification.user_id == user_id).order_by(Notification.id)
+        ).scalars().all()
+    finally:
+        db.close()
+
+
+def unread_of(client, headers):
+    response = client.get("/api/v1/notifications/unread-count", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["unread"]
+
+
+def test_inbox_pages_newest_first(client, auth_headers):
+    ids = seed(user_id_of(client, auth_headers), 5)
+    assert unread_of(client, auth_headers) == 5
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/notifications/", params=params, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        seen += [notification["id"] for notification in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+
+    client.post("/api/v1/notifications/mark-read", json={"ids": [ids[-1]]}, headers=auth_headers)
+    unread = client.get("/api/v1/notifications/", params={"unread_only": True}, headers=auth_headers).json()
+    assert [notification["id"] for notification in unread] == ids[-2::-1]
+    assert not any(notification["is_read"] for notification in unread)
+
+
+def test_mark_read_up_to_id(client, auth_headers):
+    ids = seed(user_id_of(client, auth_headers), 5)
+    other_headers = login(client, register(client))
+    seed(user_id_of(client, other_headers), 2)
+
+    response = client.post("/api/v1/notifications/mark-read", json={"up_to_id": ids[2]}, headers=auth_headers)
+    assert response.json() == {"marked_read": 3, "unread": 2}
+    response = client.post("/api/v1/notifications/mark-read", json={"up_to_id": ids[2]}, headers=auth_headers)
+    assert response.json() == {"marked_read": 0, "unread": 2}
+
+    response = client.post("/api/v1/notifications/mark-read", json={}, headers=auth_headers)
+    assert response.json() == {"marked_read": 2, "unread": 0}
+    assert unread_of(client, other_headers) == 2
+
+    inbox = client.get("/api/v1/notifications/", headers=auth_headers).json()
+    assert all(notification["is_read"] and notification["read_at"] for notification in inbox)
+
+
+def test_delete_updates_the_counter(client, auth_headers):
+    ids = seed(user_id_of(client, auth_headers), 3)
+    client.post("/api/v1/notifications/mark-read", json={"ids": [ids[0]]}, headers=auth_headers)
+
+    assert client.delete(f"/api/v1/notifications/{ids[0]}", headers=auth_headers).status_code == 200
+    assert unread_of(client, auth_headers) == 2
+    assert client.delete(f"/api/v1/notifications/{ids[1]}", headers=auth_headers).status_code == 200
+    assert unread_of(client, auth_headers) == 1
+    assert client.delete(f"/api/v1/notifications/{ids[1]}", headers=auth_headers).status_code == 404
+
+
+def test_achievements_arrive_unread(client, auth_headers):
+    habit_id = client.post("/api/v1/habits/", json={"title": "Floss"}, headers=auth_headers).json()["id"]
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex, "completed_at": datetime.now(timezone.utc).isoformat()}
+    ]}, headers=auth_headers)
+    assert unread_of(client, auth_headers) == 1
+
+
+def test_prune_and_recount(client, auth_headers):
+    user_id = user_id_of(client, auth_headers)
+    ids = seed(user_id, 4)
+
+    db = SessionLocal()
+    try:
+        long_ago = datetime.now(timezone.utc) - timedelta(days=45)
+        assert mark_read(db, user_id, up_to_id=ids[1], now=long_ago) == 2
+        assert mark_read(db, user_id, ids=[ids[2]]) == 1
+        db.commit()
+
+        while prune_read_notifications(db, limit=1):
+            db.commit()
+        db.commit()
+        remaining = db.execute(select(Notification.id).where(Notification.user_id == user_id)).scalars().all()
+        assert sorted(remaining) == ids[2:]
+        assert unread_count(db, user_id) == 1
+
+        set_counters(db, {(user_id, UNREAD_NOTIFICATIONS): 9})
+        db.commit()
+        assert recount_unread(db, user_id=user_id) == 1
+        db.commit()
+        assert unread_count(db, user_id) == 1
+        assert recount_unread(db, user_id=user_id) == 0
+    finally:
+        db.close()
@@ -0,0 +1,54 @@
+"""
+Keyset pages cover every row exactly once, newest log first
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.cursors import NEXT_CURSOR_HEADER
+
+
+def fetch_all(client, path, headers, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def test_habit_logs_pages(client, auth_headers):
+    habit_id = client.post("/api/v1/habits/", json={"title": "Journal"}, headers=auth_headers).json()["id"]
+    now = datetime.now(timezone.utc)
+    # Two logs share each timestamp so the id breaks ties
+    logs = [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex, "completed_at": (now - timedelta(days=i // 2)).isoformat()}
+        for i in range(7)
+    ]
+    client.post("/api/v1/habits/logs:batch", json={"logs": logs}, headers=auth_headers)
+
+    pages = fetch_all(client, f"/api/v1/habits/{habit_id}/logs", auth_headers, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+
+    items = [log for page in pages for log in page]
+    keys = [(log["completed_at"], log["id"]) for log in items]
+    assert keys == sorted(keys, reverse=True)
+    assert len({log["id"] for log in items}) == 7
+
+    detail = client.get(f"/api/v1/habits/{habit_id}", headers=auth_headers).json()
+    assert [log["id"] for log in detail["habit_logs"]] == [log["id"] for log in items]
+
+
+def test_habits_keyset_mode(client, auth_headers):
+    created = [
+        client.post("/api/v1/habits/", json={"title": f"Habit {i}"}, headers=auth_headers).json()["id"]
+        for i in range(5)
+    ]
+    pages = fetch_all(client, "/api/v1/habits/", auth_headers, limit=2)
+    assert [habit["id"] for page in pages for habit in page] == created
+
+    offset_page = client.get("/api/v1/habits/", params={"skip": 2, "limit": 2}, headers=auth_headers).json()
+    assert [habit["id"] for habit in offset_page] == created[2:4]
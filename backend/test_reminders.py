@@ -0,0 +1,113 @@
+"""
+Habit reminders are popped from a precomputed schedule on a simulated clock
+"""
+
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Habit, Notification
+from app.models.notification import NotificationType
+from app.services.reminders import SimulatedClock, next_fire_time, reschedule_reminders
+from app.tasks.reminders import drain_due_reminders
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def next_reminder_at(db, habit_id):
+    db.expire_all()
+    fire_at = db.get(Habit, habit_id).next_reminder_at
+    return fire_at and fire_at.replace(tzinfo=timezone.utc)
+
+
+def reminders_of(db, user_id):
+    return db.scalar(select(func.count(Notification.id)).where(
+        Notification.user_id == user_id,
+        Notification.notification_type == NotificationType.REMINDER
+    ))
+
+
+def test_next_fire_time_across_dst():
+    assert next_fire_time(time(7, 30), BERLIN, utc(2026, 3, 28, 5)) == utc(2026, 3, 28, 6, 30)
+    assert next_fire_time(time(7, 30), BERLIN, utc(2026, 3, 28, 6, 30)) == utc(2026, 3, 29, 5, 30)
+    # 02:30 does not exist on the day clocks go forward
+    assert next_fire_time(time(2, 30), BERLIN, utc(2026, 3, 28, 12)) == utc(2026, 3, 29, 1, 30)
+    # and happens twice on the day they go back; only the first fires
+    first = next_fire_time(time(2, 30), BERLIN, utc(2026, 10, 24, 12))
+    assert first == utc(2026, 10, 25, 0, 30)
+    assert next_fire_time(time(2, 30), BERLIN, first) == utc(2026, 10, 26, 1, 30)
+
+
+def test_reminders_fire_on_a_simulated_clock(client, auth_headers):
+    client.put("/api/v1/users/me", json={"timezone": "America/New_York"}, headers=auth_headers)
+    user_id = client.get("/api/v1/users/me", headers=auth_headers).json()["id"]
+    habit_ids = [
+        client.post("/api/v1/habits/", json={"title": title, "reminder_time": "07:30:00"}, headers=auth_headers).json()["id"]
+        for title in ("Run", "Stretch", "Read")
+    ]
+
+    clock = SimulatedClock(utc(2026, 1, 5, 12))
+    db = SessionLocal()
+    try:
+        assert reschedule_reminders(db, user_id=user_id, now=clock.now()) == 3
+        db.commit()
+        assert next_reminder_at(db, habit_ids[0]) == utc(2026, 1, 5, 12, 30)
+
+        clock.advance(timedelta(minutes=20))
+        drain_due_reminders(clock, batch_size=2)
+        assert reminders_of(db, user_id) == 0
+
+        clock.advance(timedelta(minutes=10))
+        drain_due_reminders(clock, batch_size=2)
+        assert reminders_of(db, user_id) == 3
+        assert next_reminder_at(db, habit_ids[0]) == utc(2026, 1, 6, 12, 30)
+        drain_due_reminders(clock)
+        assert reminders_of(db, user_id) == 3
+
+        # Completed before its reminder on the 6th
+        response = client.post("/api/v1/habits/logs:batch", json={"logs": [
+            {"habit_id": habit_ids[0], "client_key": uuid.uuid4().hex, "completed_at": "2026-01-06T11:00:00Z"}
+        ]}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        clock.advance(timedelta(days=1))
+        drain_due_reminders(clock)
+        assert reminders_of(db, user_id) == 5
+        assert next_reminder_at(db, habit_ids[0]) == utc(2026, 1, 7, 12, 30)
+
+        # Found days late, e.g. after an outage: rescheduled without notifying
+        clock.advance(timedelta(days=3, minutes=15))
+        drain_due_reminders(clock)
+        assert reminders_of(db, user_id) == 5
+        assert next_reminder_at(db, habit_ids[0]) == utc(2026, 1, 10, 12, 30)
+    finally:
+        db.close()
+
+
+def test_habit_and_timezone_changes_reschedule(client, auth_headers):
+    habit_id = client.post(
+        "/api/v1/habits/", json={"title": "Meditate", "reminder_time": "07:30:00"}, headers=auth_headers
+    ).json()["id"]
+
+    db = SessionLocal()
+    try:
+        fire_at = next_reminder_at(db, habit_id)
+        assert datetime.now(timezone.utc) < fire_at <= datetime.now(timezone.utc) + timedelta(days=1)
+        assert fire_at.time() == time(7, 30)
+
+        client.put("/api/v1/users/me", json={"timezone": "Asia/Tokyo"}, headers=auth_headers)
+        assert next_reminder_at(db, habit_id).astimezone(ZoneInfo("Asia/Tokyo")).time() == time(7, 30)
+
+        client.put(f"/api/v1/habits/{habit_id}", json={"reminder_time": "21:00:00"}, headers=auth_headers)
+        assert next_reminder_at(db, habit_id).astimezone(ZoneInfo("Asia/Tokyo")).time() == time(21)
+
+        client.put(f"/api/v1/habits/{habit_id}", json={"is_active": False}, headers=auth_headers)
+        assert next_reminder_at(db, habit_id) is None
+    finally:
+        db.close()
@@ -0,0 +1,107 @@
+"""
+habit_daily_stats matches aggregating habit_logs directly, however it is maintained
+"""
+
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Habit, HabitDailyStat, HabitLog, User
+from app.services.rollups import apply_habit_logs, local_date, rebuild_daily_stats, user_zone
+
+
+def aggregate_logs(db, user):
+    """The rollup computed straight from the user's logs"""
+    zone = user_zone(user.timezone)
+    expected = defaultdict(lambda: [0, 0.0, 0, 0.0, 0])
+    for log in db.execute(select(HabitLog).where(HabitLog.user_id == user.id)).scalars():
+        row = expected[(log.habit_id, local_date(log.completed_at, zone))]
+        row[0] += 1
+        if log.quality_rating is not None:
+            row[1] += log.quality_rating
+            row[2] += 1
+        if log.mood_rating is not None:
+            row[3] += log.mood_rating
+            row[4] += 1
+    return {key: tuple(row) for key, row in expected.items()}
+
+
+def rollup_of(db, user):
+    rows = db.execute(select(HabitDailyStat).where(HabitDailyStat.user_id == user.id)).scalars()
+    return {
+        (row.habit_id, row.local_date): (
+            row.completion_count, row.quality_sum, row.quality_count, row.mood_sum, row.mood_count
+        )
+        for row in rows
+    }
+
+
+def seed_logs(db, rng, count):
+    # Far from UTC, so logs around UTC midnight land on another local day
+    user = User(email="rollups@example.com", username="rollups", hashed_password="x", timezone="Asia/Kolkata")
+    db.add(user)
+    db.flush()
+    habits = [Habit(user_id=user.id, title=title) for title in ("Run", "Read", "Sleep")]
+    db.add_all(habits)
+    db.flush()
+
+    now = datetime.now(timezone.utc)
+    logs = [
+        HabitLog(
+            user_id=user.id,
+            habit_id=rng.choice(habits).id,
+            completed_at=now - timedelta(minutes=rng.randrange(60 * 24 * 20)),
+            quality_rating=rng.choice([None, 1, 3, 5]),
+            mood_rating=rng.choice([None, 2.5, 7.0]),
+        )
+        for _ in range(count)
+    ]
+    db.add_all(logs)
+    db.flush()
+    return user, logs
+
+
+def test_apply_habit_logs_matches_aggregating_logs():
+    rng = random.Random(11)
+    db = SessionLocal()
+    try:
+        user, logs = seed_logs(db, rng, 200)
+        for offset in range(0, len(logs), 37):
+            apply_habit_logs(db, logs[offset:offset + 37])
+        db.flush()
+        assert rollup_of(db, user) == aggregate_logs(db, user)
+
+        # Removing logs takes them back out, dropping days left empty
+        removed = rng.sample(logs, 120)
+        apply_habit_logs(db, removed, sign=-1)
+        for log in removed:
+            db.delete(log)
+        db.flush()
+        expected = aggregate_logs(db, user)
+        assert rollup_of(db, user) == expected
+        assert all(row[0] > 0 for row in expected.values())
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_rebuild_daily_stats_matches_aggregating_logs():
+    rng = random.Random(12)
+    db = SessionLocal()
+    try:
+        user, logs = seed_logs(db, rng, 150)
+        apply_habit_logs(db, logs[:50])
+        # Drift: a stray day and a wrong count
+        db.add(HabitDailyStat(user_id=user.id, habit_id=logs[0].habit_id,
+                              local_date=date(2001, 1, 1), completion_count=4))
+        db.flush()
+
+        assert rebuild_daily_stats(db, user_id=user.id, batch_size=16) == len(logs)
+        db.flush()
+        assert rollup_of(db, user) == aggregate_logs(db, user)
+    finally:
+        db.rollback()
+        db.close()
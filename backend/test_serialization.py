@@ -0,0 +1,47 @@
+"""
+The FAST_JSON path must produce the same JSON as response_model validation
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+
+
+@pytest.fixture
+def populated_habit(client, auth_headers):
+    client.post("/api/v1/categories/", json={"name": "Health"}, headers=auth_headers)
+    habit_id = client.post(
+        "/api/v1/habits/", json={"title": "Run", "reminder_time": "07:30:00"}, headers=auth_headers
+    ).json()["id"]
+    logs = [
+        {"habit_id": habit_id, "client_key": uuid.uuid4().hex, "quality_rating": 4, "notes": "ok",
+         "completed_at": datetime(2024, 5, day, 6, tzinfo=timezone.utc).isoformat()}
+        for day in range(1, 6)
+    ]
+    client.post("/api/v1/habits/logs:batch", json={"logs": logs}, headers=auth_headers)
+    return habit_id
+
+
+def test_fast_path_matches_validated_responses(client, auth_headers, populated_habit, monkeypatch):
+    paths = [
+        "/api/v1/habits/",
+        f"/api/v1/habits/{populated_habit}",
+        f"/api/v1/habits/{populated_habit}/logs?limit=3",
+        "/api/v1/categories/",
+    ]
+    validated = [client.get(path, headers=auth_headers) for path in paths]
+    monkeypatch.setattr(settings, "FAST_JSON", True)
+    fast = [client.get(path, headers=auth_headers) for path in paths]
+
+    for path, slow_response, fast_response in zip(paths, validated, fast):
+        assert fast_response.status_code == 200, path
+        assert fast_response.json() == slow_response.json(), path
+        assert fast_response.headers.get("X-Next-Cursor") == slow_response.headers.get("X-Next-Cursor")
+
+    sync = client.get("/api/v1/sync", headers=auth_headers).json()
+    monkeypatch.setattr(settings, "FAST_JSON", False)
+    expected = client.get("/api/v1/sync", headers=auth_headers).json()
+    assert {**sync, "cursor": None} == {**expected, "cursor": None}
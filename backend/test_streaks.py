@@ -0,0 +1,135 @@
+"""
+The incremental streak path and the NumPy bulk path must always agree
+"""
+
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.database import SessionLocal
+from app.models import Habit, HabitLog, User
+from app.models.habit import HabitFrequency
+from app.services.rollups import apply_habit_logs, rebuild_daily_stats
+from app.services.streaks import (
+    DAILY, MONTHLY, WEEKLY, StreakState, advance, bulk_compute, compute_state,
+    decay, period_index, period_indices, recompute_streaks, update_streaks_for_logs
+)
+
+CODES = [DAILY, WEEKLY, MONTHLY]
+SEEDS = range(200)
+
+
+def random_days(rng, code):
+    """Completion days dense enough to form runs in every frequency"""
+    start = date(2023, 12, 20).toordinal()
+    span = {DAILY: 40, WEEKLY: 200, MONTHLY: 800}[code]
+    count = rng.randint(1, span // 2)
+    return [date.fromordinal(start + rng.randrange(span)) for _ in range(count)]
+
+
+def incremental(days, code, rng, today):
+    """Fold days in arrival order, recomputing when one arrives late and
+    decaying now and then as the clock moves towards today"""
+    state, seen, clock = StreakState(), [], min(days)
+    for day in days:
+        seen.append(day)
+        state = advance(state, day, code) or compute_state(seen, code)
+        clock = max(clock, day)
+        if rng.random() < 0.2:
+            clock = min(today, clock + timedelta(days=rng.randrange(90)))
+            state = decay(state, clock, code)
+    return state
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_incremental_matches_recompute(seed):
+    rng = random.Random(seed)
+    code = CODES[seed % len(CODES)]
+    days = random_days(rng, code)
+    # Mostly in order, with some late arrivals as offline sync delivers them
+    days.sort(key=lambda day: day.toordinal() + rng.choice([0, 0, 0, -30]))
+    today = max(days) + timedelta(days=rng.randrange(70))
+
+    assert decay(incremental(days, code, rng, today), today, code) == decay(compute_state(days, code), today, code)
+
+
+@pytest.mark.parametrize("seed", SEEDS[:20])
+def test_bulk_matches_compute_state(seed):
+    rng = random.Random(seed)
+    habits = {habit_id: (rng.choice(CODES), []) for habit_id in rng.sample(range(1, 10000), 50)}
+    rows = []
+    for habit_id, (code, days) in habits.items():
+        days.extend(random_days(rng, code))
+        rows.extend((habit_id, day.toordinal(), code) for day in days)
+    rng.shuffle(rows)
+
+    result = bulk_compute(*map(np.array, zip(*rows)))
+
+    assert sorted(result["habit_id"].tolist()) == sorted(habits)
+    for i, habit_id in enumerate(result["habit_id"].tolist()):
+        code, days = habits[habit_id]
+        expected = compute_state(days, code)
+        assert (result["current"][i], result["longest"][i]) == (expected.current, expected.longest)
+        assert date.fromordinal(int(result["last_ordinal"][i])) == expected.last_date
+        assert date.fromordinal(int(result["start_ordinal"][i])) == expected.start_date
+
+
+def test_period_indices_match_period_index():
+    ordinals = np.arange(date(1999, 12, 1).toordinal(), date(2001, 3, 1).toordinal())
+    for code in CODES:
+        expected = [period_index(date.fromordinal(int(ordinal)), code) for ordinal in ordinals]
+        assert period_indices(ordinals, np.full(ordinals.size, code)).tolist() == expected
+
+
+def test_streak_breaks_after_a_missed_period():
+    state = compute_state([date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)], DAILY)
+    assert (state.current, state.longest) == (3, 3)
+    assert decay(state, date(2024, 1, 4), DAILY).current == 3
+    assert decay(state, date(2024, 1, 5), DAILY).current == 0
+
+    # ISO weeks: a Sunday followed by the next Monday is one run
+    weekly = compute_state([date(2024, 1, 7), date(2024, 1, 8)], WEEKLY)
+    assert (weekly.current, weekly.start_date) == (2, date(2024, 1, 7))
+    assert decay(weekly, date(2024, 1, 21), WEEKLY).current == 2
+    assert decay(weekly, date(2024, 1, 22), WEEKLY).current == 0
+
+
+def test_database_paths_agree(client):
+    """Logs applied one at a time end where a full recompute does"""
+    rng = random.Random(7)
+    today = datetime.now(timezone.utc).date()
+    db = SessionLocal()
+    try:
+        user = User(email="streaks@example.com", username="streaks", hashed_password="x", timezone="UTC")
+        db.add(user)
+        db.flush()
+        habits = [
+            Habit(user_id=user.id, title=frequency.value, frequency=frequency)
+            for frequency in (HabitFrequency.DAILY, HabitFrequency.WEEKLY, HabitFrequency.MONTHLY)
+        ]
+        db.add_all(habits)
+        db.flush()
+
+        for habit in habits:
+            offsets = sorted(rng.sample(range(120), 40), reverse=True)
+            offsets.insert(20, offsets[0])  # one late arrival
+            for offset in offsets:
+                moment = datetime.combine(today - timedelta(days=offset), time(12), tzinfo=timezone.utc)
+                log = HabitLog(user_id=user.id, habit_id=habit.id, completed_at=moment)
+                db.add(log)
+                db.flush()
+                apply_habit_logs(db, [log])
+                update_streaks_for_logs(db, [log])
+        db.flush()
+        incremental = [(habit.current_streak, habit.longest_streak) for habit in habits]
+
+        rebuild_daily_stats(db, user_id=user.id)
+        recompute_streaks(db, user_id=user.id)
+        db.expire_all()
+        assert [(habit.current_streak, habit.longest_streak) for habit in habits] == incremental
+        assert all(habit.longest_streak > 0 for habit in habits)
+    finally:
+        db.rollback()
+        db.close()
@@ -0,0 +1,122 @@
+"""
+Delta sync returns only what changed since the cursor, deletes included
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+
+from app.config import settings
+from app.cursors import decode_cursor, encode_cursor
+from app.database import SessionLocal
+from app.models import HabitLog, HabitLogCompaction
+from app.services.compaction import compaction_horizon, delete_compacted_logs, fold_cold_logs
+
+
+def test_sync_returns_changes_and_tombstones(client, auth_headers, monkeypatch):
+    first = client.post("/api/v1/habits/", json={"title": "Walk"}, headers=auth_headers).json()
+
+    full = client.get("/api/v1/sync", headers=auth_headers)
+    assert full.status_code == 200, full.text
+    assert full.json()["full"] is True
+    assert [habit["id"] for habit in full.json()["habits"]] == [first["id"]]
+
+    # Without the overlap window only rows written after the cursor come back
+    monkeypatch.setattr(settings, "SYNC_OVERLAP_SECONDS", -5)
+    cursor = full.json()["cursor"]
+    unchanged = client.get("/api/v1/sync", params={"since": cursor}, headers=auth_headers).json()
+    assert unchanged["full"] is False
+    assert unchanged["habits"] == [] and unchanged["deleted"]["habits"] == []
+
+    (cursor_time,) = decode_cursor(cursor, datetime)
+    earlier = encode_cursor(cursor_time - timedelta(seconds=10))
+    second = client.post("/api/v1/habits/", json={"title": "Stretch"}, headers=auth_headers).json()
+    client.delete(f"/api/v1/habits/{first['id']}", headers=auth_headers)
+
+    delta = client.get("/api/v1/sync", params={"since": earlier}, headers=auth_headers).json()
+    assert [habit["id"] for habit in delta["habits"]] == [second["id"]]
+    assert delta["deleted"]["habits"] == [first["id"]]
+
+
+def sync_pages(client, headers, **params):
+    pages = [client.get("/api/v1/sync", params=params, headers=headers).json()]
+    while pages[-1]["has_more"]:
+        pages.append(client.get(
+            "/api/v1/sync", params={"page": pages[-1]["next_page"], "limit": params["limit"]}, headers=headers
+        ).json())
+    return pages
+
+
+def test_full_sync_is_paged(client, auth_headers, monkeypatch):
+    category = client.post("/api/v1/categories/", json={"name": "Home"}, headers=auth_headers).json()
+    habits = [
+        client.post(
+            "/api/v1/habits/", json={"title": f"Chore {i}", "category_id": category["id"]}, headers=auth_headers
+        ).json()
+        for i in range(3)
+    ]
+    now = datetime.now(timezone.utc)
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habits[i % 3]["id"], "client_key": uuid.uuid4().hex,
+         "completed_at": (now - timedelta(hours=i)).isoformat()}
+        for i in range(4)
+    ]}, headers=auth_headers)
+
+    whole = client.get("/api/v1/sync", headers=auth_headers).json()
+    assert whole["has_more"] is False and whole["next_page"] is None
+
+    pages = sync_pages(client, auth_headers, limit=3)
+    assert len(pages) == 3
+    assert [page["has_more"] for page in pages] == [True, True, False]
+    assert all(page["full"] for page in pages)
+    assert all(len(page["habits"]) + len(page["categories"]) + len(page["habit_logs"]) <= 3 for page in pages)
+    assert len({page["cursor"] for page in pages}) == 1
+    for collection in ["habits", "categories", "habit_logs", "mood_entries", "goals"]:
+        paged = [row["id"] for page in pages for row in page[collection]]
+        assert paged == sorted(row["id"] for row in whole[collection]), collection
+
+    # Nothing changed since the pages' cursor
+    monkeypatch.setattr(settings, "SYNC_OVERLAP_SECONDS", -5)
+    after = client.get("/api/v1/sync", params={"since": pages[-1]["cursor"], "limit": 3}, headers=auth_headers).json()
+    assert after["full"] is False and after["has_more"] is False
+    assert after["habits"] == [] and after["habit_logs"] == []
+
+
+
+def test_full_sync_reports_the_compaction_horizon(client, auth_headers):
+    habit = client.post("/api/v1/habits/", json={"title": "Swim"}, headers=auth_headers).json()
+    client.post("/api/v1/habits/logs:batch", json={"logs": [
+        {"habit_id": habit["id"], "client_key": uuid.uuid4().hex,
+         "completed_at": datetime.now(timezone.utc).isoformat()}
+    ]}, headers=auth_headers)
+    assert client.get("/api/v1/sync", headers=auth_headers).json()["compacted_before"] is None
+
+    # Compacted long ago, so the horizon leaves every other test's logs alone
+    then = datetime(2001, 6, 18, tzinfo=timezone.utc)
+    horizon = compaction_horizon(then)
+    db = SessionLocal()
+    try:
+        db.add(HabitLog(user_id=habit["user_id"], habit_id=habit["id"],
+                        completed_at=horizon - timedelta(days=3), processed_at=then))
+        db.commit()
+        assert fold_cold_logs(db, now=then) == horizon
+        assert delete_compacted_logs(db) == 1
+        db.commit()
+
+        full = client.get("/api/v1/sync", headers=auth_headers).json()
+        assert full["full"] is True
+        assert datetime.fromisoformat(full["compacted_before"]) == horizon
+        assert len(full["habit_logs"]) == 1
+        # The old log goes without a tombstone; clients keep their copy
+        assert full["deleted"]["habit_logs"] == []
+    finally:
+        db.execute(delete(HabitLogCompaction))
+        db.commit()
+        db.close()
+
+def test_sync_rejects_malformed_cursor(client, auth_headers):
+    response = client.get("/api/v1/sync", params={"since": "not-a-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
+    page = encode_cursor(datetime.now(timezone.utc), True, datetime.now(timezone.utc), "users", 0)
+    assert client.get("/api/v1/sync", params={"page": page}, headers=auth_headers).status_code == 400
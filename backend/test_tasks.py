@@ -0,0 +1,50 @@
+"""
+Post-write tasks are idempotent: each log is processed exactly once
+"""
+
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Habit, HabitLog, User
+from app.services.rollups import apply_habit_logs
+from app.tasks.habit_logs import process_habit_logs
+
+
+def test_pending_logs_processed_once():
+    today = datetime.now(timezone.utc).date()
+    db = SessionLocal()
+    try:
+        user = User(email="tasks@example.com", username="tasks", hashed_password="x")
+        db.add(user)
+        db.flush()
+        habit = Habit(user_id=user.id, title="Water")
+        db.add(habit)
+        db.flush()
+        logs = [
+            HabitLog(user_id=user.id, habit_id=habit.id,
+                     completed_at=datetime.combine(today - timedelta(days=offset), time(9), tzinfo=timezone.utc))
+            for offset in range(4)
+        ]
+        db.add_all(logs)
+        db.flush()
+        apply_habit_logs(db, logs)
+        db.commit()
+        user_id, habit_id = user.id, habit.id
+    finally:
+        db.close()
+
+    assert process_habit_logs(user_id) == 1
+    # Redelivered or duplicate tasks find nothing left to do
+    assert process_habit_logs(user_id) == 0
+
+    db = SessionLocal()
+    try:
+        habit = db.get(Habit, habit_id)
+        assert (habit.current_streak, habit.longest_streak) == (4, 4)
+        pending = db.scalar(select(func.count(HabitLog.id)).where(
+            HabitLog.habit_id == habit_id, HabitLog.processed_at.is_(None)))
+        assert pending == 0
+    finally:
+        db.close()